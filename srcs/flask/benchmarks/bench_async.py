@@ -0,0 +1,130 @@
+"""Benchmark de rendimiento: modelos síncronos (hilos) frente a asíncronos (corrutinas).
+
+Cada cliente hace peticiones "ficha de perfil" seguidas: número de fotos,
+notificaciones sin leer, relación (match_status) y última página del chat.
+En modo síncrono las cuatro consultas van una tras otra en un hilo; en modo
+asíncrono van a la vez con asyncio.gather. Ambos usan un pool del mismo
+tamaño. Uso (desde srcs/flask):
+    python3 -m benchmarks.bench_async --clients 1000 --threads 32 --pool-size 20
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DatabaseConfig
+from models.database import Database
+from models import chat_model, likes_model, notifications_model, pictures_model
+from models.aio import (
+    chat_model as aio_chat, likes_model as aio_likes,
+    notifications_model as aio_notifications, pictures_model as aio_pictures,
+)
+from models.aio.database import AsyncDatabase
+from benchmarks.common import bulk_insert_users, bench_user_ids, cleanup_bench_users, summary
+
+
+def profile_page_sync(viewer_id, user_id):
+    pictures_model.count_pictures(user_id)
+    notifications_model.unread_count(viewer_id)
+    likes_model.match_status(viewer_id, [user_id])
+    chat_model.get_messages_page(viewer_id, user_id, 20)
+
+
+async def profile_page_async(viewer_id, user_id):
+    await asyncio.gather(
+        aio_pictures.count_pictures(user_id),
+        aio_notifications.unread_count(viewer_id),
+        aio_likes.match_status(viewer_id, [user_id]),
+        aio_chat.get_messages_page(viewer_id, user_id, 20),
+    )
+
+
+def run_sync(pairs, clients, threads):
+    """`clients` clientes servidos por `threads` hilos (un worker gthread)."""
+    timings = []
+    lock = threading.Lock()
+    next_pair = iter(pairs)
+
+    def client():
+        while True:
+            with lock:
+                pair = next(next_pair, None)
+            if pair is None:
+                return
+            start = time.perf_counter()
+            profile_page_sync(*pair)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                timings.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(clients, threads)) as executor:
+        for _ in range(min(clients, threads)):
+            executor.submit(client)
+    return time.perf_counter() - start, timings
+
+
+async def run_async(pairs, clients):
+    """`clients` corrutinas concurrentes en un solo hilo."""
+    timings = []
+    next_pair = iter(pairs)
+
+    async def client():
+        for pair in next_pair:  # Iterador compartido: cada cliente toma la siguiente petición
+            start = time.perf_counter()
+            await profile_page_async(*pair)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    await AsyncDatabase.get_pool()  # Abrir el pool fuera de la medida
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    await AsyncDatabase.close_pool()
+    return elapsed, timings
+
+
+def report(label, elapsed, timings):
+    print(f"{label:<28} {len(timings) / elapsed:>9,.0f} req/s  {summary(timings)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20000, help="Peticiones totales por modo")
+    parser.add_argument("--threads", type=int, nargs="+", default=[32, 1000],
+                        help="Hilos del modo síncrono (32 ~ un worker gthread, 1000 = un hilo por cliente)")
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="No borrar los datos sintéticos al terminar")
+    args = parser.parse_args()
+
+    # Mismo tamaño de pool en ambos modos y cola de espera sin límite
+    DatabaseConfig.POOL_MAX_SIZE = DatabaseConfig.ASYNC_POOL_MAX_SIZE = args.pool_size
+    DatabaseConfig.POOL_MIN_SIZE = DatabaseConfig.ASYNC_POOL_MIN_SIZE = args.pool_size
+    DatabaseConfig.POOL_MAX_WAITING = DatabaseConfig.ASYNC_POOL_MAX_WAITING = 0
+    Database.close_pool()
+
+    Database.create_tables()
+    user_ids = bench_user_ids()
+    if len(user_ids) < args.users:
+        cleanup_bench_users()
+        bulk_insert_users(args.users)
+        user_ids = bench_user_ids()
+
+    try:
+        rng = random.Random(0)
+        pairs = [tuple(rng.sample(user_ids, 2)) for _ in range(args.requests)]
+        print(f"clients={args.clients} requests={args.requests} pool={args.pool_size} (4 queries per request)")
+        for threads in args.threads:
+            report(f"sync, {min(args.clients, threads)} threads", *run_sync(pairs, args.clients, threads))
+        report(f"async, {args.clients} coroutines", *asyncio.run(run_async(pairs, args.clients)))
+    finally:
+        if not args.keep:
+            cleanup_bench_users()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Benchmark del filtrado de bloqueos en los listados.
+
+Un usuario con muchos likes dados y muchas notificaciones bloquea a 0, 100,
+1.000 y 10.000 usuarios. Para cada tamaño se mide el listado sin filtro, con
+el anti-join contra el array del conjunto en caché (lo que hacen los
+modelos) y con un NOT EXISTS por fila contra la tabla blocks como
+referencia, además de la carga del conjunto sin caché. Uso (desde srcs/flask):
+    python3 -m benchmarks.bench_blocks --users 100000 --sizes 0 100 1000 10000
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from models.database import Database
+from models.blocks_model import block_tag, get_block_set
+from models.cache import profile_cache
+from models.likes_model import get_liked_users
+from models.notifications_model import get_notifications_for_user
+from models.search_model import search_profiles
+from benchmarks.common import bulk_insert_users, bench_user_ids, cleanup_bench_users, measure, summary
+
+# Referencia: comprobar cada fila contra la tabla blocks en los dos sentidos
+BLOCKS_NOT_EXISTS = '''
+    NOT EXISTS (SELECT 1 FROM blocks
+                WHERE (blocks.blocker_id = %(viewer)s AND blocks.blocked_id = {column})
+                   OR (blocks.blocker_id = {column} AND blocks.blocked_id = %(viewer)s))
+'''
+LIKES_NOT_EXISTS = f'''
+    SELECT liked_user_id FROM likes
+    WHERE user_id = %(viewer)s AND {BLOCKS_NOT_EXISTS.format(column="liked_user_id")}
+'''
+NOTIFICATIONS_NOT_EXISTS = f'''
+    SELECT * FROM notifications
+    WHERE user_id = %(viewer)s AND (actor_id IS NULL OR {BLOCKS_NOT_EXISTS.format(column="actor_id")})
+    ORDER BY timestamp DESC
+'''
+
+
+def seed_viewer(viewer_id, others, likes, notifications, rng):
+    """Likes dados por viewer_id y notificaciones suyas con autor, sobre usuarios al azar."""
+    base = datetime(2024, 1, 1)
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM likes WHERE user_id = %s", (viewer_id,))
+            cursor.execute("DELETE FROM notifications WHERE user_id = %s", (viewer_id,))
+            with cursor.copy("COPY likes (user_id, liked_user_id) FROM STDIN") as copy:
+                for liked_id in rng.sample(others, likes):
+                    copy.write_row((viewer_id, liked_id))
+            with cursor.copy("COPY notifications (user_id, type, message, timestamp, actor_id) FROM STDIN") as copy:
+                for i, actor_id in enumerate(rng.choices(others, k=notifications)):
+                    copy.write_row((viewer_id, "like", "bench", base + timedelta(seconds=i), actor_id))
+        connection.execute("ANALYZE likes")
+        connection.execute("ANALYZE notifications")
+
+
+def set_blocks(viewer_id, blocked_ids):
+    """Sustituye los bloqueos de viewer_id (la mitad hechos por él y la otra mitad recibidos)."""
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM blocks WHERE blocker_id = %s OR blocked_id = %s", (viewer_id, viewer_id))
+            with cursor.copy("COPY blocks (blocker_id, blocked_id) FROM STDIN") as copy:
+                for i, other_id in enumerate(blocked_ids):
+                    copy.write_row((viewer_id, other_id) if i % 2 else (other_id, viewer_id))
+        connection.execute("ANALYZE blocks")
+    profile_cache.invalidate_tag(block_tag(viewer_id))
+
+
+def fetch_reference(query, viewer_id):
+    with Database.get_connection() as connection:
+        return connection.execute(query, {"viewer": viewer_id}).fetchall()
+
+
+def load_block_set_cold(viewer_id):
+    profile_cache.invalidate_tag(block_tag(viewer_id))
+    return get_block_set(viewer_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 100, 1000, 10000])
+    parser.add_argument("--likes", type=int, default=5000, help="Likes dados por el usuario que mira")
+    parser.add_argument("--notifications", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="No borrar los datos sintéticos al terminar")
+    args = parser.parse_args()
+
+    Database.create_tables()
+    user_ids = bench_user_ids()
+    if len(user_ids) < args.users:
+        bulk_insert_users(args.users - len(user_ids), start=len(user_ids))
+        user_ids = bench_user_ids()
+
+    rng = random.Random(0)
+    viewer_id, others = user_ids[0], user_ids[1:]
+    try:
+        seed_viewer(viewer_id, others, args.likes, args.notifications, rng)
+        liked = get_liked_users(viewer_id, blocked_ids=())
+        for size in args.sizes:
+            # La mitad de los bloqueados entre los likeados, para que el filtro quite filas
+            blocked = set(rng.sample(liked, min(size // 2, len(liked))))
+            blocked.update(rng.sample(others, size - len(blocked)))
+            set_blocks(viewer_id, list(blocked))
+            block_set = get_block_set(viewer_id)
+            runs = [(viewer_id,)] * args.queries
+
+            print(f"--- blocks={len(block_set)}")
+            print(f"{'block set (no cache)':<30} {summary(measure(load_block_set_cold, runs))}")
+            print(f"{'block set (cached)':<30} {summary(measure(get_block_set, runs))}")
+            print(f"{'likes, no filter':<30} {summary(measure(lambda v: get_liked_users(v, ()), runs))}")
+            print(f"{'likes, array anti-join':<30} {summary(measure(lambda v: get_liked_users(v, block_set), runs))}")
+            print(f"{'likes, NOT EXISTS (ref.)':<30} {summary(measure(lambda v: fetch_reference(LIKES_NOT_EXISTS, v), runs))}")
+            print(f"{'notifications, no filter':<30} "
+                  f"{summary(measure(lambda v: get_notifications_for_user(v, ()), runs))}")
+            print(f"{'notifications, array':<30} "
+                  f"{summary(measure(lambda v: get_notifications_for_user(v, block_set), runs))}")
+            print(f"{'notifications, NOT EXISTS':<30} "
+                  f"{summary(measure(lambda v: fetch_reference(NOTIFICATIONS_NOT_EXISTS, v), runs))}")
+            print(f"{'search (fame), no filter':<30} "
+                  f"{summary(measure(lambda v: search_profiles(v, sort='fame', blocked_ids=()), runs))}")
+            print(f"{'search (fame), array':<30} "
+                  f"{summary(measure(lambda v: search_profiles(v, sort='fame', blocked_ids=block_set), runs))}")
+    finally:
+        set_blocks(viewer_id, [])
+        with Database.get_connection() as connection:
+            connection.execute("DELETE FROM likes WHERE user_id = %s", (viewer_id,))
+            connection.execute("DELETE FROM notifications WHERE user_id = %s", (viewer_id,))
+        if not args.keep:
+            cleanup_bench_users()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark de carga de historial de chat a medida que crece la conversación.
+
+Compara la última página (get_messages_page) con la carga completa
+(get_messages_between_users). Uso (desde srcs/flask):
+    python3 -m benchmarks.bench_chat_history --sizes 1000 10000 100000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from models.database import Database
+from models.chat_model import get_messages_page, get_messages_between_users
+from benchmarks.common import bulk_insert_users, bench_user_ids, cleanup_bench_users, measure, summary
+
+
+def bulk_insert_messages(sender_id, receiver_id, count, start):
+    """Inserta `count` mensajes alternando el emisor, con timestamps crecientes."""
+    base = datetime(2024, 1, 1)
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            with cursor.copy("COPY chats (sender_id, receiver_id, message, timestamp) FROM STDIN") as copy:
+                for i in range(start, start + count):
+                    pair = (sender_id, receiver_id) if i % 2 else (receiver_id, sender_id)
+                    copy.write_row((*pair, f"message {i}", base + timedelta(seconds=i)))
+        connection.execute("ANALYZE chats")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    Database.create_tables()
+    cleanup_bench_users()
+    try:
+        bulk_insert_users(2)
+        user1, user2 = bench_user_ids()
+        inserted = 0
+        for size in sorted(args.sizes):
+            bulk_insert_messages(user1, user2, size - inserted, inserted)
+            inserted = size
+
+            latest = measure(get_messages_page, [(user1, user2, args.page_size)] * args.queries)
+            older_cursor = get_messages_page(user1, user2, args.page_size)["older_cursor"]
+            older = measure(get_messages_page, [(user1, user2, args.page_size, older_cursor)] * args.queries)
+
+            start = time.perf_counter()
+            get_messages_between_users(user1, user2)
+            full_ms = (time.perf_counter() - start) * 1000
+
+            print(f"messages={size:>7} latest page: {summary(latest)}")
+            print(f"messages={size:>7} older page:  {summary(older)}")
+            print(f"messages={size:>7} full thread: {full_ms:.2f}ms")
+    finally:
+        cleanup_bench_users()
+
+
+if __name__ == "__main__":
+    main()
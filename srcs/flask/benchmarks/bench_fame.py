@@ -0,0 +1,94 @@
+"""Benchmark del motor de fama: reconstrucción completa, pasadas incrementales y coste por like.
+
+Uso (desde srcs/flask, contra una base de datos desechable):
+    python3 -m benchmarks.bench_fame --users 1000000 --likes 50000000
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from models.database import Database
+from models import fame_model, likes_model
+from benchmarks.common import bulk_insert_users, bench_user_ids, cleanup_bench_users, measure, summary
+
+
+def insert_likes(first_id, last_id, count, chunk=5000000):
+    """Genera likes aleatorios en el servidor (un 1/3 de la masa va a pocos perfiles)."""
+    span = last_id - first_id + 1
+    inserted = 0
+    for offset in range(0, count, chunk):
+        with Database.get_connection() as connection:
+            cursor = connection.execute(
+                '''
+                INSERT INTO likes (user_id, liked_user_id)
+                SELECT liker, liked FROM (
+                    SELECT %(first)s + floor(random() * %(span)s)::int AS liker,
+                           %(first)s + floor(power(random(), 3) * %(span)s)::int AS liked
+                    FROM generate_series(1, %(rows)s)
+                ) AS pairs
+                WHERE liker <> liked
+                ON CONFLICT DO NOTHING
+                ''',
+                {"first": first_id, "span": span, "rows": min(chunk, count - offset)},
+            )
+            inserted += cursor.rowcount
+    with Database.get_connection() as connection:
+        connection.execute("ANALYZE likes")
+    return inserted
+
+
+def timed(label, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    print(f"{label:<32} {time.perf_counter() - start:>8.2f}s  {result}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--likes", type=int, default=50000000)
+    parser.add_argument("--incremental", type=int, default=2000, help="Likes individuales a medir")
+    parser.add_argument("--keep", action="store_true", help="No borrar los datos sintéticos al terminar")
+    args = parser.parse_args()
+
+    Database.create_tables()
+    user_ids = bench_user_ids()
+    if len(user_ids) < args.users:
+        cleanup_bench_users()
+        bulk_insert_users(args.users)
+        user_ids = bench_user_ids()
+    first_id, last_id = user_ids[0], user_ids[-1]
+
+    try:
+        rng = np.random.default_rng(0)
+        size = len(user_ids)
+        distribution = np.sort(rng.poisson(args.likes / size, size))
+        start = time.perf_counter()
+        fame_model.compute_fame(rng.poisson(50, size), rng.poisson(50, size), rng.poisson(120, size),
+                                rng.poisson(5, size), distribution)
+        print(f"compute_fame (NumPy)             {size / (time.perf_counter() - start):>12,.0f} users/s")
+
+        timed("insert likes", insert_likes, first_id, last_id, args.likes)
+        timed("rebuild counters (SQL)", fame_model.rebuild_counters)
+        timed("load distribution", lambda: len(fame_model.load_distribution(force=True)))
+        timed("full pass (all users dirty)", fame_model.run_pass)
+
+        sample_rng = random.Random(0)
+        pairs = [tuple(sample_rng.sample(user_ids, 2)) for _ in range(args.incremental)]
+        print(f"{'like_user with counters':<32} {summary(measure(likes_model.like_user, pairs))}")
+        print(f"{'unlike_user with counters':<32} {summary(measure(likes_model.unlike_user, pairs[::2]))}")
+        timed("incremental pass", fame_model.run_pass)
+    finally:
+        if not args.keep:
+            # Primero los likes por rango (índice único) para que el borrado en cascada no los recorra
+            with Database.get_connection() as connection:
+                connection.execute("DELETE FROM likes WHERE user_id BETWEEN %s AND %s", (first_id, last_id))
+            cleanup_bench_users()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Benchmark de find_users_near a medida que crece la tabla de usuarios.
+
+Uso (desde srcs/flask, contra una base de datos desechable):
+    python3 -m benchmarks.bench_geo --sizes 10000 100000 1000000 --radius 25
+"""
+
+import argparse
+import random
+
+from models.database import Database
+from models.geo_model import find_users_near
+from benchmarks.common import bulk_insert_users, bench_user_ids, cleanup_bench_users, measure, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--radius", type=float, default=25.0, help="Radio de búsqueda en km")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="No borrar los usuarios sintéticos al acabar")
+    args = parser.parse_args()
+
+    Database.create_tables()
+    cleanup_bench_users()
+    rng = random.Random(0)
+    inserted = 0
+    try:
+        for size in sorted(args.sizes):
+            elapsed = bulk_insert_users(size - inserted, start=inserted)
+            print(f"Inserted {size - inserted} users in {elapsed:.1f}s")
+            inserted = size
+
+            ids = bench_user_ids()
+            sample = [(rng.choice(ids), args.radius, args.limit) for _ in range(args.queries)]
+            find_users_near(*sample[0])  # Calentar caché y pool
+            first_page = measure(find_users_near, sample)
+
+            cursors = []
+            for user_id, radius, limit in sample[:50]:
+                next_cursor = find_users_near(user_id, radius, limit)["next_cursor"]
+                if next_cursor:
+                    cursors.append((user_id, radius, limit, next_cursor))
+            next_page = measure(find_users_near, cursors) if cursors else []
+
+            print(f"users={size:>9} radius={args.radius}km first page: {summary(first_page)}")
+            if next_page:
+                print(f"users={size:>9} radius={args.radius}km next page:  {summary(next_page)}")
+    finally:
+        if not args.keep:
+            cleanup_bench_users()
+
+
+if __name__ == "__main__":
+    main()
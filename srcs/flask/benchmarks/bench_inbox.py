@@ -0,0 +1,116 @@
+"""Benchmark de la bandeja de entrada: tabla conversations frente a agrupar chats.
+
+Un usuario con muchas conversaciones y mensajes: se mide get_inbox(),
+unread_messages_count() y mark_conversations_read() frente a la consulta
+que haría falta sin conversations (GROUP BY sobre todos sus mensajes), y el
+coste de create_message con el mantenimiento de la conversación. Uso (desde
+srcs/flask):
+    python3 -m benchmarks.bench_inbox --conversations 2000 --messages 200000
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from models.database import Database
+from models.chat_model import create_message, get_inbox, mark_conversations_read, unread_messages_count
+from benchmarks.common import bulk_insert_users, bench_user_ids, cleanup_bench_users, measure, summary
+
+# Referencia: conversaciones, último mensaje y recibidos agrupando chats
+GROUP_BY_INBOX = '''
+    SELECT DISTINCT ON (last.other_id) last.* FROM (
+        SELECT CASE WHEN sender_id = %(user)s THEN receiver_id ELSE sender_id END AS other_id,
+               MAX(timestamp) OVER w AS last_activity,
+               COUNT(*) FILTER (WHERE receiver_id = %(user)s) OVER w AS received,
+               message, timestamp, id
+        FROM chats
+        WHERE sender_id = %(user)s OR receiver_id = %(user)s
+        WINDOW w AS (PARTITION BY CASE WHEN sender_id = %(user)s THEN receiver_id ELSE sender_id END)
+    ) AS last
+    ORDER BY last.other_id, last.timestamp DESC, last.id DESC
+'''
+GROUP_BY_RECENT = f'''
+    SELECT * FROM ({GROUP_BY_INBOX}) AS inbox ORDER BY last_activity DESC LIMIT %(limit)s
+'''
+
+
+def seed_conversations(viewer_id, partners, messages, rng):
+    """Mensajes entre viewer_id y sus contactos (COPY) y sus filas de conversations."""
+    base = datetime(2024, 1, 1)
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            with cursor.copy("COPY chats (sender_id, receiver_id, message, timestamp) FROM STDIN") as copy:
+                for i in range(messages):
+                    partner_id = rng.choice(partners)
+                    pair = (viewer_id, partner_id) if rng.random() < 0.5 else (partner_id, viewer_id)
+                    copy.write_row((*pair, f"message {i}", base + timedelta(seconds=i)))
+            # Mismo relleno que la migración 14; los que acaban con un mensaje recibido quedan sin leer
+            cursor.execute(
+                '''
+                INSERT INTO conversations (user_low, user_high, last_message_id, last_activity, low_read_id,
+                                           high_read_id, low_unread, high_unread)
+                SELECT DISTINCT ON (user_low, user_high) user_low, user_high, id, timestamp,
+                       CASE WHEN sender_id = user_low THEN id ELSE 0 END,
+                       CASE WHEN sender_id = user_high THEN id ELSE 0 END,
+                       (sender_id <> user_low)::int, (sender_id <> user_high)::int
+                FROM chats WHERE %(user)s IN (user_low, user_high)
+                ORDER BY user_low, user_high, timestamp DESC, id DESC
+                ON CONFLICT DO NOTHING
+                ''',
+                {"user": viewer_id},
+            )
+        connection.execute("ANALYZE chats")
+        connection.execute("ANALYZE conversations")
+
+
+def cleanup_conversations(viewer_id):
+    with Database.get_connection() as connection:
+        connection.execute("DELETE FROM chats WHERE sender_id = %s OR receiver_id = %s", (viewer_id, viewer_id))
+        connection.execute("DELETE FROM conversations WHERE %s IN (user_low, user_high)", (viewer_id,))
+
+
+def group_by_inbox(viewer_id, limit):
+    with Database.get_connection() as connection:
+        return connection.execute(GROUP_BY_RECENT, {"user": viewer_id, "limit": limit}).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="No borrar los datos sintéticos al terminar")
+    args = parser.parse_args()
+
+    Database.create_tables()
+    user_ids = bench_user_ids()
+    if len(user_ids) < max(args.users, args.conversations + 1):
+        bulk_insert_users(max(args.users, args.conversations + 1) - len(user_ids), start=len(user_ids))
+        user_ids = bench_user_ids()
+
+    rng = random.Random(0)
+    viewer_id, partners = user_ids[0], rng.sample(user_ids[1:], args.conversations)
+    cleanup_conversations(viewer_id)
+    try:
+        seed_conversations(viewer_id, partners, args.messages, rng)
+        print(f"conversations={args.conversations} messages={args.messages} limit={args.limit}")
+        runs = [(viewer_id, args.limit)] * args.queries
+        print(f"{'inbox (conversations)':<28} {summary(measure(get_inbox, runs))}")
+        print(f"{'unread count':<28} {summary(measure(unread_messages_count, [(viewer_id,)] * args.queries))}")
+        print(f"{'inbox (GROUP BY chats, ref.)':<28} {summary(measure(group_by_inbox, runs[:10]))}")
+
+        pages = [(viewer_id, rng.sample(partners, args.limit)) for _ in range(args.queries)]
+        print(f"{'mark read (limit ids)':<28} {summary(measure(mark_conversations_read, pages))}")
+        sends = [(rng.choice(partners), viewer_id, "bench") for _ in range(args.queries)]
+        print(f"{'create_message':<28} {summary(measure(create_message, sends))}")
+        print(f"{'mark all read':<28} {summary(measure(mark_conversations_read, [(viewer_id,)]))}")
+    finally:
+        cleanup_conversations(viewer_id)
+        if not args.keep:
+            cleanup_bench_users()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark del índice invertido de intereses frente al JOIN + GROUP BY en SQL.
+
+Uso (desde srcs/flask, contra una base de datos desechable):
+    python3 -m benchmarks.bench_interests --users 100000 --tags 300
+"""
+
+import argparse
+import random
+
+from models.database import Database
+from models.tag_index import tag_index
+from benchmarks.common import bulk_insert_users, bench_user_ids, cleanup_bench_users, measure, summary
+
+BENCH_TAG_PREFIX = "benchtag"
+
+SQL_AT_LEAST = '''
+    SELECT user_id FROM user_interests
+    WHERE interest_id = ANY(%s)
+    GROUP BY user_id
+    HAVING COUNT(*) >= %s
+'''
+SQL_ALL = '''
+    SELECT user_id FROM user_interests
+    WHERE interest_id = ANY(%s)
+    GROUP BY user_id
+    HAVING COUNT(*) = cardinality(%s::int[])
+'''
+SQL_SHARED = '''
+    SELECT COUNT(*) AS shared
+    FROM user_interests a
+    JOIN user_interests b ON a.interest_id = b.interest_id
+    WHERE a.user_id = %s AND b.user_id = %s
+'''
+
+
+def seed_interests(user_ids, tag_count, seed):
+    """Crea el vocabulario y asigna 2-8 tags por usuario (con tags populares)."""
+    rng = random.Random(seed)
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO interests (tag) SELECT %s || g FROM generate_series(1, %s) g "
+                "ON CONFLICT (tag) DO NOTHING",
+                (BENCH_TAG_PREFIX, tag_count),
+            )
+            cursor.execute("SELECT id FROM interests WHERE tag LIKE %s ORDER BY id", (f"{BENCH_TAG_PREFIX}%",))
+            tag_ids = [row["id"] for row in cursor.fetchall()]
+            # Distribución sesgada: unos pocos tags son muy comunes
+            weights = [1 / (rank + 1) for rank in range(len(tag_ids))]
+            with cursor.copy("COPY user_interests (user_id, interest_id) FROM STDIN") as copy:
+                for user_id in user_ids:
+                    for tag_id in set(rng.choices(tag_ids, weights=weights, k=rng.randint(2, 8))):
+                        copy.write_row((user_id, tag_id))
+        connection.execute("ANALYZE user_interests")
+    return tag_ids
+
+
+def sql_rows(query, params):
+    with Database.get_connection() as connection:
+        return connection.execute(query, params).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--tags", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    Database.create_tables()
+    cleanup_bench_users()
+    try:
+        bulk_insert_users(args.users)
+        user_ids = bench_user_ids()
+        tag_ids = seed_interests(user_ids, args.tags, args.seed)
+        tag_index.reload()
+
+        rng = random.Random(args.seed)
+        # Tags de la mitad popular, para que las consultas devuelvan resultados
+        queries = [rng.sample(tag_ids[:max(4, len(tag_ids) // 2)], 4) for _ in range(args.queries)]
+        pairs = [tuple(rng.sample(user_ids, 2)) for _ in range(args.queries * 10)]
+
+        # Comprobar que ambos caminos devuelven lo mismo
+        for tags in queries[:10]:
+            expected = {row["user_id"] for row in sql_rows(SQL_AT_LEAST, (tags, 2))}
+            assert set(tag_index.users_with_at_least(tags, 2)) == expected
+        for a, b in pairs[:50]:
+            assert tag_index.shared_tag_count(a, b) == sql_rows(SQL_SHARED, (a, b))[0]["shared"]
+
+        cases = [
+            ("all 2 tags", lambda tags: tag_index.users_with_all(tags[:2]),
+             lambda tags: sql_rows(SQL_ALL, (tags[:2], tags[:2]))),
+            ("any of 4 tags", lambda tags: tag_index.users_with_any(tags),
+             lambda tags: sql_rows("SELECT DISTINCT user_id FROM user_interests WHERE interest_id = ANY(%s)", (tags,))),
+            ("at least 2 of 4", lambda tags: tag_index.users_with_at_least(tags, 2),
+             lambda tags: sql_rows(SQL_AT_LEAST, (tags, 2))),
+        ]
+        print(f"users={args.users} tags={args.tags}")
+        for name, index_fn, sql_fn in cases:
+            print(f"{name:<18} index: {summary(measure(index_fn, [(tags,) for tags in queries]))}")
+            print(f"{'':<18} sql:   {summary(measure(sql_fn, [(tags,) for tags in queries]))}")
+        print(f"{'shared tags':<18} index: {summary(measure(tag_index.shared_tag_count, pairs))}")
+        print(f"{'':<18} sql:   {summary(measure(lambda a, b: sql_rows(SQL_SHARED, (a, b)), pairs[:args.queries]))}")
+    finally:
+        cleanup_bench_users()
+        with Database.get_connection() as connection:
+            connection.execute("DELETE FROM interests WHERE tag LIKE %s", (f"{BENCH_TAG_PREFIX}%",))
+
+
+if __name__ == "__main__":
+    main()
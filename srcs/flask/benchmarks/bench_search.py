@@ -0,0 +1,92 @@
+"""Benchmark de la búsqueda avanzada con distintas combinaciones de filtros.
+
+Uso (desde srcs/flask, contra una base de datos desechable):
+    python3 -m benchmarks.bench_search --users 1000000
+"""
+
+import argparse
+import random
+
+from models.database import Database
+from models.tag_index import tag_index
+from models.search_model import search_profiles
+from benchmarks.common import bulk_insert_users, bench_user_ids, cleanup_bench_users, measure, summary
+from benchmarks.bench_interests import seed_interests, BENCH_TAG_PREFIX
+
+# Nombre -> argumentos de search_profiles (los tags se rellenan con los del vocabulario)
+FILTER_MIXES = {
+    "distance 25km": {"max_distance_km": 25},
+    "distance 25km, age 25-30": {"max_distance_km": 25, "min_age": 25, "max_age": 30},
+    "age 25-30 by age": {"min_age": 25, "max_age": 30, "sort": "age"},
+    "fame >= 90 by fame": {"min_fame": 90, "sort": "fame"},
+    "fame >= 95, age 20-22": {"min_fame": 95, "min_age": 20, "max_age": 22, "sort": "fame"},
+    "all by fame": {"sort": "fame"},
+    "rare tag, by age": {"tags": "rare", "sort": "age"},
+    "2 common tags, 50km": {"tags": "common", "max_distance_km": 50},
+    "common tag, fame, by tags": {"tags": "common", "min_fame": 50, "max_distance_km": 100, "sort": "tags"},
+}
+
+
+def run(viewer_id, mix, tag_names, rng, pages):
+    kwargs = dict(mix)
+    if kwargs.get("tags") == "rare":
+        kwargs["tags"] = [rng.choice(tag_names[-50:])]
+    elif kwargs.get("tags") == "common":
+        kwargs["tags"] = rng.sample(tag_names[:5], 2 if "sort" not in kwargs else 1)
+    cursor = None
+    for _ in range(pages):
+        result = search_profiles(viewer_id, cursor=cursor, **kwargs)
+        cursor = result["next_cursor"]
+        if not cursor:
+            break
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--tags", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=1, help="Páginas recorridas por consulta")
+    parser.add_argument("--keep", action="store_true", help="No borrar los datos sintéticos al terminar")
+    args = parser.parse_args()
+
+    Database.create_tables()
+    user_ids = bench_user_ids()
+    if len(user_ids) < args.users:
+        cleanup_bench_users()
+        bulk_insert_users(args.users)
+        user_ids = bench_user_ids()
+        seed_interests(user_ids, args.tags, 0)
+        # VACUUM marca las páginas como visibles: permite exploraciones solo de índice
+        with Database.get_dedicated_connection() as connection:
+            connection.execute("VACUUM ANALYZE users")
+    tag_index.reload()
+    with Database.get_connection() as connection:
+        rows = connection.execute(
+            '''
+            SELECT i.tag FROM interests i JOIN user_interests ui ON ui.interest_id = i.id
+            WHERE i.tag LIKE %s GROUP BY i.tag ORDER BY COUNT(*) DESC
+            ''',
+            (f"{BENCH_TAG_PREFIX}%",),
+        ).fetchall()
+    tag_names = [row["tag"] for row in rows]
+
+    try:
+        rng = random.Random(0)
+        print(f"users={len(user_ids)} pages={args.pages}")
+        for name, mix in FILTER_MIXES.items():
+            viewers = [(rng.choice(user_ids), mix, tag_names, rng, args.pages) for _ in range(args.queries)]
+            plan = run(*viewers[0])["plan"]
+            timings = measure(run, viewers)
+            print(f"{name:<28} {summary(timings)}  {plan['strategy']}"
+                  f"{'/' + plan['driver'] if plan['driver'] else ''} est={plan['estimated_rows']}")
+    finally:
+        if not args.keep:
+            cleanup_bench_users()
+            with Database.get_connection() as connection:
+                connection.execute("DELETE FROM interests WHERE tag LIKE %s", (f"{BENCH_TAG_PREFIX}%",))
+
+
+if __name__ == "__main__":
+    main()
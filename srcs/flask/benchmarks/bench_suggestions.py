@@ -0,0 +1,76 @@
+"""Benchmark del motor de sugerencias: candidatos puntuados por segundo.
+
+Uso (desde srcs/flask):
+    python3 -m benchmarks.bench_suggestions                # solo puntuación (NumPy)
+    python3 -m benchmarks.bench_suggestions --db 100000    # extremo a extremo contra la base de datos
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from models.database import Database
+from models.suggestions_model import score_block, top_k, get_suggestions
+from benchmarks.common import bulk_insert_users, bench_user_ids, cleanup_bench_users, measure, summary
+
+
+def synthetic_block(size, tags_per_user=8, tag_space=500, seed=0):
+    """Genera un bloque de candidatos en formato columnar sin tocar la base de datos."""
+    rng = np.random.default_rng(seed)
+    tag_counts = rng.integers(0, tags_per_user * 2, size)
+    return {
+        "ids": np.arange(1, size + 1, dtype=np.int64),
+        "distance_km": rng.uniform(0, 100, size),
+        "age": rng.integers(18, 60, size).astype(np.float64),
+        "fame": rng.uniform(0, 100, size),
+        "tags": rng.integers(0, tag_space, int(tag_counts.sum())),
+        "tag_owner": np.repeat(np.arange(size), tag_counts),
+    }
+
+
+def bench_scoring(sizes, repeat):
+    viewer_tags = list(range(0, 500, 40))
+    for size in sizes:
+        block = synthetic_block(size)
+        score_block(block, viewer_tags, 30)  # Calentar
+        start = time.perf_counter()
+        for _ in range(repeat):
+            scores, _ = score_block(block, viewer_tags, 30)
+            top_k(scores, block["ids"], 0, 20)
+        elapsed = time.perf_counter() - start
+        print(f"block={size:>8} {size * repeat / elapsed:>14,.0f} candidates/s "
+              f"({elapsed / repeat * 1000:.2f} ms per block)")
+
+
+def bench_database(users, queries):
+    Database.create_tables()
+    cleanup_bench_users()
+    try:
+        bulk_insert_users(users)
+        rng = random.Random(0)
+        ids = bench_user_ids()
+        sample = [(rng.choice(ids),) for _ in range(queries)]
+        scored = sum(get_suggestions(*args)["total"] for args in sample[:10]) / 10
+        timings = measure(get_suggestions, sample)
+        print(f"users={users} end-to-end: {summary(timings)} (~{scored:.0f} candidates per request)")
+    finally:
+        cleanup_bench_users()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 50000, 500000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db", type=int, metavar="USERS", help="Medir también get_suggestions con USERS usuarios")
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    bench_scoring(args.sizes, args.repeat)
+    if args.db:
+        bench_database(args.db, args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Benchmark de la búsqueda de texto: typeahead por prefijo y búsqueda ordenada.
+
+Rellena nombre, apellido, ubicación y biografía de los usuarios sintéticos
+y mide typeahead_users() y search_users() con prefijos y consultas
+aleatorias, frente a un ILIKE secuencial como referencia. Objetivo: p99 del
+typeahead por debajo de 10 ms con 1M de usuarios. Uso (desde srcs/flask):
+    python3 -m benchmarks.bench_text_search --users 1000000 --keep
+"""
+
+import argparse
+import random
+
+from models.database import Database
+from models.search_model import search_users, typeahead_users
+from benchmarks.common import (
+    BENCH_PREFIX, bulk_insert_users, bench_user_ids, cleanup_bench_users, measure, percentile, summary,
+)
+
+FIRST_NAMES = [
+    "ane", "bea", "carlos", "diego", "elena", "fatima", "gorka", "hugo", "irene", "javier", "jose", "josune",
+    "julia", "leire", "lucas", "lucia", "maite", "manuel", "maria", "marta", "mikel", "nerea", "oier", "pablo",
+    "paula", "raul", "sara", "sergio", "teresa", "unai", "xabier", "yolanda", "ainhoa", "alba", "alex", "andrea",
+    "camille", "claire", "hans", "lena", "luca", "giulia", "joao", "ines", "emma", "oliver", "noah", "mia",
+]
+LAST_NAMES = [
+    "aguirre", "alonso", "arrieta", "bengoetxea", "castro", "dominguez", "echeverria", "etxeberria", "fernandez",
+    "garcia", "garmendia", "gomez", "gonzalez", "hernandez", "iriarte", "jimenez", "lopez", "martin", "martinez",
+    "moreno", "munoz", "navarro", "ortiz", "perez", "ramos", "rodriguez", "romero", "ruiz", "sanchez", "santos",
+    "torres", "urrutia", "vazquez", "zubizarreta", "dubois", "martin", "muller", "schmidt", "rossi", "bianchi",
+    "silva", "costa", "smith", "jones", "brown", "taylor",
+]
+CITIES = ["madrid", "barcelona", "bilbao", "paris", "berlin", "london", "milano", "lisboa"]
+BIO_WORDS = [
+    "me", "gusta", "viajar", "cocinar", "leer", "montaña", "surf", "música", "cine", "fotografía", "yoga",
+    "correr", "bici", "jazz", "teatro", "pintura", "café", "perros", "gatos", "programar", "ajedrez", "escalar",
+    "bailar", "playa", "senderismo", "series", "vino", "idiomas", "guitarra", "piano",
+]
+
+
+def seed_profiles(seed, batch_size=100000):
+    """Rellena nombre, apellido, ubicación y biografía de los usuarios sintéticos que no los tienen."""
+    rng = random.Random(seed)
+    with Database.get_connection() as connection:
+        user_ids = [row["id"] for row in connection.execute(
+            "SELECT id FROM users WHERE username LIKE %s AND first_name IS NULL ORDER BY id", (f"{BENCH_PREFIX}%",)
+        ).fetchall()]
+    for offset in range(0, len(user_ids), batch_size):
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "CREATE TEMP TABLE bench_profiles (id INTEGER, first_name TEXT, last_name TEXT, "
+                    "location TEXT, biography TEXT) ON COMMIT DROP"
+                )
+                with cursor.copy("COPY bench_profiles FROM STDIN") as copy:
+                    for user_id in user_ids[offset:offset + batch_size]:
+                        copy.write_row((
+                            user_id,
+                            rng.choice(FIRST_NAMES).capitalize(),
+                            f"{rng.choice(LAST_NAMES).capitalize()} {rng.choice(LAST_NAMES).capitalize()}",
+                            rng.choice(CITIES).capitalize(),
+                            " ".join(rng.choices(BIO_WORDS, k=rng.randint(5, 25))),
+                        ))
+                cursor.execute(
+                    "UPDATE users u SET first_name = p.first_name, last_name = p.last_name, "
+                    "location = p.location, biography = p.biography FROM bench_profiles p WHERE u.id = p.id"
+                )
+    with Database.get_connection() as connection:
+        connection.execute("ANALYZE users")
+    return len(user_ids)
+
+
+def ilike_scan(prefix, limit):
+    """Referencia: lo que haría falta sin índices (ILIKE con exploración secuencial)."""
+    pattern = f"%{prefix}%"
+    with Database.get_connection() as connection:
+        return connection.execute(
+            "SELECT id, username FROM users WHERE is_active AND (username ILIKE %s OR first_name ILIKE %s "
+            "OR last_name ILIKE %s) ORDER BY fame_rating DESC LIMIT %s",
+            (pattern, pattern, pattern, limit),
+        ).fetchall()
+
+
+def random_prefix(rng):
+    word = rng.choice([rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"{rng.choice(FIRST_NAMES)} "
+                       f"{rng.choice(LAST_NAMES)}", f"{BENCH_PREFIX}{rng.randint(0, 999999)}"])
+    return word[:rng.randint(1, len(word))]
+
+
+def random_query(rng):
+    words = [rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.choice(CITIES), rng.choice(BIO_WORDS)]
+    return " ".join(rng.sample(words, rng.randint(1, 3)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="No borrar los datos sintéticos al terminar")
+    args = parser.parse_args()
+
+    Database.create_tables()
+    user_ids = bench_user_ids()
+    if len(user_ids) < args.users:
+        print(f"Inserting {args.users - len(user_ids)} users...")
+        bulk_insert_users(args.users - len(user_ids), start=len(user_ids), seed=args.seed)
+    print(f"Seeded names and biographies for {seed_profiles(args.seed)} users")
+
+    try:
+        rng = random.Random(args.seed)
+        prefixes = [(random_prefix(rng), args.limit) for _ in range(args.queries)]
+        queries = [(random_query(rng), args.limit) for _ in range(args.queries // 4)]
+
+        # Primera pasada en frío; la segunda con los índices de prefijo ya en shared_buffers
+        print(f"{'typeahead (cold)':<22} {summary(measure(typeahead_users, prefixes))}")
+        timings = measure(typeahead_users, prefixes)
+        print(f"{'typeahead':<22} {summary(timings)}")
+        print(f"{'search (relevance)':<22} {summary(measure(search_users, queries))}")
+        print(f"{'ILIKE scan (ref.)':<22} {summary(measure(ilike_scan, prefixes[:20]))}")
+
+        result = search_users(queries[0][0], args.limit)
+        pages = 1
+        while result["next_cursor"] and pages < 5:
+            result = search_users(queries[0][0], args.limit, result["next_cursor"])
+            pages += 1
+        print(f"paginated {pages} pages of {queries[0][0]!r}")
+        print(f"typeahead p99 target < 10 ms: {'OK' if percentile(timings, 99) < 10 else 'MISSED'}")
+    finally:
+        if not args.keep:
+            cleanup_bench_users()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Utilidades compartidas por los benchmarks.
+
+Los benchmarks escriben datos sintéticos (usuarios "bench_*") en la base de
+datos configurada: ejecútalos contra una base de datos desechable.
+"""
+
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from models.database import Database
+from models.geo_model import encode_geohash
+
+BENCH_PREFIX = "bench_"
+
+# Centros de población para generar coordenadas agrupadas
+CITY_CENTERS = [
+    (40.4168, -3.7038),   # Madrid
+    (41.3874, 2.1686),    # Barcelona
+    (43.2630, -2.9350),   # Bilbao
+    (48.8566, 2.3522),    # París
+    (52.5200, 13.4050),   # Berlín
+    (51.5074, -0.1278),   # Londres
+    (45.4642, 9.1900),    # Milán
+    (38.7223, -9.1393),   # Lisboa
+]
+
+GENDERS = ["male", "female", "other"]
+PREFERENCES = ["heterosexual", "homosexual", "bisexual"]
+
+
+def random_coordinates(rng):
+    """Devuelve coordenadas alrededor de una ciudad aleatoria (~50 km de dispersión)."""
+    lat, lon = rng.choice(CITY_CENTERS)
+    return lat + rng.gauss(0, 0.45), lon + rng.gauss(0, 0.6)
+
+
+def bulk_insert_users(count, start=0, seed=42, batch_size=50000):
+    """Inserta `count` usuarios sintéticos con COPY y devuelve el tiempo empleado."""
+    rng = random.Random(seed + start)
+    today = date.today()
+    columns = ("username", "email", "password_hash", "birthdate", "gender", "sexual_preferences",
+               "fame_rating", "latitude", "longitude", "geohash", "is_active")
+    begin = time.perf_counter()
+    for offset in range(start, start + count, batch_size):
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                with cursor.copy(f"COPY users ({', '.join(columns)}) FROM STDIN") as copy:
+                    for i in range(offset, min(offset + batch_size, start + count)):
+                        lat, lon = random_coordinates(rng)
+                        copy.write_row((
+                            f"{BENCH_PREFIX}{i}",
+                            f"{BENCH_PREFIX}{i}@example.com",
+                            "x",
+                            today - timedelta(days=rng.randint(18 * 365, 60 * 365)),
+                            rng.choice(GENDERS),
+                            rng.choice(PREFERENCES),
+                            round(rng.uniform(0, 100), 2),
+                            lat,
+                            lon,
+                            encode_geohash(lat, lon),
+                            True,
+                        ))
+    with Database.get_connection() as connection:
+        connection.execute("ANALYZE users")
+    return time.perf_counter() - begin
+
+
+def bench_user_ids(limit=None):
+    """Devuelve ids de usuarios sintéticos."""
+    query = "SELECT id FROM users WHERE username LIKE %s ORDER BY id"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(query, (f"{BENCH_PREFIX}%",))
+            return [row["id"] for row in cursor.fetchall()]
+
+
+def cleanup_bench_users():
+    """Elimina los usuarios sintéticos (y en cascada todos sus datos)."""
+    with Database.get_connection() as connection:
+        connection.execute("DELETE FROM users WHERE username LIKE %s", (f"{BENCH_PREFIX}%",))
+
+
+def measure(fn, args_list):
+    """Ejecuta fn(*args) para cada elemento y devuelve las latencias en ms."""
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(values, pct):
+    """Percentil por el método del rango más cercano."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summary(timings):
+    """Resume una lista de latencias en ms."""
+    return (f"p50={statistics.median(timings):.2f}ms p95={percentile(timings, 95):.2f}ms "
+            f"p99={percentile(timings, 99):.2f}ms n={len(timings)}")
@@ -0,0 +1,133 @@
+"""Prueba de carga sobre las funciones de los modelos.
+
+Lanza N hilos que ejecutan una mezcla configurable de operaciones contra
+usuarios reales de la base de datos (por ejemplo los creados con
+benchmarks.seed) y muestra latencias p50/p95/p99 y throughput por operación.
+
+Uso (desde srcs/flask):
+    python3 -m benchmarks.load_test --duration 30 --concurrency 16 \\
+        --mix get_profile=40,find_users_near=10,suggestions=5,like=10,send_message=10,chat_page=15,unread_count=10
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from models.database import Database
+from models import user_model, profile_model, likes_model, chat_model, notifications_model
+from models.geo_model import find_users_near
+from models.suggestions_model import get_suggestions
+from benchmarks.common import percentile
+
+DEFAULT_MIX = "get_user=20,get_profile=20,find_users_near=10,suggestions=5,like=10,send_message=10,chat_page=15,unread_count=10"
+
+
+class LoadContext:
+    """Usuarios de muestra sobre los que se ejecutan las operaciones."""
+
+    def __init__(self, sample_size):
+        with Database.get_connection() as connection:
+            rows = connection.execute(
+                "SELECT id FROM users TABLESAMPLE SYSTEM (10) WHERE latitude IS NOT NULL LIMIT %s", (sample_size,)
+            ).fetchall()
+            if len(rows) < 2:
+                rows = connection.execute("SELECT id FROM users LIMIT %s", (sample_size,)).fetchall()
+        self.user_ids = [row["id"] for row in rows]
+        if len(self.user_ids) < 2:
+            raise SystemExit("Not enough users: seed the database first (python3 -m benchmarks.seed)")
+
+    def user(self, rng):
+        return rng.choice(self.user_ids)
+
+    def pair(self, rng):
+        return tuple(rng.sample(self.user_ids, 2))
+
+
+# Operaciones disponibles: nombre -> función(contexto, rng)
+OPERATIONS = {
+    "get_user": lambda ctx, rng: user_model.get_user_by_id(ctx.user(rng)),
+    "get_profile": lambda ctx, rng: profile_model.get_profile_by_user_id(ctx.user(rng)),
+    "find_users_near": lambda ctx, rng: find_users_near(ctx.user(rng), 25, 20),
+    "suggestions": lambda ctx, rng: get_suggestions(ctx.user(rng)),
+    "like": lambda ctx, rng: likes_model.like_user(*ctx.pair(rng)),
+    "unlike": lambda ctx, rng: likes_model.unlike_user(*ctx.pair(rng)),
+    "send_message": lambda ctx, rng: chat_model.create_message(*ctx.pair(rng), "load test message"),
+    "chat_page": lambda ctx, rng: chat_model.get_messages_page(*ctx.pair(rng)),
+    "unread_count": lambda ctx, rng: notifications_model.unread_count(ctx.user(rng)),
+    "unread_notifications": lambda ctx, rng: notifications_model.get_unread_notifications(ctx.user(rng)),
+}
+
+
+def parse_mix(mix):
+    """Convierte "op=peso,op=peso" en un diccionario de pesos."""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {name!r}. Available: {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def worker(ctx, weights, deadline, seed, results):
+    rng = random.Random(seed)
+    names = list(weights)
+    cumulative = []
+    total = 0.0
+    for name in names:
+        total += weights[name]
+        cumulative.append(total)
+
+    timings = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, cum_weights=cumulative)[0]
+        start = time.perf_counter()
+        try:
+            OPERATIONS[name](ctx, rng)
+        except Exception:
+            errors[name] += 1
+            continue
+        timings[name].append((time.perf_counter() - start) * 1000)
+    results.append((timings, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--duration", type=float, default=30.0, help="Segundos de carga")
+    parser.add_argument("--concurrency", type=int, default=16, help="Hilos cliente")
+    parser.add_argument("--sample", type=int, default=10000, help="Usuarios de muestra")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    ctx = LoadContext(args.sample)
+    results = []
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(ctx, weights, deadline, args.seed + i, results))
+        for i in range(args.concurrency)
+    ]
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - begin
+
+    print(f"{'operation':<22}{'ops':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    total_ops = 0
+    for name in weights:
+        timings = [value for thread_timings, _ in results for value in thread_timings[name]]
+        errors = sum(thread_errors[name] for _, thread_errors in results)
+        total_ops += len(timings)
+        print(f"{name:<22}{len(timings):>8}{len(timings) / elapsed:>10.1f}{percentile(timings, 50):>10.2f}"
+              f"{percentile(timings, 95):>10.2f}{percentile(timings, 99):>10.2f}{errors:>8}")
+    print(f"total: {total_ops} ops in {elapsed:.1f}s ({total_ops / elapsed:.1f} ops/s), "
+          f"concurrency={args.concurrency}, pool={Database.get_pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
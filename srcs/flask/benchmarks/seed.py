@@ -0,0 +1,192 @@
+"""Generador de datos sintéticos realistas con Faker.
+
+Crea N usuarios (fechas de nacimiento, géneros, preferencias, coordenadas
+agrupadas en ciudades reales, biografía), sus intereses, un grafo de likes
+con perfiles populares, chats y notificaciones. Carga todo con COPY y reparte
+el trabajo entre procesos; al final deriva matches, conversaciones,
+user_stats y la fama.
+
+Uso (desde srcs/flask, contra una base de datos desechable):
+    python3 -m benchmarks.seed --users 100000 --workers 8
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+from faker import Faker
+
+from models.chat_model import rebuild_conversations
+from models.database import Database
+from models.geo_model import encode_geohash
+from models.fame_model import rebuild as rebuild_fame
+from models.likes_model import rebuild_matches
+
+COUNTRIES = ["ES", "FR", "DE", "IT", "PT", "GB", "NL", "BE"]
+GENDER_WEIGHTS = {"male": 48, "female": 48, "other": 4}
+PREFERENCE_WEIGHTS = {"heterosexual": 70, "homosexual": 10, "bisexual": 20}
+NOTIFICATION_TYPES = ["like", "visit", "message", "match"]
+PASSWORD_HASH = "pbkdf2:sha256:600000$seed$" + "0" * 64  # Hashear millones de contraseñas no aporta nada
+
+USER_COLUMNS = ("id", "username", "email", "password_hash", "first_name", "last_name", "birthdate", "gender",
+                "sexual_preferences", "biography", "location", "latitude", "longitude", "geohash",
+                "is_active", "last_seen")
+
+
+def weighted_choice(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def like_target(rng, first_id, count):
+    """Id de usuario destino de un like: el 1% de los perfiles recibe un 30% de los likes."""
+    if rng.random() < 0.3:
+        return first_id + (rng.randrange(max(1, count // 100)) * 101) % count
+    return first_id + rng.randrange(count)
+
+
+def reserve_user_ids(count):
+    """Reserva un bloque contiguo de ids de usuarios en la secuencia."""
+    with Database.get_connection() as connection:
+        first = connection.execute("SELECT nextval(pg_get_serial_sequence('users', 'id')) AS first").fetchone()["first"]
+        connection.execute("SELECT setval(pg_get_serial_sequence('users', 'id'), %s)", (first + count - 1,))
+    return first
+
+
+def seed_tags(count, seed):
+    """Crea el vocabulario de intereses y devuelve sus ids."""
+    faker = Faker()
+    faker.seed_instance(seed)
+    tags = sorted({faker.word().lower() for _ in range(count * 3)})[:count]
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO interests (tag) SELECT unnest(%s::varchar[]) ON CONFLICT (tag) DO NOTHING", (tags,)
+            )
+            cursor.execute("SELECT id FROM interests WHERE tag = ANY(%s) ORDER BY id", (tags,))
+            return [row["id"] for row in cursor.fetchall()]
+
+
+def insert_users(task):
+    """Worker: inserta los usuarios [start, end) del bloque reservado."""
+    first_id, start, end, seed = task
+    faker = Faker()
+    faker.seed_instance(seed + start)
+    rng = random.Random(seed + start)
+    now = datetime.now()
+
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            with cursor.copy(f"COPY users ({', '.join(USER_COLUMNS)}) FROM STDIN") as copy:
+                for i in range(start, end):
+                    gender = weighted_choice(rng, GENDER_WEIGHTS)
+                    first_name = faker.first_name_male() if gender == "male" else faker.first_name_female()
+                    last_name = faker.last_name()
+                    username = f"{faker.user_name()}{i}"[:50]
+                    lat, lon, city, _, _ = faker.local_latlng(country_code=rng.choice(COUNTRIES))
+                    # Dispersión de unos kilómetros alrededor de la ciudad
+                    lat = float(lat) + rng.gauss(0, 0.05)
+                    lon = float(lon) + rng.gauss(0, 0.05)
+                    copy.write_row((
+                        first_id + i, username, f"{username}@{faker.free_email_domain()}"[:100], PASSWORD_HASH,
+                        first_name, last_name, faker.date_of_birth(minimum_age=18, maximum_age=70), gender,
+                        weighted_choice(rng, PREFERENCE_WEIGHTS), faker.paragraph(nb_sentences=3), city,
+                        lat, lon, encode_geohash(lat, lon), True,
+                        now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+                    ))
+    return end - start
+
+
+def insert_relations(task):
+    """Worker: intereses, likes, chats y notificaciones de los usuarios [start, end)."""
+    first_id, total, start, end, tag_ids, options, seed = task
+    rng = random.Random(seed * 7 + start)
+    faker = Faker()
+    faker.seed_instance(seed * 7 + start)
+    base_time = datetime.now() - timedelta(days=90)
+    likes = []
+    counts = {"interests": 0, "likes": 0, "chats": 0, "notifications": 0}
+
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            with cursor.copy("COPY user_interests (user_id, interest_id) FROM STDIN") as copy:
+                for user_id in range(first_id + start, first_id + end):
+                    for tag_id in set(rng.choices(tag_ids, k=rng.randint(2, 8))):
+                        copy.write_row((user_id, tag_id))
+                        counts["interests"] += 1
+
+            with cursor.copy("COPY likes (user_id, liked_user_id, timestamp) FROM STDIN") as copy:
+                for user_id in range(first_id + start, first_id + end):
+                    targets = {like_target(rng, first_id, total) for _ in range(rng.randint(0, options.likes * 2))}
+                    targets.discard(user_id)
+                    for target in targets:
+                        when = base_time + timedelta(seconds=rng.randint(0, 90 * 86400))
+                        copy.write_row((user_id, target, when))
+                        likes.append((user_id, target, when))
+                    counts["likes"] += len(targets)
+
+            with cursor.copy("COPY notifications (user_id, type, message, timestamp, is_read) FROM STDIN") as copy:
+                for user_id, target, when in likes[:options.notifications * (end - start)]:
+                    copy.write_row((target, rng.choice(NOTIFICATION_TYPES), faker.sentence(), when, rng.random() < 0.7))
+                    counts["notifications"] += 1
+
+            with cursor.copy("COPY chats (sender_id, receiver_id, message, timestamp) FROM STDIN") as copy:
+                for user_id, target, when in rng.sample(likes, min(len(likes), options.conversations * (end - start))):
+                    for n in range(rng.randint(1, options.messages * 2)):
+                        sender, receiver = (user_id, target) if n % 2 == 0 else (target, user_id)
+                        copy.write_row((sender, receiver, faker.sentence(), when + timedelta(minutes=n)))
+                        counts["chats"] += 1
+    return counts
+
+
+def chunks(total, size):
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="Número de usuarios (1k a 5M)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=10000, help="Usuarios por tarea/COPY")
+    parser.add_argument("--tags", type=int, default=300, help="Tamaño del vocabulario de intereses")
+    parser.add_argument("--likes", type=int, default=10, help="Likes medios por usuario")
+    parser.add_argument("--conversations", type=int, default=1, help="Conversaciones por usuario")
+    parser.add_argument("--messages", type=int, default=10, help="Mensajes medios por conversación")
+    parser.add_argument("--notifications", type=int, default=5, help="Notificaciones por usuario")
+    parser.add_argument("--seed", type=int, default=42)
+    options = parser.parse_args()
+
+    Database.create_tables()
+    begin = time.perf_counter()
+    tag_ids = seed_tags(options.tags, options.seed)
+    first_id = reserve_user_ids(options.users)
+    ranges = chunks(options.users, options.batch)
+    # Cerrar el pool antes de crear procesos: cada worker abre el suyo
+    Database.close_pool()
+
+    with Pool(options.workers) as pool:
+        inserted = sum(pool.imap_unordered(insert_users, [(first_id, s, e, options.seed) for s, e in ranges]))
+        print(f"users: {inserted} in {time.perf_counter() - begin:.1f}s")
+
+        totals = {}
+        relation_tasks = [(first_id, options.users, s, e, tag_ids, options, options.seed) for s, e in ranges]
+        for counts in pool.imap_unordered(insert_relations, relation_tasks):
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+        print(f"relations: {totals} in {time.perf_counter() - begin:.1f}s")
+
+    # COPY no pasa por like_user ni create_message: matches y conversaciones se derivan al final
+    print(f"matches: {rebuild_matches()} in {time.perf_counter() - begin:.1f}s")
+    print(f"conversations: {rebuild_conversations()} in {time.perf_counter() - begin:.1f}s")
+    # Tampoco pasa por los contadores: user_stats y la fama se recalculan desde likes y visitas
+    processed, _ = rebuild_fame()
+    print(f"user_stats: {processed} users in {time.perf_counter() - begin:.1f}s")
+
+    with Database.get_connection() as connection:
+        connection.execute("ANALYZE")
+    print(f"Seeded {options.users} users in {time.perf_counter() - begin:.1f}s (first id {first_id})")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,12 +12,33 @@
 
 import os
 
-DEBUG = True
+# "development": servidor de Flask con recarga; "production": gunicorn (gunicorn.conf.py)
+ENV = os.getenv('MATCHA_ENV', 'development')
+DEBUG = os.getenv('DEBUG', str(ENV == 'development')).lower() == 'true'
+
+# Firma de la sesión de Flask y de los tokens del flujo de eventos
+SECRET_KEY = os.getenv('SECRET_KEY')
 
 class RunConfig:
-    HOST = '0.0.0.0'
-    PORT = 5000
+    HOST = os.getenv('HOST', '0.0.0.0')
+    PORT = int(os.getenv('PORT', 5000))
     DEBUG = DEBUG
+    SECRET_KEY = SECRET_KEY
+
+class ServerConfig:
+    # 0 = calcular a partir de los núcleos (2 * núcleos + 1)
+    WORKERS = int(os.getenv('GUNICORN_WORKERS', 0))
+    # "gthread" (hilos por worker), "sync" o una clase asíncrona instalada aparte ("gevent")
+    WORKER_CLASS = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+    THREADS = int(os.getenv('GUNICORN_THREADS', 4))
+    WORKER_CONNECTIONS = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+    KEEPALIVE = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+    TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', 30))
+    GRACEFUL_TIMEOUT = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+    # Reciclar workers tras N peticiones (con jitter para no reiniciarlos a la vez)
+    MAX_REQUESTS = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+    MAX_REQUESTS_JITTER = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+    BACKLOG = int(os.getenv('GUNICORN_BACKLOG', 2048))
 
 class DatabaseConfig:
     POSTGRES_DB = os.getenv('POSTGRES_DB')
@@ -26,3 +47,120 @@ class DatabaseConfig:
     POSTGRES_HOST = os.getenv('POSTGRES_HOST')
     DEBUG = DEBUG
 
+    # Pool de conexiones (tiempos en segundos)
+    POOL_MIN_SIZE = int(os.getenv('POSTGRES_POOL_MIN_SIZE', 2))
+    POOL_MAX_SIZE = int(os.getenv('POSTGRES_POOL_MAX_SIZE', 10))
+    POOL_MAX_IDLE = float(os.getenv('POSTGRES_POOL_MAX_IDLE', 600))
+    POOL_MAX_LIFETIME = float(os.getenv('POSTGRES_POOL_MAX_LIFETIME', 3600))
+    POOL_TIMEOUT = float(os.getenv('POSTGRES_POOL_TIMEOUT', 30))
+    POOL_MAX_WAITING = int(os.getenv('POSTGRES_POOL_MAX_WAITING', 50))
+
+    # Sentencias preparadas por conexión (desactivar detrás de pgbouncer en modo transacción)
+    PREPARE_STATEMENTS = os.getenv('POSTGRES_PREPARE_STATEMENTS', 'true').lower() == 'true'
+    # Filas por viaje al recorrer un cursor del servidor
+    STREAM_ITERSIZE = int(os.getenv('POSTGRES_STREAM_ITERSIZE', 2000))
+
+    # Pool asíncrono (models/aio): uno por proceso, compartido por todas las corrutinas
+    ASYNC_POOL_MIN_SIZE = int(os.getenv('POSTGRES_ASYNC_POOL_MIN_SIZE', 2))
+    ASYNC_POOL_MAX_SIZE = int(os.getenv('POSTGRES_ASYNC_POOL_MAX_SIZE', 20))
+    ASYNC_POOL_MAX_WAITING = int(os.getenv('POSTGRES_ASYNC_POOL_MAX_WAITING', 0))  # 0: sin límite
+
+class SuggestionConfig:
+    # Pesos de cada componente de la puntuación de sugerencias
+    WEIGHT_DISTANCE = float(os.getenv('SUGGESTION_WEIGHT_DISTANCE', 0.4))
+    WEIGHT_TAGS = float(os.getenv('SUGGESTION_WEIGHT_TAGS', 0.3))
+    WEIGHT_FAME = float(os.getenv('SUGGESTION_WEIGHT_FAME', 0.15))
+    WEIGHT_AGE = float(os.getenv('SUGGESTION_WEIGHT_AGE', 0.15))
+    DISTANCE_SCALE_KM = float(os.getenv('SUGGESTION_DISTANCE_SCALE_KM', 20))
+    AGE_SCALE_YEARS = float(os.getenv('SUGGESTION_AGE_SCALE_YEARS', 6))
+    MAX_DISTANCE_KM = float(os.getenv('SUGGESTION_MAX_DISTANCE_KM', 100))
+    MAX_CANDIDATES = int(os.getenv('SUGGESTION_MAX_CANDIDATES', 5000))
+
+class CacheConfig:
+    MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+    TTL = float(os.getenv('CACHE_TTL', 60))
+    # 'local': solo en este proceso; 'postgres': invalidaciones compartidas vía LISTEN/NOTIFY
+    BACKEND = os.getenv('CACHE_BACKEND', 'local')
+
+class RealtimeConfig:
+    HOST = os.getenv('REALTIME_HOST', '0.0.0.0')
+    PORT = int(os.getenv('REALTIME_PORT', 5001))
+    HEARTBEAT = float(os.getenv('REALTIME_HEARTBEAT', 25))
+    CLIENT_QUEUE_SIZE = int(os.getenv('REALTIME_CLIENT_QUEUE_SIZE', 100))
+    ALLOW_ORIGIN = os.getenv('REALTIME_ALLOW_ORIGIN', '*')
+    TOKEN_SECRET = SECRET_KEY
+    TOKEN_TTL = int(os.getenv('REALTIME_TOKEN_TTL', 3600))
+
+class NotificationConfig:
+    # Escritura por lotes: se vuelca al llegar a BATCH_SIZE filas o a MAX_DELAY segundos
+    BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', 500))
+    MAX_DELAY = float(os.getenv('NOTIFICATION_MAX_DELAY', 1.0))
+    MAX_PENDING = int(os.getenv('NOTIFICATION_MAX_PENDING', 100000))
+    # Volcados fallidos que aguanta una entrada antes de descartarse
+    MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', 5))
+
+class VisitConfig:
+    # Visitas repetidas del mismo visitante dentro de la ventana (segundos) no cuentan
+    DEDUPE_WINDOW = float(os.getenv('VISIT_DEDUPE_WINDOW', 1800))
+    # Volcado por lotes: cada FLUSH_INTERVAL segundos o al llegar a BATCH_SIZE visitas
+    FLUSH_INTERVAL = float(os.getenv('VISIT_FLUSH_INTERVAL', 5.0))
+    BATCH_SIZE = int(os.getenv('VISIT_BATCH_SIZE', 2000))
+    MAX_PENDING = int(os.getenv('VISIT_MAX_PENDING', 200000))
+    NOTIFY = os.getenv('VISIT_NOTIFY', 'true').lower() == 'true'
+
+class FameConfig:
+    # Peso de cada componente de la fama (popularidad, likes por visita, matches por like dado)
+    WEIGHT_POPULARITY = float(os.getenv('FAME_WEIGHT_POPULARITY', 0.6))
+    WEIGHT_LIKE_RATIO = float(os.getenv('FAME_WEIGHT_LIKE_RATIO', 0.25))
+    WEIGHT_MATCH_RATE = float(os.getenv('FAME_WEIGHT_MATCH_RATE', 0.15))
+    # Segundos entre pasadas incrementales y usuarios por lote
+    PASS_INTERVAL = float(os.getenv('FAME_PASS_INTERVAL', 60))
+    BATCH_SIZE = int(os.getenv('FAME_BATCH_SIZE', 100000))
+    # Segundos que se reutiliza la distribución global de likes recibidos
+    DISTRIBUTION_TTL = float(os.getenv('FAME_DISTRIBUTION_TTL', 3600))
+
+class SearchConfig:
+    DEFAULT_LIMIT = int(os.getenv('SEARCH_DEFAULT_LIMIT', 20))
+    MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', 100))
+    # Radio aplicado al ordenar por distancia sin filtro de distancia
+    DEFAULT_DISTANCE_KM = float(os.getenv('SEARCH_DEFAULT_DISTANCE_KM', 100))
+    # Máximo de ids del índice de tags que se pasan como array a la consulta
+    MAX_ID_LIST = int(os.getenv('SEARCH_MAX_ID_LIST', 50000))
+    # Segundos que se reutilizan las estadísticas de pg_stats del planificador
+    STATS_TTL = float(os.getenv('SEARCH_STATS_TTL', 300))
+    # Búsqueda de texto: términos por consulta y candidatos leídos por rama del typeahead
+    TEXT_MAX_TERMS = int(os.getenv('SEARCH_TEXT_MAX_TERMS', 8))
+    # Candidatos por rama de search_users, ya ordenados por relevancia (se puntúan todos)
+    TEXT_MAX_CANDIDATES = int(os.getenv('SEARCH_TEXT_MAX_CANDIDATES', 500))
+    TYPEAHEAD_LIMIT = int(os.getenv('SEARCH_TYPEAHEAD_LIMIT', 10))
+    TYPEAHEAD_MAX_LIMIT = int(os.getenv('SEARCH_TYPEAHEAD_MAX_LIMIT', 20))
+    TYPEAHEAD_CANDIDATES = int(os.getenv('SEARCH_TYPEAHEAD_CANDIDATES', 50))
+
+class PresenceConfig:
+    # Segundos sin heartbeat para considerar a un usuario desconectado
+    TIMEOUT = float(os.getenv('PRESENCE_TIMEOUT', 60))
+    FLUSH_INTERVAL = float(os.getenv('PRESENCE_FLUSH_INTERVAL', 30))
+    RESOLUTION = float(os.getenv('PRESENCE_RESOLUTION', 1))
+    # "local" (un proceso) o "shared" (fichero mapeado compartido por los workers)
+    BACKEND = os.getenv('PRESENCE_BACKEND', 'local')
+    SHARED_PATH = os.getenv('PRESENCE_SHARED_PATH', '/dev/shm/matcha_presence')
+    SHARED_CAPACITY = int(os.getenv('PRESENCE_SHARED_CAPACITY', 1 << 20))
+
+class ImageConfig:
+    # Directorio de las imágenes (nombre = hash del contenido) y sus miniaturas
+    STORAGE_DIR = os.getenv('IMAGE_STORAGE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media'))
+    MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+    MAX_PICTURES = int(os.getenv('IMAGE_MAX_PICTURES', 5))
+    # Lado mayor (px) de cada miniatura
+    THUMBNAIL_SIZES = tuple(int(size) for size in os.getenv('IMAGE_THUMBNAIL_SIZES', '128,320,640').split(','))
+    THUMBNAIL_WORKERS = int(os.getenv('IMAGE_THUMBNAIL_WORKERS', 2))
+    CACHE_MAX_AGE = int(os.getenv('IMAGE_CACHE_MAX_AGE', 31536000))
+
+class InstrumentationConfig:
+    ENABLED = os.getenv('DB_INSTRUMENTATION', 'true').lower() == 'true'
+    SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 100))
+    EXPLAIN_SLOW_QUERIES = os.getenv('DB_EXPLAIN_SLOW_QUERIES', 'true').lower() == 'true'
+    SLOW_QUERY_LOG_SIZE = int(os.getenv('DB_SLOW_QUERY_LOG_SIZE', 50))
+    # Misma sentencia repetida N veces en una petición -> posible N+1
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('DB_N_PLUS_ONE_THRESHOLD', 10))
+    STATEMENT_MAX_LENGTH = 300
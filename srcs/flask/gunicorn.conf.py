@@ -0,0 +1,70 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    gunicorn.conf.py                                   :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 21:05:42 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 21:05:42 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Configuración de gunicorn para producción.
+
+    python3 -m gunicorn -c gunicorn.conf.py run:app
+
+La aplicación se importa una vez en el proceso maestro (preload_app) y los
+workers se crean con fork, compartiendo esas páginas de memoria. El pool de
+conexiones, la caché y los hilos de fondo detectan el fork y se crean de
+nuevo en cada worker.
+
+Señales al maestro:
+- HUP: reinicia los workers de forma ordenada (terminan sus peticiones).
+- USR2 y después WINCH/TERM al maestro antiguo: despliegue de código nuevo
+  sin cortar conexiones (con preload_app, HUP no vuelve a importar el código).
+"""
+
+import multiprocessing
+
+from config import RunConfig, ServerConfig as Config, DatabaseConfig
+
+bind = f"{RunConfig.HOST}:{RunConfig.PORT}"
+workers = Config.WORKERS or multiprocessing.cpu_count() * 2 + 1
+worker_class = Config.WORKER_CLASS
+threads = Config.THREADS
+worker_connections = Config.WORKER_CONNECTIONS
+preload_app = True
+keepalive = Config.KEEPALIVE
+timeout = Config.TIMEOUT
+graceful_timeout = Config.GRACEFUL_TIMEOUT
+max_requests = Config.MAX_REQUESTS
+max_requests_jitter = Config.MAX_REQUESTS_JITTER
+backlog = Config.BACKLOG
+accesslog = "-"
+errorlog = "-"
+# Heartbeat de los workers en memoria y no en el disco del contenedor
+worker_tmp_dir = "/dev/shm"
+
+
+def when_ready(server):
+    # Esquema al día antes de aceptar peticiones (conexión dedicada: el maestro no abre el pool)
+    from run import ensure_schema
+    ensure_schema()
+    # Cada worker tiene su propio pool: el total debe caber en max_connections de Postgres
+    server.log.info(f"{workers} workers x {DatabaseConfig.POOL_MAX_SIZE} connections "
+                    f"= up to {workers * DatabaseConfig.POOL_MAX_SIZE} database connections")
+
+
+def post_fork(server, worker):
+    # El índice de tags se carga al arrancar el worker y no en su primera petición
+    from models.tag_index import tag_index
+    tag_index.ensure_loaded()
+
+
+def worker_exit(server, worker):
+    # Volcar lo que los escritores por lotes tengan pendiente antes de salir
+    from models.notification_writer import notification_writer
+    from models.visits_model import visit_buffer
+    visit_buffer.close()
+    notification_writer.close()
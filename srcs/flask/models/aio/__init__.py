@@ -0,0 +1,28 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    __init__.py                                        :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 22:48:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 22:48:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Versión asíncrona de los modelos, sobre AsyncConnection y un pool asíncrono.
+
+Mismas funciones, validaciones y sentencias registradas que los módulos
+síncronos de models/, pero como corrutinas: una vista async puede lanzar
+consultas independientes a la vez con asyncio.gather y no ocupa un hilo
+mientras espera a Postgres.
+
+    from models.aio import profile_model, pictures_model
+    profile, pictures = await asyncio.gather(
+        profile_model.get_profile_by_user_id(user_id),
+        pictures_model.get_pictures_by_user(user_id),
+    )
+
+Las vistas async de Flask se ejecutan en el bucle del proceso (ver
+run_coroutine en models/aio/database.py).
+"""
@@ -0,0 +1,46 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    blocks_model.py                                    :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 23:58:31 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 23:58:31 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .queries import fetch_all
+from ..cache import profile_cache
+from ..blocks_model import GET_BLOCK_SETS, block_tag
+from psycopg.rows import tuple_row
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def get_block_sets_many(user_ids):
+    """Conjuntos de bloqueos de varios usuarios: {id: frozenset} (misma caché que blocks_model)."""
+    async def load(missing):
+        block_sets = {user_id: set() for user_id in missing}
+        try:
+            for user_id, other_id in await fetch_all(GET_BLOCK_SETS, {"ids": missing}, row_factory=tuple_row):
+                block_sets[user_id].add(other_id)
+        except Exception as e:
+            logger.error(f"Error loading block sets for users {missing}: {e}")
+            raise Exception("Error loading block sets") from e
+        return {user_id: frozenset(blocked) for user_id, blocked in block_sets.items()}
+
+    return await profile_cache.get_many_or_load_async(
+        user_ids, lambda user_id: f"blocks:{user_id}", load, lambda user_id: (block_tag(user_id),)
+    )
+
+async def get_block_set(user_id):
+    """Usuarios que user_id no debe ver (bloqueados por él o que le han bloqueado)."""
+    if not user_id:
+        raise ValueError("user_id is required to fetch blocks.")
+    return (await get_block_sets_many([user_id]))[user_id]
+
+async def resolve_blocked(user_id, blocked_ids=None):
+    """Bloqueos que aplica un listado de user_id: los recibidos o, si no hay, los de la caché."""
+    return await get_block_set(user_id) if blocked_ids is None else blocked_ids
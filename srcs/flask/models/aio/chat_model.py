@@ -0,0 +1,138 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    chat_model.py                                      :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 22:48:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 22:48:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .database import AsyncDatabase
+from .queries import run, fetch_one, fetch_all, stream
+from ..events import publish_event_async
+from .blocks_model import get_block_set, resolve_blocked
+from .user_model import get_user_by_id
+from ..notification_writer import queue_event_notification
+from ..chat_model import (
+    DEFAULT_PAGE_SIZE, INSERT_MESSAGE, GET_CONVERSATION, GET_MESSAGES_PAGE, _page_query, _build_page,
+    INBOX_PAGE_SIZE, GET_INBOX, COUNT_UNREAD_MESSAGES, MARK_CONVERSATIONS_READ, MARK_ALL_CONVERSATIONS_READ,
+    _inbox_params,
+)
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def create_message(sender_id, receiver_id, message):
+    """Crea un nuevo mensaje en el chat."""
+    if not sender_id or not receiver_id or not message:
+        raise ValueError("sender_id, receiver_id, and message are required to create a message.")
+    if receiver_id in await get_block_set(sender_id):
+        raise ValueError(f"User {sender_id} cannot message user {receiver_id}: blocked.")
+
+    try:
+        async with AsyncDatabase.get_connection() as connection:
+            async with connection.cursor() as cursor:
+                result = await (await run(cursor, INSERT_MESSAGE, (sender_id, receiver_id, message))).fetchone()
+                await publish_event_async(cursor, "message", (sender_id, receiver_id), result)
+                await connection.commit()
+    except Exception as e:
+        logger.error(f"Error creating message from {sender_id} to {receiver_id}: {e}")
+        raise Exception(f"Error creating message from {sender_id} to {receiver_id}") from e
+    await notify_message(sender_id, receiver_id)
+    return result
+
+async def notify_message(sender_id, receiver_id):
+    """Encola el aviso del mensaje para el receptor; un fallo aquí no deshace el mensaje."""
+    try:
+        queue_event_notification(receiver_id, "message", await get_user_by_id(sender_id))
+    except Exception as e:
+        logger.error(f"Error notifying message from {sender_id} to {receiver_id}: {e}")
+
+async def get_messages_between_users(user1_id, user2_id, blocked_ids=None):
+    """Obtiene los mensajes entre dos usuarios (ninguno si hay un bloqueo entre ellos)."""
+    if not user1_id or not user2_id:
+        raise ValueError("Both user1_id and user2_id are required to fetch messages.")
+    if user2_id in await resolve_blocked(user1_id, blocked_ids):
+        return []
+
+    try:
+        return await fetch_all(GET_CONVERSATION, (user1_id, user2_id, user1_id, user2_id))
+    except Exception as e:
+        logger.error(f"Error fetching messages between {user1_id} and {user2_id}: {e}")
+        raise Exception(f"Error fetching messages between {user1_id} and {user2_id}") from e
+
+async def iter_messages_between_users(user1_id, user2_id, blocked_ids=None):
+    """Recorre toda la conversación en orden cronológico con memoria constante."""
+    if not user1_id or not user2_id:
+        raise ValueError("Both user1_id and user2_id are required to fetch messages.")
+    if user2_id in await resolve_blocked(user1_id, blocked_ids):
+        return
+
+    try:
+        async for message in stream(GET_CONVERSATION, (user1_id, user2_id, user1_id, user2_id)):
+            yield message
+    except Exception as e:
+        logger.error(f"Error streaming messages between {user1_id} and {user2_id}: {e}")
+        raise Exception(f"Error fetching messages between {user1_id} and {user2_id}") from e
+
+async def get_messages_page(user1_id, user2_id, limit=DEFAULT_PAGE_SIZE, before=None, after=None, blocked_ids=None):
+    """Obtiene una página de la conversación (mismo formato que chat_model.get_messages_page)."""
+    mode, params = _page_query(user1_id, user2_id, limit, before, after)
+    if user2_id in await resolve_blocked(user1_id, blocked_ids):
+        return _build_page([], mode, limit, before, after)
+    try:
+        messages = await fetch_all(GET_MESSAGES_PAGE[mode], params)
+    except Exception as e:
+        logger.error(f"Error fetching message page between {user1_id} and {user2_id}: {e}")
+        raise Exception(f"Error fetching messages between {user1_id} and {user2_id}") from e
+    return _build_page(messages, mode, limit, before, after)
+
+async def get_inbox(user_id, limit=INBOX_PAGE_SIZE, before=None, blocked_ids=None):
+    """Conversaciones más recientes de un usuario (mismo formato que chat_model.get_inbox)."""
+    params = _inbox_params(user_id, limit, before)
+    params["blocked_ids"] = list(await resolve_blocked(user_id, blocked_ids))
+    try:
+        return await fetch_all(GET_INBOX, params)
+    except Exception as e:
+        logger.error(f"Error fetching inbox for user {user_id}: {e}")
+        raise Exception(f"Error fetching inbox for user {user_id}") from e
+
+async def unread_messages_count(user_id, blocked_ids=None):
+    """Conversaciones y mensajes sin leer: {"conversations", "messages"}."""
+    if not user_id:
+        raise ValueError("user_id is required to count unread messages.")
+    params = {"user": user_id, "blocked_ids": list(await resolve_blocked(user_id, blocked_ids))}
+    try:
+        return await fetch_one(COUNT_UNREAD_MESSAGES, params)
+    except Exception as e:
+        logger.error(f"Error counting unread messages for user {user_id}: {e}")
+        raise Exception(f"Error counting unread messages for user {user_id}") from e
+
+async def mark_conversations_read(user_id, other_ids=None):
+    """Marca como leídas las conversaciones con other_ids (todas si es None) en un solo UPDATE."""
+    if not user_id:
+        raise ValueError("user_id is required to mark conversations as read.")
+    if other_ids is not None and not other_ids:
+        return []
+
+    try:
+        async with AsyncDatabase.get_connection() as connection:
+            async with connection.cursor() as cursor:
+                if other_ids is None:
+                    rows = await (await run(cursor, MARK_ALL_CONVERSATIONS_READ, {"user": user_id})).fetchall()
+                else:
+                    params = {"user": user_id, "others": list(other_ids)}
+                    rows = await (await run(cursor, MARK_CONVERSATIONS_READ, params)).fetchall()
+                updated = [row["other_id"] for row in rows]
+                if updated:
+                    await publish_event_async(cursor, "read", (user_id, *updated),
+                                              {"user_id": user_id, "other_ids": updated})
+                await connection.commit()
+                return updated
+    except Exception as e:
+        logger.error(f"Error marking conversations as read for user {user_id}: {e}")
+        raise Exception(f"Error marking conversations as read for user {user_id}") from e
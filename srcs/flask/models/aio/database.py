@@ -0,0 +1,187 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    database.py                                        :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 22:48:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 22:48:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Conexiones asíncronas: AsyncDatabase y el bucle de eventos del proceso.
+
+Un AsyncConnectionPool pertenece al bucle de eventos en el que se abrió.
+Las corrutinas de la aplicación (vistas async de Flask, benchmarks) se
+ejecutan en un único bucle por proceso, en un hilo propio: run_coroutine()
+las envía desde cualquier hilo y espera el resultado.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool, PoolTimeout, TooManyRequests
+from config import DatabaseConfig as Config
+from ..database import Database
+from ..instrumentation import AsyncInstrumentedCursor, metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+
+class AsyncDatabase:
+    """Equivalente asíncrono de Database: pool de AsyncConnection por proceso y bucle."""
+
+    _pool = None
+    _pool_pid = None
+    _pool_loop = None
+    _stats = {"checkouts": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "errors": 0}
+
+    @staticmethod
+    async def get_dedicated_connection(autocommit=True):
+        """Abre una conexión asíncrona fuera del pool (LISTEN, operaciones largas)."""
+        Database.validate_config()
+        return await psycopg.AsyncConnection.connect(autocommit=autocommit, **Database.connection_kwargs())
+
+    @staticmethod
+    async def get_pool():
+        """Devuelve el pool del bucle actual, abriéndolo la primera vez."""
+        loop = asyncio.get_running_loop()
+        pool = AsyncDatabase._pool
+        if pool is not None and AsyncDatabase._pool_pid == os.getpid() and AsyncDatabase._pool_loop is loop:
+            return pool
+
+        # Todas las corrutinas de un bucle corren en el mismo hilo: no hace falta lock
+        Database.validate_config()
+        if pool is not None and AsyncDatabase._pool_pid == os.getpid():
+            # Sus conexiones pertenecen a otro bucle y no se pueden usar (ni cerrar) desde este
+            logger.warning("Async pool reopened for a different event loop")
+        pool = AsyncConnectionPool(
+            kwargs={**Database.connection_kwargs(), "cursor_factory": AsyncInstrumentedCursor},
+            min_size=Config.ASYNC_POOL_MIN_SIZE,
+            max_size=Config.ASYNC_POOL_MAX_SIZE,
+            max_idle=Config.POOL_MAX_IDLE,
+            max_lifetime=Config.POOL_MAX_LIFETIME,
+            timeout=Config.POOL_TIMEOUT,
+            max_waiting=Config.ASYNC_POOL_MAX_WAITING,
+            check=AsyncConnectionPool.check_connection,
+            name="matcha-async",
+            open=False,
+        )
+        AsyncDatabase._pool, AsyncDatabase._pool_pid, AsyncDatabase._pool_loop = pool, os.getpid(), loop
+        AsyncDatabase._stats = {"checkouts": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "errors": 0}
+        await pool.open()
+        return pool
+
+    @staticmethod
+    @asynccontextmanager
+    async def get_connection():
+        """Obtiene una conexión del pool; al salir hace commit/rollback y la devuelve."""
+        try:
+            pool = await AsyncDatabase.get_pool()
+            start = time.perf_counter()
+            connection = await pool.getconn()
+        except (psycopg.Error, PoolTimeout, TooManyRequests, ValueError) as e:
+            AsyncDatabase._stats["errors"] += 1
+            logger.error(f"Error connecting to the database: {e}")
+            raise Exception(f"Database connection failed: {e}") from e
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        AsyncDatabase._stats["checkouts"] += 1
+        AsyncDatabase._stats["wait_ms_total"] += wait_ms
+        AsyncDatabase._stats["wait_ms_max"] = max(AsyncDatabase._stats["wait_ms_max"], wait_ms)
+        metrics.record_acquire(wait_ms)
+
+        try:
+            async with connection:
+                yield connection
+        finally:
+            await pool.putconn(connection)
+
+    @staticmethod
+    def get_pool_stats():
+        """Estadísticas del pool asíncrono del proceso (mismo formato que Database)."""
+        if AsyncDatabase._pool is None or AsyncDatabase._pool_pid != os.getpid():
+            return {}
+
+        stats = dict(AsyncDatabase._pool.get_stats())
+        stats.update(AsyncDatabase._stats)
+        stats["in_use"] = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+        stats["wait_ms_avg"] = stats["wait_ms_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        return stats
+
+    @staticmethod
+    async def close_pool():
+        """Cierra el pool del proceso (desde su propio bucle)."""
+        pool = AsyncDatabase._pool
+        if pool is not None and AsyncDatabase._pool_pid == os.getpid() \
+                and AsyncDatabase._pool_loop is asyncio.get_running_loop():
+            await pool.close()
+        AsyncDatabase._pool = AsyncDatabase._pool_pid = AsyncDatabase._pool_loop = None
+
+
+def get_loop():
+    """Bucle de eventos compartido del proceso, en un hilo daemon (uno por worker)."""
+    global _loop, _loop_pid
+    if _loop is not None and _loop_pid == os.getpid():
+        return _loop
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-models", daemon=True).start()
+            _loop, _loop_pid = loop, os.getpid()
+    return _loop
+
+
+def run_coroutine(coroutine, timeout=None):
+    """Ejecuta una corrutina en el bucle del proceso y bloquea el hilo actual hasta su resultado.
+
+    La tarea se crea dentro de una copia del contexto de quien llama, así que
+    las ContextVar (petición de Flask, contador de consultas, dataloader)
+    siguen visibles desde la corrutina.
+    """
+    loop = get_loop()
+    result = concurrent.futures.Future()
+    context = contextvars.copy_context()
+
+    def copy_result(task):
+        if task.cancelled():
+            result.set_exception(concurrent.futures.CancelledError())
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    def start():
+        if not result.set_running_or_notify_cancel():
+            coroutine.close()
+            return
+        loop.create_task(coroutine).add_done_callback(copy_result)
+
+    loop.call_soon_threadsafe(start, context=context)
+    return result.result(timeout)
+
+
+def _close_process_pool():
+    # El pool del bucle compartido se cierra desde ese mismo bucle
+    if _loop is not None and _loop_pid == os.getpid() and AsyncDatabase._pool_loop is _loop:
+        try:
+            run_coroutine(AsyncDatabase.close_pool(), timeout=5)
+        except Exception as e:
+            logger.error(f"Error closing async pool: {e}")
+
+
+atexit.register(_close_process_pool)
@@ -0,0 +1,161 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    likes_model.py                                     :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 22:48:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 22:48:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .database import AsyncDatabase
+from .queries import run, fetch_all, stream
+from .blocks_model import resolve_blocked
+from .user_model import get_users_many
+from ..events import publish_event_async
+from ..fame_model import UPDATE_LIKE_COUNTERS
+from ..notification_writer import queue_like_notifications
+from ..likes_model import (
+    validate_parameters, LOCK_LIKE_PAIR, INSERT_LIKE, DELETE_LIKE, INSERT_MATCH, DELETE_MATCH,
+    GET_LIKED_USERS, GET_LIKERS, IS_MATCH, GET_MATCHES, MATCH_STATUS,
+)
+from psycopg.rows import tuple_row
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Función común para ejecutar consultas de lectura
+async def execute_read_query(query, params, row_factory=None):
+    """Ejecuta una consulta de lectura registrada (SELECT)."""
+    try:
+        return await fetch_all(query, params, row_factory=row_factory)
+    except Exception as e:
+        logger.error(f"Database error: {e}")
+        raise Exception("Database read operation failed.") from e
+
+# Avisos del like/unlike, encolados en el escritor por lotes tras el commit
+async def notify_like(user_id, liked_user_id, delta, matched):
+    """Encola las notificaciones de like, match y unlike; un fallo aquí no deshace el like."""
+    if delta < 0 and not matched:
+        return
+    try:
+        users = await get_users_many((user_id, liked_user_id))
+        queue_like_notifications(users, user_id, liked_user_id, delta, matched)
+    except Exception as e:
+        logger.error(f"Error notifying like {user_id} -> {liked_user_id}: {e}")
+
+# Escritura de un like/unlike junto con los contadores de fama y el match, en una transacción
+async def execute_like_write(query, user_id, liked_user_id, delta):
+    """Ejecuta el INSERT/DELETE del like y, si cambia algo, actualiza contadores y match."""
+    params = {"liker": user_id, "liked": liked_user_id}
+    try:
+        async with AsyncDatabase.get_connection() as connection:
+            async with connection.cursor() as cursor:
+                await run(cursor, LOCK_LIKE_PAIR, params)
+                rowcount = (await run(cursor, query, (user_id, liked_user_id))).rowcount
+                matched = False
+                if rowcount > 0:
+                    await run(cursor, UPDATE_LIKE_COUNTERS, {**params, "delta": delta})
+                    await run(cursor, INSERT_MATCH if delta > 0 else DELETE_MATCH, params)
+                    matched = cursor.rowcount > 0
+                    if matched:
+                        event_type = "match" if delta > 0 else "unmatch"
+                        await publish_event_async(cursor, event_type, (user_id, liked_user_id),
+                                                  {"user_id": user_id, "liked_user_id": liked_user_id})
+                        logger.info(f"Users {user_id} and {liked_user_id}: {event_type}.")
+                await connection.commit()
+    except Exception as e:
+        logger.error(f"Database error: {e}")
+        raise Exception("Database write operation failed.") from e
+    if rowcount > 0:
+        await notify_like(user_id, liked_user_id, delta, matched)
+    return rowcount
+
+# Función para dar "like" a un usuario
+async def like_user(user_id, liked_user_id):
+    """Registra un 'like' de un usuario hacia otro."""
+    validate_parameters(user_id, liked_user_id)
+    if user_id == liked_user_id:
+        raise ValueError("Users cannot like themselves.")
+
+    rowcount = await execute_like_write(INSERT_LIKE, user_id, liked_user_id, 1)
+    if rowcount > 0:
+        logger.info(f"User {user_id} liked user {liked_user_id}.")
+    else:
+        logger.info(f"User {user_id} already liked user {liked_user_id}.")
+    return rowcount
+
+# Función para quitar el "like" a un usuario
+async def unlike_user(user_id, liked_user_id):
+    """Elimina un 'like' de un usuario hacia otro."""
+    validate_parameters(user_id, liked_user_id)
+
+    rowcount = await execute_like_write(DELETE_LIKE, user_id, liked_user_id, -1)
+    if rowcount > 0:
+        logger.info(f"User {user_id} unliked user {liked_user_id}.")
+    else:
+        logger.info(f"No like found for user {user_id} to unlike user {liked_user_id}.")
+    return rowcount
+
+# Función para obtener los usuarios a los que un usuario ha dado "like"
+async def get_liked_users(user_id, blocked_ids=None):
+    """Obtiene una lista de usuarios a los que un usuario ha dado 'like' (sin los bloqueados)."""
+    validate_parameters(user_id)
+
+    blocked = list(await resolve_blocked(user_id, blocked_ids))
+    results = await execute_read_query(GET_LIKED_USERS, (user_id, blocked))
+    return [row["liked_user_id"] for row in results]
+
+# Recorrido en streaming de los "likes" dados
+async def iter_liked_users(user_id, blocked_ids=None):
+    """Genera los IDs a los que un usuario ha dado 'like' con memoria constante."""
+    validate_parameters(user_id)
+    blocked = list(await resolve_blocked(user_id, blocked_ids))
+    try:
+        async for row in stream(GET_LIKED_USERS, (user_id, blocked)):
+            yield row["liked_user_id"]
+    except Exception as e:
+        logger.error(f"Database error: {e}")
+        raise Exception("Database read operation failed.") from e
+
+# Función para obtener los usuarios que han dado "like" a un usuario
+async def get_likers(user_id, blocked_ids=None):
+    """Obtiene una lista de usuarios que han dado 'like' a un usuario (sin los bloqueados)."""
+    validate_parameters(user_id)
+
+    blocked = list(await resolve_blocked(user_id, blocked_ids))
+    results = await execute_read_query(GET_LIKERS, (user_id, blocked))
+    return [row["user_id"] for row in results]
+
+# Función para saber si dos usuarios tienen un match
+async def is_match(user_id, other_user_id):
+    """Indica si dos usuarios tienen un match (una búsqueda por clave primaria)."""
+    validate_parameters(user_id, other_user_id)
+
+    return bool(await execute_read_query(IS_MATCH, (user_id, other_user_id, user_id, other_user_id)))
+
+# Función para obtener los matches de un usuario
+async def get_matches(user_id, blocked_ids=None):
+    """Obtiene los usuarios con los que un usuario tiene match, del más reciente al más antiguo."""
+    validate_parameters(user_id)
+
+    blocked = list(await resolve_blocked(user_id, blocked_ids))
+    results = await execute_read_query(GET_MATCHES, (user_id, user_id, blocked))
+    return [row["user_id"] for row in results]
+
+# Función para obtener la relación de un usuario con una página de perfiles
+async def match_status(user_id, other_user_ids):
+    """Devuelve {id: {"liked", "liked_by", "match"}} para varios usuarios en una sola consulta."""
+    validate_parameters(user_id)
+    other_user_ids = list(dict.fromkeys(other_user_ids))
+    if not other_user_ids:
+        return {}
+
+    rows = await execute_read_query(MATCH_STATUS, {"user": user_id, "ids": other_user_ids}, row_factory=tuple_row)
+    return {
+        other_id: {"liked": liked, "liked_by": liked_by, "match": liked and liked_by}
+        for other_id, liked, liked_by in rows
+    }
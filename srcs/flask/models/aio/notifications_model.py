@@ -0,0 +1,103 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    notifications_model.py                             :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 22:48:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 22:48:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .database import AsyncDatabase
+from .queries import run, execute, fetch_one, fetch_all
+from .blocks_model import resolve_blocked
+from ..events import publish_event_async
+from ..notifications_model import (
+    INSERT_NOTIFICATION, GET_NOTIFICATIONS, GET_UNREAD_NOTIFICATIONS, COUNT_UNREAD, COUNT_UNREAD_NOT_BLOCKED,
+    MARK_READ, MARK_ALL_READ,
+)
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+async def create_notification(user_id, notification_type, message, actor_id=None):
+    """Crea una nueva notificación para un usuario (actor_id: quién la provoca, si es una persona)."""
+    if not user_id or not notification_type or not message:
+        raise ValueError("user_id, notification_type, and message are required to create a notification.")
+
+    try:
+        async with AsyncDatabase.get_connection() as connection:
+            async with connection.cursor() as cursor:
+                result = await (await run(cursor, INSERT_NOTIFICATION, (user_id, notification_type, message, actor_id))).fetchone()
+                await publish_event_async(cursor, "notification", (user_id,), result)
+                await connection.commit()
+                return result
+    except Exception as e:
+        logging.error(f"Error creating notification for user ID {user_id}: {e}")
+        raise Exception("Error creating notification") from e
+
+async def get_notifications_for_user(user_id, blocked_ids=None):
+    """Obtiene todas las notificaciones de un usuario (sin las de usuarios bloqueados)."""
+    if not user_id:
+        raise ValueError("user_id is required to fetch notifications.")
+
+    try:
+        blocked = list(await resolve_blocked(user_id, blocked_ids))
+        return await fetch_all(GET_NOTIFICATIONS, (user_id, blocked))
+    except Exception as e:
+        logging.error(f"Error fetching notifications for user ID {user_id}: {e}")
+        raise Exception("Error fetching notifications") from e
+
+async def get_unread_notifications(user_id, blocked_ids=None):
+    """Obtiene todas las notificaciones no leídas de un usuario (sin las de usuarios bloqueados)."""
+    if not user_id:
+        raise ValueError("user_id is required to fetch unread notifications.")
+
+    try:
+        blocked = list(await resolve_blocked(user_id, blocked_ids))
+        return await fetch_all(GET_UNREAD_NOTIFICATIONS, (user_id, blocked))
+    except Exception as e:
+        logging.error(f"Error fetching unread notifications for user ID {user_id}: {e}")
+        raise Exception("Error fetching unread notifications") from e
+
+async def unread_count(user_id, blocked_ids=None):
+    """Cuenta las notificaciones no leídas de un usuario."""
+    if not user_id:
+        raise ValueError("user_id is required to count unread notifications.")
+
+    try:
+        blocked = list(await resolve_blocked(user_id, blocked_ids))
+        if blocked:
+            return (await fetch_one(COUNT_UNREAD_NOT_BLOCKED, (user_id, blocked)))["unread"]
+        return (await fetch_one(COUNT_UNREAD, (user_id,)))["unread"]
+    except Exception as e:
+        logging.error(f"Error counting unread notifications for user ID {user_id}: {e}")
+        raise Exception("Error counting unread notifications") from e
+
+async def mark_notification_as_read(notification_id):
+    """Marca una notificación como leída."""
+    if not notification_id:
+        raise ValueError("notification_id is required to mark notification as read.")
+
+    try:
+        async with AsyncDatabase.get_connection() as connection:
+            async with connection.cursor() as cursor:
+                await run(cursor, MARK_READ, (notification_id,))
+                await connection.commit()
+                return await cursor.fetchone()
+    except Exception as e:
+        logging.error(f"Error marking notification ID {notification_id} as read: {e}")
+        raise Exception("Error marking notification as read") from e
+
+async def mark_all_as_read(user_id):
+    """Marca como leídas todas las notificaciones de un usuario. Devuelve cuántas cambiaron."""
+    if not user_id:
+        raise ValueError("user_id is required to mark notifications as read.")
+
+    try:
+        return await execute(MARK_ALL_READ, (user_id,))
+    except Exception as e:
+        logging.error(f"Error marking all notifications as read for user ID {user_id}: {e}")
+        raise Exception("Error marking notifications as read") from e
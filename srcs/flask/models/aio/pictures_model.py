@@ -0,0 +1,59 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    pictures_model.py                                  :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 22:48:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 22:48:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .queries import fetch_one, fetch_all
+from ..pictures_model import GET_PICTURES, GET_PICTURES_MANY, COUNT_PICTURES, COUNT_PICTURES_MANY
+import logging
+
+# Configura el logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def get_pictures_by_user(user_id):
+    """Obtiene todas las imágenes de un usuario."""
+    try:
+        return await fetch_all(GET_PICTURES, (user_id,))
+    except Exception as e:
+        logger.error(f"Error al obtener imágenes para el usuario {user_id}: {e}")
+        return []
+
+async def get_pictures_many(user_ids):
+    """Obtiene las imágenes de varios usuarios en una sola consulta: {id: [imágenes]}."""
+    user_ids = list(user_ids)
+    pictures = {user_id: [] for user_id in user_ids}
+    try:
+        for picture in await fetch_all(GET_PICTURES_MANY, (user_ids,)):
+            pictures[picture["user_id"]].append(picture)
+        return pictures
+    except Exception as e:
+        logger.error(f"Error al obtener imágenes para {len(user_ids)} usuarios: {e}")
+        return pictures
+
+async def count_pictures(user_id):
+    """Cuenta la cantidad de imágenes de un usuario."""
+    try:
+        return (await fetch_one(COUNT_PICTURES, (user_id,)))["count"]
+    except Exception as e:
+        logger.error(f"Error al contar imágenes para el usuario {user_id}: {e}")
+        return 0
+
+async def count_pictures_many(user_ids):
+    """Cuenta las imágenes de varios usuarios en una sola consulta: {id: cantidad}."""
+    user_ids = list(user_ids)
+    counts = {user_id: 0 for user_id in user_ids}
+    try:
+        for row in await fetch_all(COUNT_PICTURES_MANY, (user_ids,)):
+            counts[row["user_id"]] = row["count"]
+        return counts
+    except Exception as e:
+        logger.error(f"Error al contar imágenes para {len(user_ids)} usuarios: {e}")
+        return counts
@@ -0,0 +1,59 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    profile_model.py                                   :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 22:48:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 22:48:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .queries import fetch_one, fetch_all
+from ..cache import profile_cache, user_tag
+from ..profile_model import GET_PROFILE, GET_LOCATION, GET_PROFILES_MANY, GET_LOCATIONS_MANY
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+async def get_profile_by_user_id(user_id):
+    """Obtiene el perfil de un usuario desde la tabla users."""
+    try:
+        return await profile_cache.get_or_load_async(
+            f"profile:{user_id}", lambda: fetch_one(GET_PROFILE, (user_id,)), tags=(user_tag(user_id),)
+        )
+    except Exception as e:
+        logging.error(f"Error fetching profile for user ID {user_id}: {e}")
+        raise Exception("Error fetching profile") from e
+
+async def get_profiles_many(user_ids):
+    """Obtiene los perfiles de varios usuarios en una sola consulta: {id: perfil}."""
+    user_ids = list(user_ids)
+    async def load(missing):
+        return {row["id"]: row for row in await fetch_all(GET_PROFILES_MANY, (missing,))}
+
+    try:
+        return await profile_cache.get_many_or_load_async(
+            user_ids, lambda user_id: f"profile:{user_id}", load, lambda user_id: (user_tag(user_id),)
+        )
+    except Exception as e:
+        logging.error(f"Error fetching profiles for {len(user_ids)} users: {e}")
+        raise Exception("Error fetching profiles") from e
+
+async def get_location(user_id):
+    """Obtiene la ubicación actual de un usuario."""
+    try:
+        return await fetch_one(GET_LOCATION, (user_id,))
+    except Exception as e:
+        logging.error(f"Error fetching location for user ID {user_id}: {e}")
+        raise Exception("Error fetching location") from e
+
+async def get_locations_many(user_ids):
+    """Obtiene la ubicación de varios usuarios en una sola consulta: {id: ubicación}."""
+    user_ids = list(user_ids)
+    try:
+        return {row.pop("id"): row for row in await fetch_all(GET_LOCATIONS_MANY, (user_ids,))}
+    except Exception as e:
+        logging.error(f"Error fetching locations for {len(user_ids)} users: {e}")
+        raise Exception("Error fetching locations") from e
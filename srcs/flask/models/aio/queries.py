@@ -0,0 +1,59 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    queries.py                                         :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 22:48:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 22:48:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Ejecución asíncrona de las sentencias registradas en models/queries.py."""
+
+from .database import AsyncDatabase
+from config import DatabaseConfig as Config
+import itertools
+
+_cursor_ids = itertools.count()
+
+
+async def run(cursor, query, params=None):
+    """Ejecuta una sentencia registrada en un cursor asíncrono existente."""
+    return await cursor.execute(query.sql, params, prepare=Config.PREPARE_STATEMENTS or None)
+
+
+async def fetch_one(query, params=None, row_factory=None):
+    """Primera fila de una sentencia registrada, o None."""
+    async with AsyncDatabase.get_connection() as connection:
+        async with connection.cursor(row_factory=row_factory) as cursor:
+            await run(cursor, query, params)
+            return await cursor.fetchone()
+
+
+async def fetch_all(query, params=None, row_factory=None):
+    """Todas las filas de una sentencia registrada."""
+    async with AsyncDatabase.get_connection() as connection:
+        async with connection.cursor(row_factory=row_factory) as cursor:
+            await run(cursor, query, params)
+            return await cursor.fetchall()
+
+
+async def execute(query, params=None):
+    """Ejecuta una escritura registrada y hace commit. Devuelve las filas afectadas."""
+    async with AsyncDatabase.get_connection() as connection:
+        async with connection.cursor() as cursor:
+            await run(cursor, query, params)
+            await connection.commit()
+            return cursor.rowcount
+
+
+async def stream(query, params=None, itersize=Config.STREAM_ITERSIZE):
+    """Generador asíncrono de filas con un cursor del servidor."""
+    async with AsyncDatabase.get_connection() as connection:
+        async with connection.cursor(name=f"stream_{next(_cursor_ids)}") as cursor:
+            cursor.itersize = itersize
+            await cursor.execute(query.sql, params)
+            async for row in cursor:
+                yield row
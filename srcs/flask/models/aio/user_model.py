@@ -0,0 +1,56 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    user_model.py                                      :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 22:48:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 22:48:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .queries import fetch_one, fetch_all
+from ..cache import profile_cache, user_tag
+from ..user_model import GET_USER_BY_ID, GET_USER_BY_USERNAME, GET_USERS_MANY
+import logging
+from typing import Optional, Dict, Iterable, List
+
+logging.basicConfig(level=logging.INFO)
+
+# Lectura de un usuario con una sentencia preparada
+async def _fetch_user(query, value) -> Optional[Dict]:
+    try:
+        return await fetch_one(query, (value,))
+    except Exception as e:
+        logging.error(f"Error executing query: {query.name}, params: {value}, error: {e}")
+        raise Exception("Database query error") from e
+
+# Obtener usuario por ID
+async def get_user_by_id(user_id: int) -> Optional[Dict]:
+    """Obtiene un usuario por su ID."""
+    return await profile_cache.get_or_load_async(
+        f"user:id:{user_id}", lambda: _fetch_user(GET_USER_BY_ID, user_id), tags=(user_tag(user_id),)
+    )
+
+# Obtener varios usuarios por ID en una sola consulta
+async def get_users_many(user_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Obtiene varios usuarios por ID: {id: usuario}, sin los que no existen."""
+    async def load(missing: List[int]) -> Dict[int, Dict]:
+        try:
+            return {row["id"]: row for row in await fetch_all(GET_USERS_MANY, (missing,))}
+        except Exception as e:
+            logging.error(f"Error executing query: {GET_USERS_MANY.name}, params: {missing}, error: {e}")
+            raise Exception("Database query error") from e
+
+    return await profile_cache.get_many_or_load_async(
+        user_ids, lambda user_id: f"user:id:{user_id}", load, lambda user_id: (user_tag(user_id),)
+    )
+
+# Obtener usuario por nombre de usuario
+async def get_user_by_username(username: str) -> Optional[Dict]:
+    """Obtiene un usuario por su nombre de usuario."""
+    return await profile_cache.get_or_load_async(
+        f"user:username:{username}", lambda: _fetch_user(GET_USER_BY_USERNAME, username),
+        tags=lambda user: (user_tag(user["id"]),)
+    )
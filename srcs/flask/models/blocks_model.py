@@ -0,0 +1,192 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    blocks_model.py                                    :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 23:58:31 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 23:58:31 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Bloqueos y denuncias.
+
+Un bloqueo oculta a los dos usuarios entre sí: el conjunto de bloqueos de
+un usuario son los que ha bloqueado más los que le han bloqueado. Se lee
+una vez, se guarda en profile_cache (etiqueta block_tag) y los listados lo
+reciben como parámetro y lo aplican con un anti-join contra el array
+(not_blocked) o, en los recorridos de índice cortados con LIMIT, con una
+comprobación por fila (not_in_blocked):
+
+    blocked = get_block_set(user_id)
+    likes = get_liked_users(user_id, blocked_ids=blocked)
+
+Sin blocked_ids, cada listado lo obtiene de la caché. En una petición de
+Flask se carga con el dataloader "block_sets" (una vez por petición).
+"""
+
+from .database import Database
+from .cache import profile_cache
+from .queries import register, run, fetch_all, fetch_one
+from psycopg.rows import tuple_row
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INSERT_BLOCK = register("blocks.insert", '''
+    INSERT INTO blocks (blocker_id, blocked_id)
+    VALUES (%s, %s)
+    ON CONFLICT DO NOTHING
+''')
+DELETE_BLOCK = register("blocks.delete", "DELETE FROM blocks WHERE blocker_id = %s AND blocked_id = %s")
+GET_BLOCKED_BY_USER = register("blocks.by_user", '''
+    SELECT blocked_id, created_at FROM blocks
+    WHERE blocker_id = %s
+    ORDER BY created_at DESC, blocked_id
+''')
+# Pares (usuario, oculto) en ambos sentidos, por la clave primaria y por idx_blocks_blocked
+GET_BLOCK_SETS = register("blocks.sets_many", '''
+    SELECT blocker_id, blocked_id FROM blocks WHERE blocker_id = ANY(%(ids)s)
+    UNION ALL
+    SELECT blocked_id, blocker_id FROM blocks WHERE blocked_id = ANY(%(ids)s)
+''')
+INSERT_REPORT = register("reports.insert", '''
+    INSERT INTO reports (reporter_id, reported_id, reason)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (reporter_id, reported_id) DO NOTHING
+    RETURNING id, reporter_id, reported_id, reason, created_at
+''')
+COUNT_REPORTS = register("reports.count", "SELECT COUNT(*) AS reports FROM reports WHERE reported_id = %s")
+
+
+def not_blocked(column, param="%s"):
+    """Condición SQL: `column` no está en el array `param`. Se ejecuta como un hash anti-join."""
+    return f"NOT EXISTS (SELECT 1 FROM unnest({param}::int[]) AS blocked(id) WHERE blocked.id = {column})"
+
+
+def not_in_blocked(column, param="%s"):
+    """Condición SQL por fila (`<> ALL`) para recorridos de índice con LIMIT.
+
+    Ahí el planificador no puede usar el hash anti-join sin leer toda la
+    entrada y acaba en un bucle anidado que recorre el array en cada fila.
+    """
+    return f"{column} <> ALL({param}::int[])"
+
+
+def block_tag(user_id):
+    """Etiqueta de caché del conjunto de bloqueos de un usuario."""
+    return f"blocks:{user_id}"
+
+
+def get_block_sets_many(user_ids):
+    """Conjuntos de bloqueos de varios usuarios: {id: frozenset}, con una consulta para los que no están en caché."""
+    def load(missing):
+        block_sets = {user_id: set() for user_id in missing}
+        try:
+            with Database.get_connection() as connection:
+                with connection.cursor(row_factory=tuple_row) as cursor:
+                    for user_id, other_id in run(cursor, GET_BLOCK_SETS, {"ids": missing}):
+                        block_sets[user_id].add(other_id)
+        except Exception as e:
+            logger.error(f"Error loading block sets for users {missing}: {e}")
+            raise Exception("Error loading block sets") from e
+        return {user_id: frozenset(blocked) for user_id, blocked in block_sets.items()}
+
+    return profile_cache.get_many_or_load(
+        user_ids, lambda user_id: f"blocks:{user_id}", load, lambda user_id: (block_tag(user_id),)
+    )
+
+
+def get_block_set(user_id):
+    """Usuarios que user_id no debe ver (bloqueados por él o que le han bloqueado)."""
+    if not user_id:
+        raise ValueError("user_id is required to fetch blocks.")
+    return get_block_sets_many([user_id])[user_id]
+
+
+def resolve_blocked(user_id, blocked_ids=None):
+    """Bloqueos que aplica un listado de user_id: los recibidos o, si no hay, los de la caché."""
+    return get_block_set(user_id) if blocked_ids is None else blocked_ids
+
+
+def is_blocked(user_id, other_user_id):
+    """True si alguno de los dos ha bloqueado al otro."""
+    return other_user_id in get_block_set(user_id)
+
+
+def _write_block(query, blocker_id, blocked_id):
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                rowcount = run(cursor, query, (blocker_id, blocked_id)).rowcount
+                connection.commit()
+    except Exception as e:
+        logger.error(f"Error updating block {blocker_id} -> {blocked_id}: {e}")
+        raise Exception("Error updating block") from e
+    if rowcount > 0:
+        # El bloqueo cambia el conjunto de los dos usuarios
+        profile_cache.invalidate_tag(block_tag(blocker_id))
+        profile_cache.invalidate_tag(block_tag(blocked_id))
+    return rowcount
+
+
+def block_user(blocker_id, blocked_id):
+    """Bloquea a un usuario. Devuelve 1 si se ha creado el bloqueo y 0 si ya existía."""
+    if not blocker_id or not blocked_id:
+        raise ValueError("blocker_id and blocked_id are required to block a user.")
+    if blocker_id == blocked_id:
+        raise ValueError("Users cannot block themselves.")
+    rowcount = _write_block(INSERT_BLOCK, blocker_id, blocked_id)
+    if rowcount > 0:
+        logger.info(f"User {blocker_id} blocked user {blocked_id}.")
+    return rowcount
+
+
+def unblock_user(blocker_id, blocked_id):
+    """Retira un bloqueo. Devuelve 1 si existía y 0 si no."""
+    if not blocker_id or not blocked_id:
+        raise ValueError("blocker_id and blocked_id are required to unblock a user.")
+    return _write_block(DELETE_BLOCK, blocker_id, blocked_id)
+
+
+def get_blocked_users(user_id):
+    """Usuarios bloqueados por user_id (solo los suyos), del más reciente al más antiguo."""
+    if not user_id:
+        raise ValueError("user_id is required to fetch blocked users.")
+    try:
+        return fetch_all(GET_BLOCKED_BY_USER, (user_id,))
+    except Exception as e:
+        logger.error(f"Error fetching users blocked by {user_id}: {e}")
+        raise Exception("Error fetching blocked users") from e
+
+
+def report_user(reporter_id, reported_id, reason=None):
+    """Denuncia una cuenta (p. ej. como falsa). Devuelve la denuncia o None si ya la había hecho."""
+    if not reporter_id or not reported_id:
+        raise ValueError("reporter_id and reported_id are required to report a user.")
+    if reporter_id == reported_id:
+        raise ValueError("Users cannot report themselves.")
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                report = run(cursor, INSERT_REPORT, (reporter_id, reported_id, reason)).fetchone()
+                connection.commit()
+    except Exception as e:
+        logger.error(f"Error reporting user {reported_id} by {reporter_id}: {e}")
+        raise Exception("Error reporting user") from e
+    if report:
+        logger.info(f"User {reporter_id} reported user {reported_id}.")
+    return report
+
+
+def count_reports(user_id):
+    """Número de denuncias recibidas por un usuario."""
+    if not user_id:
+        raise ValueError("user_id is required to count reports.")
+    try:
+        return fetch_one(COUNT_REPORTS, (user_id,))["reports"]
+    except Exception as e:
+        logger.error(f"Error counting reports for user {user_id}: {e}")
+        raise Exception("Error counting reports") from e
@@ -0,0 +1,290 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    cache.py                                           :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 12:05:49 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 12:05:49 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .database import Database
+from config import CacheConfig as Config
+from collections import OrderedDict
+import copy
+import json
+import logging
+import os
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "matcha_cache_invalidation"
+
+
+class LocalBackend:
+    """Backend de invalidación en proceso: solo hay una caché que mantener coherente."""
+
+    def start(self, cache):
+        pass
+
+    def publish(self, tag):
+        pass
+
+
+class PostgresBackend:
+    """Backend de invalidación compartido entre workers mediante LISTEN/NOTIFY.
+
+    Cada proceso escucha el canal en un hilo con una conexión dedicada y aplica
+    las invalidaciones publicadas por los demás workers.
+    """
+
+    def __init__(self, channel=INVALIDATION_CHANNEL):
+        self.channel = channel
+        self._listener_pid = None
+        self._lock = threading.Lock()
+
+    def start(self, cache):
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            threading.Thread(target=self._listen, args=(cache,), name="cache-invalidation", daemon=True).start()
+
+    def publish(self, tag):
+        payload = json.dumps({"pid": os.getpid(), "tag": tag})
+        try:
+            with Database.get_connection() as connection:
+                connection.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+        except Exception as e:
+            logger.error(f"Error publishing cache invalidation for {tag}: {e}")
+
+    def _listen(self, cache):
+        while True:
+            try:
+                with Database.get_dedicated_connection() as connection:
+                    connection.execute(f"LISTEN {self.channel}")
+                    # Lo que se haya escrito mientras no escuchábamos puede estar obsoleto
+                    cache.clear()
+                    for notify in connection.notifies():
+                        message = json.loads(notify.payload)
+                        if message["pid"] != os.getpid():
+                            cache.invalidate_tag(message["tag"], broadcast=False)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {e}")
+                time.sleep(1)
+
+
+class Cache:
+    """Caché LRU con TTL y tamaño máximo, con invalidación por etiquetas.
+
+    Las lecturas a través de la caché (get_or_load y variantes) anotan la
+    generación antes de llamar al loader; si mientras cargaban se invalidó
+    alguna de las etiquetas del valor (o se vació la caché), el valor leído
+    puede ser anterior a la escritura y no se guarda.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_entries=Config.MAX_ENTRIES, ttl=Config.TTL, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend or LocalBackend()
+        self._entries = OrderedDict()  # key -> (expira, valor, tags)
+        self._tags = {}  # tag -> keys
+        self._lock = threading.Lock()
+        self._generation = 0  # Aumenta con cada invalidación
+        self._invalidated = {}  # tag -> generación de su última invalidación (solo con cargas en curso)
+        self._cleared_at = 0
+        self._loading = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0,
+                       "stale_loads": 0}
+
+    def get(self, key, default=None):
+        """Devuelve una copia del valor cacheado o default."""
+        self.backend.start(self)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return copy.copy(value)
+
+    def set(self, key, value, tags=()):
+        """Guarda un valor asociado a unas etiquetas de invalidación."""
+        with self._lock:
+            self._set(key, value, tags)
+
+    def _begin_load(self):
+        """Anota una carga en curso y devuelve la generación actual."""
+        with self._lock:
+            self._loading += 1
+            return self._generation
+
+    def _finish_load(self, generation, items):
+        """Guarda los (clave, valor, tags) cargados salvo los invalidados durante la carga."""
+        with self._lock:
+            self._loading -= 1
+            for key, value, tags in items:
+                if self._generation != generation and (
+                    self._cleared_at > generation
+                    or any(self._invalidated.get(tag, 0) > generation for tag in tags)
+                ):
+                    self._stats["stale_loads"] += 1
+                    continue
+                self._set(key, value, tags)
+            if not self._loading:
+                self._invalidated.clear()
+
+    def get_or_load(self, key, loader, tags=()):
+        """Lectura a través de la caché: si no está, llama a loader() y guarda el resultado.
+
+        `tags` puede ser una lista o una función que recibe el valor cargado.
+        Los resultados None no se cachean.
+        """
+        value = self.get(key, self._MISSING)
+        if value is not self._MISSING:
+            return value
+        generation, loaded = self._begin_load(), ()
+        try:
+            value = loader()
+            if value is not None:
+                loaded = [(key, value, tags(value) if callable(tags) else tags)]
+        finally:
+            self._finish_load(generation, loaded)
+        return value
+
+    def get_many_or_load(self, ids, key, loader, tags):
+        """Versión por lotes de get_or_load: devuelve {id: valor}.
+
+        `key(id)` y `tags(id)` dan la clave y las etiquetas de cada id;
+        loader(ids_que_faltan) recibe todos los fallos a la vez y devuelve
+        {id: valor}. Los ids sin valor no aparecen en el resultado.
+        """
+        found = {}
+        missing = []
+        for item in dict.fromkeys(ids):
+            value = self.get(key(item), self._MISSING)
+            if value is self._MISSING:
+                missing.append(item)
+            else:
+                found[item] = value
+        if missing:
+            generation, loaded = self._begin_load(), []
+            try:
+                for item, value in loader(missing).items():
+                    if value is not None:
+                        loaded.append((key(item), value, tags(item)))
+                        found[item] = value
+            finally:
+                self._finish_load(generation, loaded)
+        return found
+
+    async def get_or_load_async(self, key, loader, tags=()):
+        """get_or_load con un loader asíncrono: loader() devuelve una corrutina."""
+        value = self.get(key, self._MISSING)
+        if value is not self._MISSING:
+            return value
+        generation, loaded = self._begin_load(), ()
+        try:
+            value = await loader()
+            if value is not None:
+                loaded = [(key, value, tags(value) if callable(tags) else tags)]
+        finally:
+            self._finish_load(generation, loaded)
+        return value
+
+    async def get_many_or_load_async(self, ids, key, loader, tags):
+        """get_many_or_load con un loader asíncrono."""
+        found = {}
+        missing = []
+        for item in dict.fromkeys(ids):
+            value = self.get(key(item), self._MISSING)
+            if value is self._MISSING:
+                missing.append(item)
+            else:
+                found[item] = value
+        if missing:
+            generation, loaded = self._begin_load(), []
+            try:
+                for item, value in (await loader(missing)).items():
+                    if value is not None:
+                        loaded.append((key(item), value, tags(item)))
+                        found[item] = value
+            finally:
+                self._finish_load(generation, loaded)
+        return found
+
+    def invalidate_tag(self, tag, broadcast=True):
+        """Elimina todas las entradas con la etiqueta y avisa al resto de workers."""
+        with self._lock:
+            self._generation += 1
+            if self._loading:
+                self._invalidated[tag] = self._generation
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self._stats["invalidations"] += 1
+        if broadcast:
+            self.backend.publish(tag)
+
+    def clear(self):
+        """Vacía la caché local."""
+        with self._lock:
+            self._generation += 1
+            self._cleared_at = self._generation
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        """Contadores de aciertos, fallos y desalojos."""
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "max_entries": self.max_entries}
+
+    def _set(self, key, value, tags):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, copy.copy(value), tuple(tags))
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+def user_tag(user_id):
+    """Etiqueta que agrupa todas las entradas derivadas de un usuario."""
+    return f"user:{user_id}"
+
+
+def _create_backend():
+    if Config.BACKEND == "postgres":
+        return PostgresBackend()
+    return LocalBackend()
+
+
+# Caché de perfiles compartida por user_model y profile_model
+profile_cache = Cache(backend=_create_backend())
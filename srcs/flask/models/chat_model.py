@@ -1,51 +1,372 @@
 from .database import Database
+from .events import publish_event
+from .queries import register, run, fetch_one, fetch_all, stream
+from .blocks_model import get_block_set, not_in_blocked, resolve_blocked
+from .notification_writer import queue_event_notification
+from .user_model import get_user_by_id
+from datetime import datetime
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MESSAGE_COLUMNS = "id, sender_id, receiver_id, message, timestamp"
+DEFAULT_PAGE_SIZE = 50
+INBOX_PAGE_SIZE = 20
+INBOX_MAX_PAGE_SIZE = 100
+INBOX_PREVIEW_CHARS = 200
+
+GET_CONVERSATION = register("chats.conversation", f'''
+    SELECT {MESSAGE_COLUMNS} FROM chats
+    WHERE user_low = LEAST(%s, %s) AND user_high = GREATEST(%s, %s)
+    ORDER BY timestamp ASC, id ASC
+''')
+
+# El mensaje y su fila de conversations en una sola sentencia. Quien envía
+# ha leído hasta su propio mensaje (si es el último) y quien recibe suma uno
+# a sus no leídos; GREATEST evita retroceder si dos envíos se cruzan
+INSERT_MESSAGE = register("chats.insert", f'''
+    WITH message AS (
+        INSERT INTO chats (sender_id, receiver_id, message, timestamp)
+        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+        RETURNING {MESSAGE_COLUMNS}, user_low, user_high
+    ), conversation AS (
+        INSERT INTO conversations AS c
+            (user_low, user_high, last_message_id, last_activity, low_read_id, high_read_id, low_unread, high_unread)
+        SELECT user_low, user_high, id, timestamp,
+               CASE WHEN sender_id = user_low THEN id ELSE 0 END,
+               CASE WHEN sender_id = user_high THEN id ELSE 0 END,
+               (sender_id <> user_low)::int, (sender_id <> user_high)::int
+        FROM message
+        ON CONFLICT (user_low, user_high) DO UPDATE SET
+            last_message_id = GREATEST(c.last_message_id, EXCLUDED.last_message_id),
+            last_activity = GREATEST(c.last_activity, EXCLUDED.last_activity),
+            low_read_id = GREATEST(c.low_read_id, EXCLUDED.low_read_id),
+            high_read_id = GREATEST(c.high_read_id, EXCLUDED.high_read_id),
+            low_unread = CASE
+                WHEN EXCLUDED.low_read_id > COALESCE(c.last_message_id, 0) THEN 0
+                ELSE c.low_unread + EXCLUDED.low_unread END,
+            high_unread = CASE
+                WHEN EXCLUDED.high_read_id > COALESCE(c.last_message_id, 0) THEN 0
+                ELSE c.high_unread + EXCLUDED.high_unread END
+    )
+    SELECT {MESSAGE_COLUMNS} FROM message
+''')
+
+# Una sentencia por tipo de página: sin cursor, anteriores a un cursor o posteriores
+_PAGE_FILTERS = {
+    "latest": ("", "DESC"),
+    "before": ("AND (timestamp, id) < (%(cursor_ts)s, %(cursor_id)s)", "DESC"),
+    "after": ("AND (timestamp, id) > (%(cursor_ts)s, %(cursor_id)s)", "ASC"),
+}
+GET_MESSAGES_PAGE = {
+    mode: register(f"chats.page_{mode}", f'''
+        SELECT {MESSAGE_COLUMNS} FROM chats
+        WHERE user_low = LEAST(%(user1)s, %(user2)s) AND user_high = GREATEST(%(user1)s, %(user2)s)
+          {cursor_filter}
+        ORDER BY timestamp {order}, id {order}
+        LIMIT %(limit)s
+    ''')
+    for mode, (cursor_filter, order) in _PAGE_FILTERS.items()
+}
+
+# Bandeja de entrada (migración 14): las N conversaciones más recientes de
+# un usuario salen de dos recorridos de índice por last_activity (como
+# user_low y como user_high), cada uno cortado en LIMIT, sin leer chats
+# salvo el último mensaje de cada una
+_INBOX_SIDES = (("user_low", "user_high", "low", "high"), ("user_high", "user_low", "high", "low"))
+
+
+def _inbox_side(column, other, own, theirs):
+    return f'''
+        (SELECT {other} AS other_id, last_activity, last_message_id, {own}_unread AS unread,
+                {own}_read_id AS read_id, {theirs}_read_id AS other_read_id
+         FROM conversations
+         WHERE {column} = %(user)s
+           AND (last_activity, {other}) < (COALESCE(%(cursor_ts)s, 'infinity'::timestamp), COALESCE(%(cursor_id)s, 0))
+           AND {other} <> %(user)s AND {not_in_blocked(other, "%(blocked_ids)s")}
+         ORDER BY last_activity DESC, {other} DESC LIMIT %(limit)s)
+    '''
+
+
+def _unread_side(column, other, own, theirs):
+    return f'''
+        SELECT {own}_unread AS unread FROM conversations
+        WHERE {column} = %(user)s AND {own}_unread > 0 AND {other} <> %(user)s
+          AND {not_in_blocked(other, "%(blocked_ids)s")}
+    '''
+
+
+GET_INBOX = register("conversations.inbox", f'''
+    SELECT inbox.other_id, inbox.last_activity, inbox.unread, inbox.read_id, inbox.other_read_id,
+           m.id AS last_message_id, m.sender_id AS last_sender_id,
+           left(m.message, {INBOX_PREVIEW_CHARS}) AS last_message
+    FROM ({" UNION ALL ".join(_inbox_side(*side) for side in _INBOX_SIDES)}) AS inbox
+    LEFT JOIN chats m ON m.id = inbox.last_message_id
+    ORDER BY inbox.last_activity DESC, inbox.other_id DESC
+    LIMIT %(limit)s
+''')
+COUNT_UNREAD_MESSAGES = register("conversations.unread_count", f'''
+    SELECT COUNT(*) AS conversations, COALESCE(SUM(unread), 0)::int AS messages
+    FROM ({" UNION ALL ".join(_unread_side(*side) for side in _INBOX_SIDES)}) AS counts
+''')
+# Marca como leídas hasta el último mensaje; solo se escriben las que tenían
+# no leídos. Con ids concretos, una búsqueda por clave primaria por conversación
+_MARK_READ_SET = '''
+    UPDATE conversations SET
+        low_read_id = CASE WHEN user_low = %(user)s THEN COALESCE(last_message_id, low_read_id) ELSE low_read_id END,
+        low_unread = CASE WHEN user_low = %(user)s THEN 0 ELSE low_unread END,
+        high_read_id = CASE WHEN user_high = %(user)s THEN COALESCE(last_message_id, high_read_id) ELSE high_read_id END,
+        high_unread = CASE WHEN user_high = %(user)s THEN 0 ELSE high_unread END
+'''
+_MARK_READ_RETURNING = "RETURNING CASE WHEN user_low = %(user)s THEN user_high ELSE user_low END AS other_id"
+MARK_CONVERSATIONS_READ = register("conversations.mark_read", f'''
+    {_MARK_READ_SET}
+    WHERE (user_low, user_high) IN (
+        SELECT LEAST(%(user)s, other), GREATEST(%(user)s, other) FROM unnest(%(others)s::int[]) AS other
+    )
+      AND ((user_low = %(user)s AND low_unread > 0) OR (user_high = %(user)s AND high_unread > 0))
+    {_MARK_READ_RETURNING}
+''')
+MARK_ALL_CONVERSATIONS_READ = register("conversations.mark_all_read", f'''
+    {_MARK_READ_SET}
+    WHERE (user_low = %(user)s AND low_unread > 0) OR (user_high = %(user)s AND high_unread > 0)
+    {_MARK_READ_RETURNING}
+''')
+
 def create_message(sender_id, receiver_id, message):
     """Crea un nuevo mensaje en el chat."""
     # Validación de parámetros
     if not sender_id or not receiver_id or not message:
         raise ValueError("sender_id, receiver_id, and message are required to create a message.")
+    if receiver_id in get_block_set(sender_id):
+        raise ValueError(f"User {sender_id} cannot message user {receiver_id}: blocked.")
     
-    query = '''
-        INSERT INTO chats (sender_id, receiver_id, message, timestamp)
-        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
-        RETURNING id, sender_id, receiver_id, message, timestamp
-    '''
     try:
         with Database.get_connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(query, (sender_id, receiver_id, message))
+                result = run(cursor, INSERT_MESSAGE, (sender_id, receiver_id, message)).fetchone()
+                publish_event(cursor, "message", (sender_id, receiver_id), result)
                 connection.commit()
-                result = cursor.fetchone()
                 logger.info(f"Message created successfully: {result}")
-                return result
     except Exception as e:
         logger.error(f"Error creating message from {sender_id} to {receiver_id}: {e}")
         raise Exception(f"Error creating message from {sender_id} to {receiver_id}") from e
+    notify_message(sender_id, receiver_id)
+    return result
 
-def get_messages_between_users(user1_id, user2_id):
-    """Obtiene los mensajes entre dos usuarios."""
+def notify_message(sender_id, receiver_id):
+    """Encola el aviso del mensaje para el receptor; un fallo aquí no deshace el mensaje."""
+    try:
+        queue_event_notification(receiver_id, "message", get_user_by_id(sender_id))
+    except Exception as e:
+        logger.error(f"Error notifying message from {sender_id} to {receiver_id}: {e}")
+
+def get_messages_between_users(user1_id, user2_id, blocked_ids=None):
+    """Obtiene los mensajes entre dos usuarios (ninguno si hay un bloqueo entre ellos)."""
     # Validación de parámetros
     if not user1_id or not user2_id:
         raise ValueError("Both user1_id and user2_id are required to fetch messages.")
+    if user2_id in resolve_blocked(user1_id, blocked_ids):
+        return []
     
-    query = '''
-        SELECT * FROM chats
-        WHERE (sender_id = %s AND receiver_id = %s)
-           OR (sender_id = %s AND receiver_id = %s)
-        ORDER BY timestamp ASC
-    '''
     try:
-        with Database.get_connection() as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(query, (user1_id, user2_id, user2_id, user1_id))
-                messages = cursor.fetchall()
-                logger.info(f"Fetched {len(messages)} messages between {user1_id} and {user2_id}")
-                return messages
+        messages = fetch_all(GET_CONVERSATION, (user1_id, user2_id, user1_id, user2_id))
+        logger.info(f"Fetched {len(messages)} messages between {user1_id} and {user2_id}")
+        return messages
     except Exception as e:
         logger.error(f"Error fetching messages between {user1_id} and {user2_id}: {e}")
         raise Exception(f"Error fetching messages between {user1_id} and {user2_id}") from e
+
+def iter_messages_between_users(user1_id, user2_id, blocked_ids=None):
+    """Recorre toda la conversación en orden cronológico con memoria constante (exportaciones)."""
+    if not user1_id or not user2_id:
+        raise ValueError("Both user1_id and user2_id are required to fetch messages.")
+    if user2_id in resolve_blocked(user1_id, blocked_ids):
+        return
+
+    try:
+        yield from stream(GET_CONVERSATION, (user1_id, user2_id, user1_id, user2_id))
+    except Exception as e:
+        logger.error(f"Error streaming messages between {user1_id} and {user2_id}: {e}")
+        raise Exception(f"Error fetching messages between {user1_id} and {user2_id}") from e
+
+def encode_message_cursor(message):
+    """Serializa la posición (timestamp, id) de un mensaje."""
+    return f"{message['timestamp'].isoformat()}|{message['id']}"
+
+def decode_message_cursor(cursor):
+    """Interpreta un cursor generado por encode_message_cursor."""
+    try:
+        timestamp, message_id = cursor.split("|")
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (AttributeError, ValueError) as e:
+        raise ValueError(f"Invalid message cursor: {cursor}") from e
+
+def _page_query(user1_id, user2_id, limit, before, after):
+    """Valida los argumentos de una página y devuelve (modo, parámetros)."""
+    if not user1_id or not user2_id:
+        raise ValueError("Both user1_id and user2_id are required to fetch messages.")
+    if before and after:
+        raise ValueError("before and after cursors cannot be combined.")
+    if limit <= 0:
+        raise ValueError("limit must be positive.")
+
+    params = {"user1": user1_id, "user2": user2_id, "limit": limit + 1}
+    mode = "latest"
+    if before:
+        params["cursor_ts"], params["cursor_id"] = decode_message_cursor(before)
+        mode = "before"
+    elif after:
+        params["cursor_ts"], params["cursor_id"] = decode_message_cursor(after)
+        mode = "after"
+    return mode, params
+
+def _build_page(messages, mode, limit, before, after):
+    """Construye la respuesta de get_messages_page a partir de las filas (limit + 1 como mucho)."""
+    order = _PAGE_FILTERS[mode][1]
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if order == "DESC":
+        messages.reverse()
+
+    # Al ir hacia atrás lo que sobra son mensajes más antiguos; con `after` siempre hay anteriores
+    has_older = has_more if order == "DESC" else True
+    newer_cursor = encode_message_cursor(messages[-1]) if messages else after
+    return {
+        "messages": messages,
+        "older_cursor": encode_message_cursor(messages[0]) if messages and has_older else None,
+        "newer_cursor": newer_cursor,
+        "has_newer": has_more if order == "ASC" else bool(before),
+    }
+
+def get_messages_page(user1_id, user2_id, limit=DEFAULT_PAGE_SIZE, before=None, after=None, blocked_ids=None):
+    """Obtiene una página de la conversación entre dos usuarios (keyset por timestamp, id).
+
+    Sin cursores devuelve los últimos mensajes. Con `before` devuelve los
+    anteriores a ese cursor y con `after` los posteriores. Los mensajes se
+    devuelven siempre en orden cronológico. `older_cursor` (None si no hay más)
+    sirve para pedir la página anterior y `newer_cursor` para pedir lo nuevo.
+    Si hay un bloqueo entre los dos usuarios la página sale vacía.
+    """
+    mode, params = _page_query(user1_id, user2_id, limit, before, after)
+    if user2_id in resolve_blocked(user1_id, blocked_ids):
+        return _build_page([], mode, limit, before, after)
+    try:
+        messages = fetch_all(GET_MESSAGES_PAGE[mode], params)
+    except Exception as e:
+        logger.error(f"Error fetching message page between {user1_id} and {user2_id}: {e}")
+        raise Exception(f"Error fetching messages between {user1_id} and {user2_id}") from e
+    return _build_page(messages, mode, limit, before, after)
+
+def encode_inbox_cursor(conversation):
+    """Serializa la posición (last_activity, other_id) de una conversación de la bandeja."""
+    return f"{conversation['last_activity'].isoformat()}|{conversation['other_id']}"
+
+def decode_inbox_cursor(cursor):
+    """Interpreta un cursor generado por encode_inbox_cursor."""
+    try:
+        last_activity, other_id = cursor.split("|")
+        return datetime.fromisoformat(last_activity), int(other_id)
+    except (AttributeError, ValueError) as e:
+        raise ValueError(f"Invalid inbox cursor: {cursor}") from e
+
+def _inbox_params(user_id, limit, before):
+    """Valida los argumentos de get_inbox y devuelve los parámetros de GET_INBOX (sin los bloqueos)."""
+    if not user_id:
+        raise ValueError("user_id is required to fetch the inbox.")
+    if limit <= 0 or limit > INBOX_MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {INBOX_MAX_PAGE_SIZE}.")
+    cursor_ts, cursor_id = decode_inbox_cursor(before) if before else (None, None)
+    return {"user": user_id, "cursor_ts": cursor_ts, "cursor_id": cursor_id, "limit": limit}
+
+def get_inbox(user_id, limit=INBOX_PAGE_SIZE, before=None, blocked_ids=None):
+    """Conversaciones más recientes de un usuario con su último mensaje y sus no leídos.
+
+    Cada fila trae other_id, last_activity, unread, read_id (último mensaje
+    leído por el usuario), other_read_id (leído por el otro) y el último
+    mensaje (recortado a INBOX_PREVIEW_CHARS). `before` (encode_inbox_cursor
+    de la última fila) pide la página siguiente; el other_id desempata las
+    conversaciones con la misma last_activity. Las conversaciones con
+    usuarios bloqueados no aparecen.
+    """
+    params = _inbox_params(user_id, limit, before)
+    params["blocked_ids"] = list(resolve_blocked(user_id, blocked_ids))
+    try:
+        return fetch_all(GET_INBOX, params)
+    except Exception as e:
+        logger.error(f"Error fetching inbox for user {user_id}: {e}")
+        raise Exception(f"Error fetching inbox for user {user_id}") from e
+
+def unread_messages_count(user_id, blocked_ids=None):
+    """Conversaciones con mensajes sin leer y total de mensajes sin leer: {"conversations", "messages"}."""
+    if not user_id:
+        raise ValueError("user_id is required to count unread messages.")
+    params = {"user": user_id, "blocked_ids": list(resolve_blocked(user_id, blocked_ids))}
+    try:
+        return fetch_one(COUNT_UNREAD_MESSAGES, params)
+    except Exception as e:
+        logger.error(f"Error counting unread messages for user {user_id}: {e}")
+        raise Exception(f"Error counting unread messages for user {user_id}") from e
+
+def mark_conversations_read(user_id, other_ids=None):
+    """Marca como leídas las conversaciones con other_ids (todas si es None) en un solo UPDATE.
+
+    Devuelve los ids de los usuarios cuyas conversaciones tenían mensajes sin
+    leer; a ellos y al propio usuario se les envía un evento "read".
+    """
+    if not user_id:
+        raise ValueError("user_id is required to mark conversations as read.")
+    if other_ids is not None and not other_ids:
+        return []
+
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                if other_ids is None:
+                    rows = run(cursor, MARK_ALL_CONVERSATIONS_READ, {"user": user_id}).fetchall()
+                else:
+                    params = {"user": user_id, "others": list(other_ids)}
+                    rows = run(cursor, MARK_CONVERSATIONS_READ, params).fetchall()
+                updated = [row["other_id"] for row in rows]
+                if updated:
+                    publish_event(cursor, "read", (user_id, *updated), {"user_id": user_id, "other_ids": updated})
+                connection.commit()
+    except Exception as e:
+        logger.error(f"Error marking conversations as read for user {user_id}: {e}")
+        raise Exception(f"Error marking conversations as read for user {user_id}") from e
+    logger.info(f"User {user_id} read {len(updated)} conversations.")
+    return updated
+
+def rebuild_conversations():
+    """Deriva conversations de chats para mensajes cargados sin create_message (COPY, semillas).
+
+    Las conversaciones nuevas quedan sin leer para quien recibió el último
+    mensaje; en las existentes solo se actualiza el último mensaje. Devuelve
+    el número de filas insertadas o actualizadas.
+    """
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute('''
+                    INSERT INTO conversations (user_low, user_high, last_message_id, last_activity, low_read_id,
+                                               high_read_id, low_unread, high_unread)
+                    SELECT DISTINCT ON (user_low, user_high)
+                           user_low, user_high, id, COALESCE(timestamp, CURRENT_TIMESTAMP),
+                           CASE WHEN sender_id = user_low THEN id ELSE 0 END,
+                           CASE WHEN sender_id = user_high THEN id ELSE 0 END,
+                           (sender_id <> user_low)::int, (sender_id <> user_high)::int
+                    FROM chats
+                    WHERE user_low IS NOT NULL
+                    ORDER BY user_low, user_high, timestamp DESC, id DESC
+                    ON CONFLICT (user_low, user_high) DO UPDATE SET
+                        last_message_id = EXCLUDED.last_message_id,
+                        last_activity = EXCLUDED.last_activity
+                    WHERE conversations.last_message_id IS DISTINCT FROM EXCLUDED.last_message_id
+                ''')
+                connection.commit()
+                logger.info(f"Conversations rebuilt: {cursor.rowcount} rows.")
+                return cursor.rowcount
+    except Exception as e:
+        logger.error(f"Error rebuilding conversations: {e}")
+        raise Exception("Error rebuilding conversations") from e
@@ -1,7 +1,15 @@
+import atexit
 import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg
 from psycopg.rows import dict_row  # Opcional: para trabajar con resultados como diccionarios
+from psycopg_pool import ConnectionPool, PoolTimeout, TooManyRequests
 from config import DatabaseConfig as Config
+from .instrumentation import InstrumentedCursor, metrics
 
 logging.basicConfig(level=logging.INFO)
 
@@ -9,6 +17,11 @@ logging.basicConfig(level=logging.INFO)
 class Database:
     """Clase para manejar la conexión y la creación de tablas en la base de datos."""
 
+    _pool = None
+    _pool_pid = None
+    _pool_lock = threading.Lock()
+    _stats = {"checkouts": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "errors": 0}
+
     @staticmethod
     def validate_config():
         """Valida que las variables de configuración estén definidas."""
@@ -18,118 +31,120 @@ class Database:
                 raise ValueError(f"{var} is not set")
 
     @staticmethod
-    def get_connection():
-        """Obtiene una conexión a la base de datos."""
-        try:
-            Database.validate_config()
+    def connection_kwargs():
+        """Parámetros de conexión comunes al pool y a las conexiones dedicadas."""
+        return {
+            "dbname": Config.POSTGRES_DB,
+            "user": Config.POSTGRES_USER,
+            "password": Config.POSTGRES_PASSWORD,
+            "host": Config.POSTGRES_HOST,
+            "row_factory": dict_row,  # Opcional: devuelve resultados como diccionarios
+        }
 
-            if Config.DEBUG:
-                logging.debug(
-                    f"Connecting to database {Config.POSTGRES_DB} as {Config.POSTGRES_USER} at {Config.POSTGRES_HOST}"
-                )
+    @staticmethod
+    def get_dedicated_connection(autocommit=True):
+        """Abre una conexión fuera del pool (LISTEN, operaciones de larga duración)."""
+        Database.validate_config()
+        return psycopg.connect(autocommit=autocommit, **Database.connection_kwargs())
 
-            return psycopg.connect(
-                dbname=Config.POSTGRES_DB,
-                user=Config.POSTGRES_USER,
-                password=Config.POSTGRES_PASSWORD,
-                host=Config.POSTGRES_HOST,
-                row_factory=dict_row,  # Opcional: devuelve resultados como diccionarios
-            )
+    @staticmethod
+    def get_pool():
+        """Devuelve el pool de conexiones del proceso, creándolo la primera vez."""
+        # Tras un fork (workers) los hilos del pool no sobreviven: se crea uno nuevo por proceso
+        if Database._pool is not None and Database._pool_pid == os.getpid():
+            return Database._pool
+
+        with Database._pool_lock:
+            if Database._pool is None or Database._pool_pid != os.getpid():
+                Database.validate_config()
+
+                if Config.DEBUG:
+                    logging.debug(
+                        f"Opening connection pool to {Config.POSTGRES_DB} as {Config.POSTGRES_USER} at {Config.POSTGRES_HOST}"
+                    )
 
-        except (psycopg.Error, ValueError) as e:
+                Database._pool = ConnectionPool(
+                    kwargs={**Database.connection_kwargs(), "cursor_factory": InstrumentedCursor},
+                    min_size=Config.POOL_MIN_SIZE,
+                    max_size=Config.POOL_MAX_SIZE,
+                    max_idle=Config.POOL_MAX_IDLE,
+                    max_lifetime=Config.POOL_MAX_LIFETIME,
+                    timeout=Config.POOL_TIMEOUT,
+                    max_waiting=Config.POOL_MAX_WAITING,
+                    check=ConnectionPool.check_connection,  # Health check al sacar cada conexión
+                    name="matcha",
+                    open=True,
+                )
+                Database._pool_pid = os.getpid()
+                Database._stats = {"checkouts": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "errors": 0}
+        return Database._pool
+
+    @staticmethod
+    @contextmanager
+    def get_connection():
+        """Obtiene una conexión del pool; al salir del bloque hace commit/rollback y la devuelve."""
+        try:
+            pool = Database.get_pool()
+            start = time.perf_counter()
+            connection = pool.getconn()
+        except (psycopg.Error, PoolTimeout, TooManyRequests, ValueError) as e:
+            with Database._pool_lock:
+                Database._stats["errors"] += 1
             logging.error(f"Error connecting to the database: {e}")
             raise Exception(f"Database connection failed: {e}") from e
 
+        wait_ms = (time.perf_counter() - start) * 1000
+        with Database._pool_lock:
+            Database._stats["checkouts"] += 1
+            Database._stats["wait_ms_total"] += wait_ms
+            Database._stats["wait_ms_max"] = max(Database._stats["wait_ms_max"], wait_ms)
+        metrics.record_acquire(wait_ms)
+
+        try:
+            # Una conexión que pertenece a un pool no se cierra al salir del "with"
+            with connection:
+                yield connection
+        finally:
+            pool.putconn(connection)
+
+    @staticmethod
+    def get_pool_stats():
+        """Devuelve estadísticas del pool: checkouts, tiempos de espera y conexiones en uso."""
+        if Database._pool is None or Database._pool_pid != os.getpid():
+            return {}
+
+        stats = dict(Database._pool.get_stats())
+        with Database._pool_lock:
+            stats.update(Database._stats)
+        stats["in_use"] = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+        stats["wait_ms_avg"] = stats["wait_ms_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        return stats
+
+    @staticmethod
+    def close_pool():
+        """Cierra el pool de conexiones del proceso actual."""
+        with Database._pool_lock:
+            if Database._pool is not None and Database._pool_pid == os.getpid():
+                Database._pool.close()
+            Database._pool = None
+            Database._pool_pid = None
+
     @staticmethod
     def create_tables():
-        """Crea las tablas necesarias para la aplicación."""
-        queries = [
-            '''
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                first_name VARCHAR(50),
-                last_name VARCHAR(50),
-                birthdate DATE NOT NULL,
-                gender VARCHAR(10),
-                sexual_preferences VARCHAR(100),
-                biography TEXT,
-                fame_rating FLOAT DEFAULT 0.0,
-                profile_picture TEXT,
-                location VARCHAR(100),
-                latitude DOUBLE PRECISION,
-                longitude DOUBLE PRECISION,
-                is_active BOOLEAN DEFAULT FALSE,
-                last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_online BOOLEAN DEFAULT FALSE
-            );
-            ''',
-            '''
-            CREATE TABLE IF NOT EXISTS likes (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                liked_user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, liked_user_id)
-            );
-            ''',
-            '''
-            CREATE TABLE IF NOT EXISTS notifications (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                type VARCHAR(50) NOT NULL,
-                message TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_read BOOLEAN DEFAULT FALSE
-            );
-            ''',
-            '''
-            CREATE TABLE IF NOT EXISTS interests (
-                id SERIAL PRIMARY KEY,
-                tag VARCHAR(100) UNIQUE NOT NULL
-            );
-            ''',
-            '''
-            CREATE TABLE IF NOT EXISTS user_interests (
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                interest_id INTEGER REFERENCES interests(id) ON DELETE CASCADE,
-                PRIMARY KEY (user_id, interest_id)
-            );
-            ''',
-            '''
-            CREATE TABLE IF NOT EXISTS chats (
-                id SERIAL PRIMARY KEY,
-                sender_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                receiver_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                message TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            ''',
-            '''
-            CREATE TABLE IF NOT EXISTS pictures (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                image_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            );
-            '''
-        ]
+        """Crea o actualiza el esquema aplicando las migraciones pendientes (ver models/migrations.py)."""
+        from .migrations import migrate  # migrations importa Database
 
         try:
-            with Database.get_connection() as connection:
-                with connection.cursor() as cursor:
-                    for query in queries:
-                        cursor.execute(query)
-                    connection.commit()
-                    logging.info("Tables created successfully.")
+            applied = migrate()
+            logging.info(f"Tables created successfully ({len(applied)} migrations applied).")
         except psycopg.Error as e:
             logging.error(f"Error during table creation: {e}")
             raise Exception("Error creating tables") from e
 
 
+atexit.register(Database.close_pool)
+
+
 # Llamar a create_tables() si se ejecuta directamente
 if __name__ == "__main__":
     try:
@@ -137,5 +152,6 @@ if __name__ == "__main__":
         logging.info("Database setup completed.")
     except Exception as e:
         logging.error(f"Database setup failed: {e}")
+        raise SystemExit(1)  # El servicio de esquema debe fallar para que compose no arranque la app
 
 
@@ -0,0 +1,162 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    dataloader.py                                      :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 19:02:11 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 19:02:11 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Dataloaders por petición: agrupan lecturas sueltas en una consulta por tipo.
+
+Al pintar una página, primero se piden todas las entidades con load() (que
+solo encola el id) y después se leen los valores con .get(): la primera
+lectura lanza una sola consulta con todos los ids encolados de ese tipo.
+
+    users = [get_loader("profiles").load(user_id) for user_id in ids]
+    pictures = [get_loader("pictures").load(user_id) for user_id in ids]
+    page = [(user.get(), pics.get()) for user, pics in zip(users, pictures)]
+
+Dentro de una petición (begin_request/end_request) cada loader además
+memoriza los resultados; una escritura en la misma petición debe llamar a
+clear() para no leer el valor anterior.
+"""
+
+from contextvars import ContextVar
+from .user_model import get_users_many
+from .profile_model import get_profiles_many, get_locations_many
+from .pictures_model import get_pictures_many, count_pictures_many
+from .likes_model import match_status
+from .blocks_model import get_block_sets_many
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 1000  # Ids por consulta
+
+_request_loaders = ContextVar("request_loaders", default=None)
+
+
+def _match_status_many(keys):
+    """Claves (usuario, otro) agrupadas por usuario: una consulta por usuario que mira."""
+    by_viewer = {}
+    for viewer_id, other_id in keys:
+        by_viewer.setdefault(viewer_id, []).append(other_id)
+    return {
+        (viewer_id, other_id): status
+        for viewer_id, other_ids in by_viewer.items()
+        for other_id, status in match_status(viewer_id, other_ids).items()
+    }
+
+
+# Tipo de entidad -> función por lotes (lista de claves -> {clave: valor})
+BATCH_FUNCTIONS = {
+    "users": get_users_many,
+    "profiles": get_profiles_many,
+    "locations": get_locations_many,
+    "pictures": get_pictures_many,
+    "picture_counts": count_pictures_many,
+    "match_status": _match_status_many,
+    "block_sets": get_block_sets_many,
+}
+
+
+class Pending:
+    """Valor aún no cargado; get() despacha el lote pendiente de su loader."""
+
+    __slots__ = ("loader", "key")
+
+    def __init__(self, loader, key):
+        self.loader = loader
+        self.key = key
+
+    def get(self):
+        return self.loader.resolve(self.key)
+
+
+class DataLoader:
+    """Agrupa las claves pedidas y las resuelve con una llamada a batch_fn."""
+
+    def __init__(self, batch_fn, max_batch_size=MAX_BATCH_SIZE):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self._values = {}
+        self._queue = {}  # dict ordenado usado como conjunto
+        self.batches = 0
+
+    def load(self, key):
+        """Encola la clave y devuelve un Pending."""
+        if key not in self._values:
+            self._queue[key] = None
+        return Pending(self, key)
+
+    def load_many(self, keys):
+        return [self.load(key) for key in keys]
+
+    def get(self, key):
+        """Carga una clave (junto con todas las encoladas) y devuelve su valor."""
+        return self.load(key).get()
+
+    def get_many(self, keys):
+        """Devuelve {clave: valor} de varias claves; las inexistentes valen None."""
+        pending = self.load_many(keys)
+        return {item.key: item.get() for item in pending}
+
+    def resolve(self, key):
+        if key not in self._values:
+            self._queue[key] = None
+            self.dispatch()
+        return self._values.get(key)
+
+    def dispatch(self):
+        """Resuelve todas las claves encoladas en lotes de max_batch_size."""
+        keys = list(self._queue)
+        self._queue.clear()
+        for start in range(0, len(keys), self.max_batch_size):
+            chunk = keys[start:start + self.max_batch_size]
+            results = self.batch_fn(chunk)
+            self.batches += 1
+            for key in chunk:
+                self._values[key] = results.get(key)
+
+    def prime(self, key, value):
+        """Guarda un valor ya conocido (por ejemplo, devuelto por otra consulta)."""
+        self._values[key] = value
+        self._queue.pop(key, None)
+
+    def clear(self, key=None):
+        """Olvida una clave (o todas) tras una escritura."""
+        if key is None:
+            self._values.clear()
+        else:
+            self._values.pop(key, None)
+
+
+def get_loader(name):
+    """Loader de la petición actual para un tipo de entidad.
+
+    Fuera de una petición devuelve uno nuevo que solo agrupa, sin memorizar
+    entre llamadas.
+    """
+    if name not in BATCH_FUNCTIONS:
+        raise ValueError(f"Unknown loader: {name}")
+    loaders = _request_loaders.get()
+    if loaders is None:
+        return DataLoader(BATCH_FUNCTIONS[name])
+    if name not in loaders:
+        loaders[name] = DataLoader(BATCH_FUNCTIONS[name])
+    return loaders[name]
+
+
+def begin_request():
+    """Crea los loaders de la petición actual."""
+    return _request_loaders.set({})
+
+
+def end_request(token):
+    """Descarta los loaders (y sus valores) de la petición."""
+    _request_loaders.reset(token)
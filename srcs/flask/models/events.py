@@ -0,0 +1,54 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    events.py                                          :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 13:21:08 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 13:21:08 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+import json
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "matcha_events"
+MAX_PAYLOAD_BYTES = 7900  # NOTIFY admite hasta 8000 bytes por payload
+NOTIFY_QUERY = "SELECT pg_notify(%s, %s)"
+NOTIFY_MANY_QUERY = "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload"
+
+
+def build_payload(event_type, user_ids, data):
+    """Serializa un evento para NOTIFY, recortando los datos si no caben."""
+    event = {"type": event_type, "user_ids": list(user_ids), "data": data}
+    payload = json.dumps(event, default=str)
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        # El cliente recupera el contenido completo con la API de lectura
+        event["data"] = {key: value for key, value in data.items() if key in ("id", "sender_id", "receiver_id", "user_id", "type")}
+        event["truncated"] = True
+        payload = json.dumps(event, default=str)
+    return payload
+
+
+def publish_event(cursor, event_type, user_ids, data):
+    """Publica un evento en la transacción del cursor.
+
+    Postgres solo entrega el NOTIFY cuando la transacción hace commit, así que
+    los clientes nunca reciben eventos de escrituras que acabaron en rollback.
+    """
+    cursor.execute(NOTIFY_QUERY, (EVENTS_CHANNEL, build_payload(event_type, user_ids, data)))
+
+
+def publish_events(cursor, events):
+    """publish_event para varios eventos (tipo, user_ids, datos) en un solo viaje."""
+    if events:
+        cursor.execute(NOTIFY_MANY_QUERY, (EVENTS_CHANNEL, [build_payload(*event) for event in events]))
+
+
+async def publish_event_async(cursor, event_type, user_ids, data):
+    """publish_event para un cursor asíncrono (models/aio)."""
+    await cursor.execute(NOTIFY_QUERY, (EVENTS_CHANNEL, build_payload(event_type, user_ids, data)))
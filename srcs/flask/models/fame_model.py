@@ -0,0 +1,288 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    fame_model.py                                      :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 17:46:30 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 17:46:30 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Motor de fama.
+
+Las escrituras (likes, visitas) actualizan contadores por usuario en
+user_stats y marcan al usuario como pendiente (dirty). Una pasada periódica
+recoge los pendientes por lotes, calcula la fama con NumPy y la escribe con
+un UPDATE masivo. La fama solo cambia en esas pasadas: los perfiles cacheados
+pueden mostrar la anterior durante CacheConfig.TTL segundos.
+
+Uso (desde srcs/flask):
+    python3 -m models.fame_model              # pasadas cada FAME_PASS_INTERVAL segundos
+    python3 -m models.fame_model --once       # una pasada
+    python3 -m models.fame_model --rebuild    # recalcula contadores y fama de todos
+"""
+
+from .database import Database
+from .queries import register, run
+from config import FameConfig as Config
+from psycopg.rows import tuple_row
+import argparse
+import logging
+import threading
+import time
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Suavizado bayesiano de likes por visita: sin datos se asume 1 like por cada 2 visitas
+PRIOR_LIKES = 1.0
+PRIOR_VISITS = 2.0
+
+STATS_COLUMNS = ("user_id", "likes_received", "likes_given", "visits_received", "matches")
+
+UPDATE_LIKE_COUNTERS = register("user_stats.like_delta", '''
+    INSERT INTO user_stats (user_id, likes_received, likes_given, matches)
+    SELECT v.user_id, GREATEST(v.received, 0), GREATEST(v.given, 0),
+           CASE WHEN m.mutual THEN GREATEST(%(delta)s, 0) ELSE 0 END
+    FROM (VALUES (%(liked)s::int, %(delta)s::int, 0), (%(liker)s::int, 0, %(delta)s::int)) AS v(user_id, received, given),
+         (SELECT EXISTS (SELECT 1 FROM likes WHERE user_id = %(liked)s AND liked_user_id = %(liker)s) AS mutual) AS m
+    ORDER BY v.user_id  -- Mismo orden de bloqueo en todas las transacciones
+    ON CONFLICT (user_id) DO UPDATE SET
+        likes_received = GREATEST(user_stats.likes_received
+            + CASE WHEN EXCLUDED.user_id = %(liked)s THEN %(delta)s ELSE 0 END, 0),
+        likes_given = GREATEST(user_stats.likes_given
+            + CASE WHEN EXCLUDED.user_id = %(liker)s THEN %(delta)s ELSE 0 END, 0),
+        matches = GREATEST(user_stats.matches + CASE WHEN EXISTS (
+            SELECT 1 FROM likes WHERE user_id = %(liked)s AND liked_user_id = %(liker)s
+        ) THEN %(delta)s ELSE 0 END, 0),
+        dirty = TRUE,
+        updated_at = CURRENT_TIMESTAMP
+''')
+
+ADD_VISITS = register("user_stats.add_visits", '''
+    INSERT INTO user_stats (user_id, visits_received)
+    SELECT * FROM unnest(%s::int[], %s::int[]) AS data(user_id, visits)
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        visits_received = user_stats.visits_received + EXCLUDED.visits_received,
+        dirty = TRUE,
+        updated_at = CURRENT_TIMESTAMP
+''')
+
+_distribution = {"loaded_at": None, "likes": np.zeros(0, dtype=np.int64)}
+_distribution_lock = threading.Lock()
+
+
+def update_like_counters(cursor, user_id, liked_user_id, delta):
+    """Suma delta (+1 like, -1 unlike) a los contadores de ambos usuarios.
+
+    Se ejecuta en la transacción del like, después de LOCK_LIKE_PAIR: si el
+    like recíproco existe, el par gana (o pierde) un match.
+    """
+    run(cursor, UPDATE_LIKE_COUNTERS, {"liker": user_id, "liked": liked_user_id, "delta": delta})
+
+
+def add_visit_counters(cursor, user_ids, counts):
+    """Suma visitas recibidas dentro de la transacción de quien llama (volcado de visitas)."""
+    run(cursor, ADD_VISITS, (list(user_ids), list(counts)))
+    return cursor.rowcount
+
+
+def record_visits(user_ids, counts=None):
+    """Suma visitas recibidas a varios usuarios en una sola sentencia."""
+    if not user_ids:
+        return 0
+    counts = list(counts) if counts is not None else [1] * len(user_ids)
+    if len(counts) != len(user_ids):
+        raise ValueError("user_ids and counts must have the same length.")
+
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                rowcount = add_visit_counters(cursor, user_ids, counts)
+                connection.commit()
+                return rowcount
+    except Exception as e:
+        logger.error(f"Error recording visits for {len(user_ids)} users: {e}")
+        raise Exception("Error recording visits") from e
+
+
+def compute_fame(likes_received, likes_given, visits_received, matches, distribution):
+    """Fama (0-100) de un lote de usuarios; todos los argumentos son arrays de NumPy.
+
+    - popularidad: percentil (rango medio) de likes recibidos en la distribución global
+    - likes por visita, suavizado para que pocos datos no den extremos
+    - matches por like dado
+    """
+    likes_received = np.asarray(likes_received, dtype=np.float64)
+    total = max(len(distribution), 1)
+    below = np.searchsorted(distribution, likes_received, side="left")
+    not_above = np.searchsorted(distribution, likes_received, side="right")
+    popularity = (below + not_above) / (2.0 * total)
+
+    # Sin visitas registradas cada like cuenta también como visita
+    visits = np.maximum(np.asarray(visits_received, dtype=np.float64), likes_received)
+    like_ratio = (likes_received + PRIOR_LIKES) / (visits + PRIOR_VISITS)
+    match_rate = np.minimum(np.asarray(matches, dtype=np.float64) / np.maximum(likes_given, 1), 1.0)
+
+    weights = Config.WEIGHT_POPULARITY + Config.WEIGHT_LIKE_RATIO + Config.WEIGHT_MATCH_RATE
+    fame = 100.0 * (Config.WEIGHT_POPULARITY * popularity
+                    + Config.WEIGHT_LIKE_RATIO * like_ratio
+                    + Config.WEIGHT_MATCH_RATE * match_rate) / weights
+    return np.round(fame, 2)
+
+
+def load_distribution(force=False):
+    """Likes recibidos de todos los usuarios, ordenados (reutilizado DISTRIBUTION_TTL segundos)."""
+    with _distribution_lock:
+        loaded_at = _distribution["loaded_at"]
+        if not force and loaded_at is not None and time.monotonic() - loaded_at < Config.DISTRIBUTION_TTL:
+            return _distribution["likes"]
+        try:
+            with Database.get_connection() as connection:
+                with connection.cursor(row_factory=tuple_row) as cursor:
+                    cursor.execute("SELECT likes_received FROM user_stats")
+                    likes = np.fromiter((row[0] for row in cursor), dtype=np.int64)
+                    cursor.execute("SELECT COUNT(*) FROM users")
+                    users = cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error loading likes distribution: {e}")
+            raise Exception("Error loading likes distribution") from e
+
+        # Los usuarios sin fila en user_stats no tienen likes
+        likes = np.concatenate((np.zeros(max(users - len(likes), 0), dtype=np.int64), likes))
+        likes.sort()
+        _distribution.update(loaded_at=time.monotonic(), likes=likes)
+        return likes
+
+
+def _write_fame(cursor, user_ids, fame):
+    """Escribe la fama de un lote; solo toca las filas cuyo valor cambia."""
+    cursor.execute(
+        '''
+        UPDATE users SET fame_rating = data.fame
+        FROM unnest(%s::int[], %s::float8[]) AS data(id, fame)
+        WHERE users.id = data.id AND users.fame_rating IS DISTINCT FROM data.fame
+        ''',
+        (user_ids.tolist(), fame.tolist()),
+    )
+    return cursor.rowcount
+
+
+def run_pass(batch_size=Config.BATCH_SIZE):
+    """Recalcula la fama de los usuarios pendientes. Devuelve (procesados, actualizados)."""
+    distribution = load_distribution()
+    processed = updated = 0
+    # Reclamar, calcular y escribir en la misma transacción: si algo falla el
+    # rollback deja a los usuarios pendientes para la siguiente pasada
+    claim_query = f'''
+        UPDATE user_stats SET dirty = FALSE
+        WHERE user_id IN (
+            SELECT user_id FROM user_stats WHERE dirty
+            ORDER BY user_id LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING {", ".join(STATS_COLUMNS)}
+    '''
+    try:
+        while True:
+            with Database.get_connection() as connection:
+                with connection.cursor(row_factory=tuple_row) as cursor:
+                    cursor.execute(claim_query, (batch_size,))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    data = np.array(rows, dtype=np.int64)
+                    fame = compute_fame(data[:, 1], data[:, 2], data[:, 3], data[:, 4], distribution)
+                    updated += _write_fame(cursor, data[:, 0], fame)
+                    connection.commit()
+            processed += len(rows)
+            if len(rows) < batch_size:
+                break
+    except Exception as e:
+        logger.error(f"Error during fame pass: {e}")
+        raise Exception("Error computing fame") from e
+    if processed:
+        logger.info(f"Fame pass: {processed} users recomputed, {updated} ratings changed.")
+    return processed, updated
+
+
+def rebuild_counters():
+    """Recalcula desde cero los contadores de likes, visitas y matches de todos los usuarios."""
+    query = '''
+        INSERT INTO user_stats (user_id, likes_received, likes_given, visits_received, matches, dirty)
+        SELECT u.id, COALESCE(r.count, 0), COALESCE(g.count, 0), COALESCE(v.count, 0), COALESCE(m.count, 0), TRUE
+        FROM users u
+        LEFT JOIN (SELECT liked_user_id AS user_id, COUNT(*) AS count FROM likes GROUP BY liked_user_id) r
+            ON r.user_id = u.id
+        LEFT JOIN (SELECT user_id, COUNT(*) AS count FROM likes GROUP BY user_id) g
+            ON g.user_id = u.id
+        LEFT JOIN (SELECT visited_id AS user_id, SUM(visits) AS count FROM profile_visits GROUP BY visited_id) v
+            ON v.user_id = u.id
+        LEFT JOIN (
+            SELECT a.user_id, COUNT(*) AS count
+            FROM likes a
+            JOIN likes b ON b.user_id = a.liked_user_id AND b.liked_user_id = a.user_id
+            GROUP BY a.user_id
+        ) m ON m.user_id = u.id
+        ON CONFLICT (user_id) DO UPDATE SET
+            likes_received = EXCLUDED.likes_received,
+            likes_given = EXCLUDED.likes_given,
+            visits_received = EXCLUDED.visits_received,
+            matches = EXCLUDED.matches,
+            dirty = TRUE,
+            updated_at = CURRENT_TIMESTAMP
+    '''
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query)
+                connection.commit()
+                return cursor.rowcount
+    except Exception as e:
+        logger.error(f"Error rebuilding fame counters: {e}")
+        raise Exception("Error rebuilding fame counters") from e
+
+
+def rebuild(batch_size=Config.BATCH_SIZE):
+    """Reconstrucción completa: contadores, distribución y fama de todos los usuarios."""
+    start = time.perf_counter()
+    counters = rebuild_counters()
+    load_distribution(force=True)
+    processed, updated = run_pass(batch_size)
+    logger.info(f"Fame rebuild: {counters} counters, {processed} users, {updated} ratings changed "
+                f"in {time.perf_counter() - start:.1f}s")
+    return processed, updated
+
+
+def run_forever(interval=Config.PASS_INTERVAL):
+    """Bucle de pasadas periódicas (proceso dedicado)."""
+    while True:
+        started = time.monotonic()
+        try:
+            run_pass()
+        except Exception as e:
+            logger.error(f"Fame pass failed: {e}")
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="Una sola pasada incremental")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcular contadores y fama de todos")
+    parser.add_argument("--interval", type=float, default=Config.PASS_INTERVAL)
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild()
+    elif args.once:
+        run_pass()
+    else:
+        run_forever(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    geo_model.py                                       :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 10:02:11 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 10:02:11 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .database import Database
+import logging
+import math
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # ~5 m x 5 m, suficiente para ordenar por distancia
+KM_PER_DEGREE = 111.32
+MAX_COVERING_CELLS = 16
+MIN_SEARCH_RADIUS_KM = 1.0
+
+# Distancia exacta (haversine) calculada en SQL a partir de %(lat)s y %(lon)s
+DISTANCE_SQL = '''
+    2 * 6371.0 * ASIN(LEAST(1.0, SQRT(
+        POWER(SIN(RADIANS(latitude - %(lat)s) / 2), 2)
+        + COS(RADIANS(%(lat)s)) * COS(RADIANS(latitude)) * POWER(SIN(RADIANS(longitude - %(lon)s) / 2), 2)
+    )))
+'''
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Codifica unas coordenadas como geohash de la precisión indicada."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True  # Los bits pares son de longitud
+
+    while len(geohash) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+
+def cell_size_degrees(precision):
+    """Devuelve (alto, ancho) en grados de una celda geohash."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def covering_cells(latitude, longitude, radius_km, max_cells=MAX_COVERING_CELLS):
+    """Devuelve los prefijos geohash que cubren el rectángulo que envuelve el círculo.
+
+    Se usa la mayor precisión que no supere max_cells celdas. Devuelve None si
+    el radio es demasiado grande para podar por celdas (hay que recorrer todo).
+    """
+    lat_margin = radius_km / KM_PER_DEGREE
+    lat_min = max(-90.0, latitude - lat_margin)
+    lat_max = min(90.0, latitude + lat_margin)
+    worst_lat = min(89.9, max(abs(lat_min), abs(lat_max)))
+    lon_margin = radius_km / (KM_PER_DEGREE * math.cos(math.radians(worst_lat)))
+    if lon_margin >= 180.0:
+        return None
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_deg, lon_deg = cell_size_degrees(precision)
+        rows = range(int((lat_min + 90.0) // lat_deg), int((min(lat_max, 90.0 - 1e-9) + 90.0) // lat_deg) + 1)
+        first_col = int((longitude - lon_margin + 180.0) // lon_deg)
+        last_col = int((longitude + lon_margin + 180.0) // lon_deg)
+        if len(rows) * (last_col - first_col + 1) > max_cells:
+            continue
+
+        lon_cells = round(360.0 / lon_deg)
+        cells = set()
+        for row in rows:
+            for col in range(first_col, last_col + 1):
+                cell_lat = -90.0 + (row + 0.5) * lat_deg
+                cell_lon = -180.0 + ((col % lon_cells) + 0.5) * lon_deg
+                cells.add(encode_geohash(cell_lat, cell_lon, precision))
+        return sorted(cells)
+    return None
+
+
+def search_radii(radius_km, start_km=0.0):
+    """Radios crecientes (anillos) hasta radius_km, empezando justo por encima de start_km.
+
+    Buscar primero en un radio pequeño hace que el número de candidatos dependa
+    de `limit` y no del tamaño de la tabla.
+    """
+    radii = []
+    current = max(radius_km / 64, start_km * 2, MIN_SEARCH_RADIUS_KM)
+    while current < radius_km:
+        radii.append(current)
+        current *= 4
+    radii.append(radius_km)
+    return radii
+
+
+def encode_cursor(distance_km, user_id):
+    """Serializa la posición (distancia, id) del último resultado devuelto."""
+    return f"{distance_km!r}:{user_id}"
+
+
+def decode_cursor(cursor):
+    """Interpreta un cursor generado por encode_cursor."""
+    try:
+        distance_km, user_id = cursor.split(":")
+        return float(distance_km), int(user_id)
+    except (AttributeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def find_users_near(user_id, radius_km, limit=20, cursor=None):
+    """Obtiene los perfiles a menos de radius_km de un usuario, del más cercano al más lejano.
+
+    Los candidatos se podan por celda geohash (índice) antes de calcular la
+    distancia exacta. Devuelve {"users": [...], "next_cursor": str | None}.
+    """
+    if not user_id or not radius_km or radius_km <= 0:
+        raise ValueError("user_id and a positive radius_km are required to find nearby users.")
+    if limit <= 0:
+        raise ValueError("limit must be positive.")
+
+    origin = get_coordinates(user_id)
+    if not origin:
+        return {"users": [], "next_cursor": None}
+
+    params = {
+        "lat": origin["latitude"],
+        "lon": origin["longitude"],
+        "user_id": user_id,
+        "limit": limit,
+    }
+
+    cursor_filter = ""
+    cursor_distance = 0.0
+    if cursor:
+        cursor_distance, params["cursor_id"] = decode_cursor(cursor)
+        params["cursor_distance"] = cursor_distance
+        cursor_filter = "AND (distance_km, id) > (%(cursor_distance)s, %(cursor_id)s)"
+
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor_db:
+                for search_radius in search_radii(radius_km, cursor_distance):
+                    params["radius_km"] = search_radius
+                    cells = covering_cells(origin["latitude"], origin["longitude"], search_radius)
+                    cursor_db.execute(_nearby_query(cells, cursor_filter), {**params, **_cell_params(cells)})
+                    users = cursor_db.fetchall()
+                    # Todo lo que está dentro del anillo se ha considerado: si ya hay
+                    # `limit` resultados son exactamente los más cercanos
+                    if len(users) == limit:
+                        break
+    except Exception as e:
+        logger.error(f"Error finding users near user ID {user_id}: {e}")
+        raise Exception("Error finding nearby users") from e
+
+    next_cursor = None
+    if len(users) == limit:
+        next_cursor = encode_cursor(users[-1]["distance_km"], users[-1]["id"])
+    return {"users": users, "next_cursor": next_cursor}
+
+
+def _cell_params(cells):
+    """Parámetros LIKE de prefijo para cada celda."""
+    if cells is None:
+        return {}
+    return {f"cell_{i}": f"{cell}%" for i, cell in enumerate(cells)}
+
+
+def _nearby_query(cells, cursor_filter):
+    """Construye la consulta de vecinos podando por celdas geohash (índice)."""
+    cell_filter = ""
+    if cells is not None:
+        cell_filter = "AND (" + " OR ".join(f"geohash LIKE %(cell_{i})s" for i in range(len(cells))) + ")"
+
+    return f'''
+        SELECT * FROM (
+            SELECT id, username, first_name, last_name, location, latitude, longitude,
+                   {DISTANCE_SQL} AS distance_km
+            FROM users
+            WHERE id <> %(user_id)s
+              AND geohash IS NOT NULL
+              {cell_filter}
+        ) AS candidates
+        WHERE distance_km <= %(radius_km)s
+          {cursor_filter}
+        ORDER BY distance_km, id
+        LIMIT %(limit)s
+    '''
+
+
+def get_coordinates(user_id):
+    """Obtiene latitud y longitud de un usuario (None si no tiene ubicación)."""
+    query = "SELECT latitude, longitude FROM users WHERE id = %s AND latitude IS NOT NULL AND longitude IS NOT NULL"
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (user_id,))
+                return cursor.fetchone()
+    except Exception as e:
+        logger.error(f"Error fetching coordinates for user ID {user_id}: {e}")
+        raise Exception("Error fetching coordinates") from e
+
+
+def backfill_geohashes(batch_size=10000):
+    """Calcula el geohash de los usuarios con coordenadas que aún no lo tienen."""
+    select_query = '''
+        SELECT id, latitude, longitude FROM users
+        WHERE geohash IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+        LIMIT %s
+    '''
+    update_query = '''
+        UPDATE users SET geohash = data.geohash
+        FROM unnest(%s::int[], %s::varchar[]) AS data(id, geohash)
+        WHERE users.id = data.id
+    '''
+    total = 0
+    try:
+        while True:
+            with Database.get_connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(select_query, (batch_size,))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    ids = [row["id"] for row in rows]
+                    hashes = [encode_geohash(row["latitude"], row["longitude"]) for row in rows]
+                    cursor.execute(update_query, (ids, hashes))
+                    connection.commit()
+            total += len(rows)
+        logger.info(f"Backfilled geohash for {total} users.")
+        return total
+    except Exception as e:
+        logger.error(f"Error backfilling geohashes: {e}")
+        raise Exception("Error backfilling geohashes") from e
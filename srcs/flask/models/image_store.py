@@ -0,0 +1,167 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    image_store.py                                     :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 19:40:27 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 19:40:27 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Almacenamiento de imágenes direccionado por contenido.
+
+Cada imagen se guarda una sola vez con el SHA-256 de sus bytes como nombre
+(<dir>/ab/cd/abcd....jpg): dos subidas iguales comparten fichero. Las
+miniaturas se generan en un pool de procesos para no bloquear al worker
+web con la decodificación.
+"""
+
+from config import ImageConfig as Config
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_FORMAT = ("webp", "image/webp")
+
+# Firma (bytes iniciales) -> (extensión, tipo MIME)
+SIGNATURES = (
+    (b"\xff\xd8\xff", ("jpg", "image/jpeg")),
+    (b"\x89PNG\r\n\x1a\n", ("png", "image/png")),
+    (b"GIF87a", ("gif", "image/gif")),
+    (b"GIF89a", ("gif", "image/gif")),
+)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def sniff_format(head):
+    """Detecta el formato por los bytes iniciales; None si no es una imagen admitida."""
+    for signature, image_format in SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ("webp", "image/webp")
+    return None
+
+
+def image_path(digest, extension, size=None):
+    """Ruta del original (size=None) o de una miniatura."""
+    name = f"{digest}.{extension}" if size is None else f"{digest}_{size}.{THUMBNAIL_FORMAT[0]}"
+    return os.path.join(Config.STORAGE_DIR, digest[:2], digest[2:4], name)
+
+
+def store_stream(stream, max_bytes=Config.MAX_BYTES):
+    """Copia un fichero subido a disco calculando su hash por bloques.
+
+    Nunca tiene la imagen entera en memoria. Devuelve (digest, extensión,
+    tipo MIME, tamaño, nueva); nueva es False si ya existía (deduplicada).
+    """
+    os.makedirs(os.path.join(Config.STORAGE_DIR, "tmp"), exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    image_format = None
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.join(Config.STORAGE_DIR, "tmp"))
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if image_format is None:
+                    image_format = sniff_format(chunk)
+                    if image_format is None:
+                        raise ValueError("Unsupported image format.")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"Image exceeds {max_bytes} bytes.")
+                digest.update(chunk)
+                tmp.write(chunk)
+        if image_format is None:
+            raise ValueError("Empty upload.")
+
+        digest = digest.hexdigest()
+        extension, content_type = image_format
+        path = image_path(digest, extension)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+            return digest, extension, content_type, size, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)  # Atómico: nunca se sirve un fichero a medias
+        return digest, extension, content_type, size, True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def make_thumbnails(digest, extension, sizes=Config.THUMBNAIL_SIZES):
+    """Genera las miniaturas de una imagen (se ejecuta en el pool de procesos).
+
+    Devuelve (ancho, alto) del original; ValueError si no se puede decodificar.
+    """
+    source = image_path(digest, extension)
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            width, height = image.size
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            for size in sorted(sizes, reverse=True):
+                target = image_path(digest, extension, size)
+                if os.path.exists(target):
+                    continue
+                thumbnail = image.copy()
+                thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.join(Config.STORAGE_DIR, "tmp"))
+                with os.fdopen(fd, "wb") as tmp:
+                    thumbnail.save(tmp, THUMBNAIL_FORMAT[0].upper(), quality=82, method=4)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, target)
+                image = thumbnail  # La siguiente (más pequeña) parte de esta
+            return width, height
+    except FileNotFoundError:
+        raise  # Borrada mientras esperaba (purga): no es una imagen inválida
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid image {digest}: {e}") from e
+
+
+def get_executor():
+    """Pool de procesos para miniaturas, uno por proceso padre."""
+    global _executor, _executor_pid
+    if _executor is not None and _executor_pid == os.getpid():
+        return _executor
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=Config.THUMBNAIL_WORKERS)
+            _executor_pid = os.getpid()
+    return _executor
+
+
+def schedule_thumbnails(digest, extension, on_done=None):
+    """Encola la generación de miniaturas; on_done(future) se llama al terminar."""
+    future = get_executor().submit(make_thumbnails, digest, extension)
+    if on_done is not None:
+        future.add_done_callback(on_done)
+    return future
+
+
+def remove_image(digest, extension):
+    """Borra el original y sus miniaturas (cuando ninguna foto lo referencia)."""
+    for size in (None, *Config.THUMBNAIL_SIZES):
+        try:
+            os.unlink(image_path(digest, extension, size))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,329 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    instrumentation.py                                 :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 15:10:26 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 15:10:26 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from config import InstrumentationConfig as Config
+from collections import Counter, deque
+from contextvars import ContextVar
+import bisect
+import logging
+import threading
+import time
+
+import psycopg
+from psycopg import sql
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de los buckets de los histogramas
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+EXPLAIN_PREFIXES = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+EXPLAIN_INTERVAL = 60.0  # Como mucho un EXPLAIN por sentencia y minuto
+
+_request_queries = ContextVar("request_queries", default=None)
+
+
+class Histogram:
+    """Histograma acumulado con buckets fijos (formato Prometheus)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value_ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.total += value_ms
+        self.count += 1
+
+
+class QueryMetrics:
+    """Registro de métricas de consultas del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.statements = {}  # sentencia -> {"count", "total_ms", "max_ms", "rows", "errors"}
+            self.query_duration = Histogram()
+            self.acquire_duration = Histogram()
+            self.slow_queries = deque(maxlen=Config.SLOW_QUERY_LOG_SIZE)
+            self.requests = {"count": 0, "queries": 0, "max_queries": 0, "n_plus_one": 0}
+            self._last_explain = {}
+
+    def record_query(self, statement, elapsed_ms, rows, error=False):
+        with self._lock:
+            stats = self.statements.get(statement)
+            if stats is None:
+                stats = self.statements[statement] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "errors": 0}
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["rows"] += max(rows, 0)
+            stats["errors"] += int(error)
+            self.query_duration.observe(elapsed_ms)
+
+    def record_acquire(self, elapsed_ms):
+        with self._lock:
+            self.acquire_duration.observe(elapsed_ms)
+
+    def should_explain(self, statement):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_explain.get(statement, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+                return False
+            self._last_explain[statement] = now
+            return True
+
+    def record_slow_query(self, statement, elapsed_ms, plan):
+        with self._lock:
+            self.slow_queries.append({
+                "statement": statement,
+                "elapsed_ms": round(elapsed_ms, 3),
+                "plan": plan,
+                "at": time.time(),
+            })
+
+    def record_request(self, queries):
+        with self._lock:
+            self.requests["count"] += 1
+            self.requests["queries"] += queries
+            self.requests["max_queries"] = max(self.requests["max_queries"], queries)
+
+    def record_n_plus_one(self):
+        with self._lock:
+            self.requests["n_plus_one"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "statements": {statement: dict(stats) for statement, stats in self.statements.items()},
+                "query_duration_ms": _histogram_dict(self.query_duration),
+                "acquire_duration_ms": _histogram_dict(self.acquire_duration),
+                "slow_queries": list(self.slow_queries),
+                "requests": dict(self.requests),
+            }
+
+
+metrics = QueryMetrics()
+
+
+def normalize_statement(query, connection):
+    """Texto de la sentencia en una línea, para agrupar métricas."""
+    if isinstance(query, sql.Composable):
+        query = query.as_string(connection)
+    elif isinstance(query, bytes):
+        query = query.decode(errors="replace")
+    return " ".join(str(query).split())[:Config.STATEMENT_MAX_LENGTH]
+
+
+class _StatementRecorder:
+    """Registro común a los cursores síncronos y asíncronos."""
+
+    def _record(self, query, start, error=False):
+        """Anota la sentencia; devuelve (statement, elapsed_ms) si es lenta."""
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        statement = normalize_statement(query, self.connection)
+        if not statement:
+            return None  # Health check del pool
+        metrics.record_query(statement, elapsed_ms, self.rowcount, error)
+
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[statement] += 1
+
+        if not error and elapsed_ms >= Config.SLOW_QUERY_MS:
+            return statement, elapsed_ms
+        return None
+
+    @staticmethod
+    def _wants_plan(statement):
+        return Config.EXPLAIN_SLOW_QUERIES and statement.upper().startswith(EXPLAIN_PREFIXES) \
+            and metrics.should_explain(statement)
+
+    @staticmethod
+    def _explain_query(query):
+        return sql.SQL("EXPLAIN ") + (query if isinstance(query, sql.Composable) else sql.SQL(query))
+
+    @staticmethod
+    def _log_slow(statement, elapsed_ms, plan):
+        logger.warning(f"Slow query ({elapsed_ms:.1f} ms): {statement}")
+        metrics.record_slow_query(statement, elapsed_ms, plan)
+
+
+def _plan_text(rows):
+    return "\n".join(next(iter(row.values())) if isinstance(row, dict) else row[0] for row in rows)
+
+
+class InstrumentedCursor(_StatementRecorder, psycopg.Cursor):
+    """Cursor que mide cada sentencia y registra las lentas con su plan."""
+
+    def execute(self, query, params=None, **kwargs):
+        if not Config.ENABLED:
+            return super().execute(query, params, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            super().execute(query, params, **kwargs)
+        except Exception:
+            self._record(query, start, error=True)
+            raise
+        self._after(query, params, start)
+        return self
+
+    def executemany(self, query, params_seq, **kwargs):
+        if not Config.ENABLED:
+            return super().executemany(query, params_seq, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            super().executemany(query, params_seq, **kwargs)
+        except Exception:
+            self._record(query, start, error=True)
+            raise
+        self._after(query, None, start)
+
+    def _after(self, query, params, start):
+        slow = self._record(query, start)
+        if slow is not None:
+            statement, elapsed_ms = slow
+            plan = self._explain(query, params) if self._wants_plan(statement) else None
+            self._log_slow(statement, elapsed_ms, plan)
+
+    def _explain(self, query, params):
+        """Plan estimado (sin ANALYZE: no vuelve a ejecutar la sentencia)."""
+        if self.connection.info.transaction_status == psycopg.pq.TransactionStatus.INERROR:
+            return None
+        try:
+            # Savepoint: si el EXPLAIN falla no rompe la transacción de quien llama.
+            # Cursor sin instrumentar para no medir (ni explicar) el propio EXPLAIN
+            with self.connection.transaction(), psycopg.Cursor(self.connection) as cursor:
+                cursor.execute(self._explain_query(query), params)
+                return _plan_text(cursor.fetchall())
+        except psycopg.Error as e:
+            logger.debug(f"Could not explain slow query: {e}")
+            return None
+
+
+class AsyncInstrumentedCursor(_StatementRecorder, psycopg.AsyncCursor):
+    """Versión asíncrona de InstrumentedCursor (pool de models/aio)."""
+
+    async def execute(self, query, params=None, **kwargs):
+        if not Config.ENABLED:
+            return await super().execute(query, params, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            await super().execute(query, params, **kwargs)
+        except Exception:
+            self._record(query, start, error=True)
+            raise
+        slow = self._record(query, start)
+        if slow is not None:
+            statement, elapsed_ms = slow
+            plan = await self._explain(query, params) if self._wants_plan(statement) else None
+            self._log_slow(statement, elapsed_ms, plan)
+        return self
+
+    async def _explain(self, query, params):
+        if self.connection.info.transaction_status == psycopg.pq.TransactionStatus.INERROR:
+            return None
+        try:
+            async with self.connection.transaction():
+                async with psycopg.AsyncCursor(self.connection) as cursor:
+                    await cursor.execute(self._explain_query(query), params)
+                    return _plan_text(await cursor.fetchall())
+        except psycopg.Error as e:
+            logger.debug(f"Could not explain slow query: {e}")
+            return None
+
+
+def begin_request():
+    """Empieza a contar las consultas de la petición actual."""
+    return _request_queries.set(Counter())
+
+
+def end_request(token, label=""):
+    """Cierra el contador de la petición y avisa si parece un patrón N+1."""
+    queries = _request_queries.get()
+    _request_queries.reset(token)
+    if queries is None:
+        return 0
+
+    total = sum(queries.values())
+    metrics.record_request(total)
+    repeated = [(statement, count) for statement, count in queries.items() if count >= Config.N_PLUS_ONE_THRESHOLD]
+    if repeated:
+        metrics.record_n_plus_one()
+        for statement, count in repeated:
+            logger.warning(f"Possible N+1 in {label or 'request'}: {count}x {statement}")
+    return total
+
+
+def _histogram_dict(histogram):
+    buckets = {}
+    cumulative = 0
+    for bound, count in zip(BUCKETS_MS + (float("inf"),), histogram.counts):
+        cumulative += count
+        buckets[str(bound)] = cumulative
+    return {"buckets": buckets, "sum": histogram.total, "count": histogram.count}
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _prometheus_histogram(lines, name, help_text, histogram):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for bound, cumulative in histogram["buckets"].items():
+        le = "+Inf" if bound == "inf" else bound
+        lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+    lines.append(f"{name}_sum {histogram['sum']}")
+    lines.append(f"{name}_count {histogram['count']}")
+
+
+def prometheus_text(extra_gauges=None):
+    """Métricas en formato de texto de Prometheus."""
+    snapshot = metrics.snapshot()
+    lines = []
+    _prometheus_histogram(lines, "matcha_db_query_duration_ms", "Duración de las sentencias SQL.",
+                          snapshot["query_duration_ms"])
+    _prometheus_histogram(lines, "matcha_db_acquire_duration_ms", "Espera para obtener una conexión del pool.",
+                          snapshot["acquire_duration_ms"])
+
+    per_statement = (
+        ("matcha_db_statement_calls_total", "count", "Ejecuciones por sentencia."),
+        ("matcha_db_statement_duration_ms_total", "total_ms", "Tiempo acumulado por sentencia."),
+        ("matcha_db_statement_duration_ms_max", "max_ms", "Máximo por sentencia."),
+        ("matcha_db_statement_rows_total", "rows", "Filas devueltas o afectadas por sentencia."),
+        ("matcha_db_statement_errors_total", "errors", "Errores por sentencia."),
+    )
+    for name, key, help_text in per_statement:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {'gauge' if key == 'max_ms' else 'counter'}")
+        for statement, stats in snapshot["statements"].items():
+            lines.append(f'{name}{{statement="{_escape_label(statement)}"}} {stats[key]}')
+
+    requests = snapshot["requests"]
+    for key, value in requests.items():
+        name = f"matcha_requests_{key}" + ("" if key == "max_queries" else "_total")
+        lines.append(f"# TYPE {name} {'gauge' if key == 'max_queries' else 'counter'}")
+        lines.append(f"{name} {value}")
+
+    for name, value in (extra_gauges or {}).items():
+        if isinstance(value, (int, float)):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,236 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    interests_model.py                                 :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 16:21:07 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 16:21:07 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .database import Database
+from .tag_index import tag_index, publish_tag_change
+import logging
+import re
+
+logging.basicConfig(level=logging.INFO)
+
+MAX_TAG_LENGTH = 100
+MAX_TAGS_PER_USER = 20
+TAG_PATTERN = re.compile(r"^[\w-]+$")
+
+
+def normalize_tag(tag):
+    """Normaliza un tag: minúsculas, sin espacios ni '#' inicial."""
+    if not isinstance(tag, str):
+        raise ValueError("Tags must be strings.")
+    tag = tag.strip().lstrip("#").lower()
+    if not tag or len(tag) > MAX_TAG_LENGTH or not TAG_PATTERN.match(tag):
+        raise ValueError(f"Invalid tag: {tag!r}")
+    return tag
+
+
+def upsert_tags(tags):
+    """Crea los tags que no existan y devuelve {tag: id} para todos."""
+    tags = sorted({normalize_tag(tag) for tag in tags})
+    if not tags:
+        return {}
+
+    # DO NOTHING no devuelve las filas existentes: se leen en la misma sentencia
+    query = '''
+        WITH inserted AS (
+            INSERT INTO interests (tag)
+            SELECT unnest(%s::varchar[])
+            ON CONFLICT (tag) DO NOTHING
+            RETURNING id, tag
+        )
+        SELECT id, tag FROM inserted
+        UNION ALL
+        SELECT id, tag FROM interests WHERE tag = ANY(%s)
+    '''
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (tags, tags))
+                rows = cursor.fetchall()
+                connection.commit()
+                return {row["tag"]: row["id"] for row in rows}
+    except Exception as e:
+        logging.error(f"Error upserting tags {tags}: {e}")
+        raise Exception("Error upserting tags") from e
+
+
+def get_tags_by_ids(tag_ids):
+    """Devuelve {id: tag} para los ids dados."""
+    if not tag_ids:
+        return {}
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT id, tag FROM interests WHERE id = ANY(%s)", (list(tag_ids),))
+                return {row["id"]: row["tag"] for row in cursor.fetchall()}
+    except Exception as e:
+        logging.error(f"Error fetching tags {tag_ids}: {e}")
+        raise Exception("Error fetching tags") from e
+
+
+def autocomplete_tags(prefix, limit=10):
+    """Tags que empiezan por el prefijo, los más populares primero."""
+    try:
+        prefix = normalize_tag(prefix)
+    except ValueError:
+        return []
+
+    # El índice varchar_pattern_ops resuelve el LIKE 'prefijo%'; se leen más
+    # candidatos de los pedidos para reordenarlos por popularidad en memoria
+    query = '''
+        SELECT id, tag FROM interests
+        WHERE tag LIKE %s
+        ORDER BY tag
+        LIMIT %s
+    '''
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (escaped + "%", limit * 5))
+                rows = cursor.fetchall()
+    except Exception as e:
+        logging.error(f"Error autocompleting tags for prefix {prefix!r}: {e}")
+        raise Exception("Error autocompleting tags") from e
+
+    for row in rows:
+        row["users"] = tag_index.tag_cardinality(row["id"])
+    rows.sort(key=lambda row: (row["tag"] != prefix, -row["users"], row["tag"]))
+    return rows[:limit]
+
+
+def get_user_tags(user_id):
+    """Tags de un usuario."""
+    if not user_id:
+        raise ValueError("user_id is required to fetch tags.")
+
+    query = '''
+        SELECT i.id, i.tag
+        FROM user_interests ui
+        JOIN interests i ON i.id = ui.interest_id
+        WHERE ui.user_id = %s
+        ORDER BY i.tag
+    '''
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (user_id,))
+                return cursor.fetchall()
+    except Exception as e:
+        logging.error(f"Error fetching tags for user ID {user_id}: {e}")
+        raise Exception("Error fetching user tags") from e
+
+
+def set_user_tags(user_id, tags):
+    """Sustituye los tags de un usuario y actualiza el índice invertido."""
+    if not user_id:
+        raise ValueError("user_id is required to set tags.")
+    tag_ids = upsert_tags(tags)
+    if len(tag_ids) > MAX_TAGS_PER_USER:
+        raise ValueError(f"A user can have at most {MAX_TAGS_PER_USER} tags.")
+    return _apply_user_tags(user_id, add=tag_ids.values(), replace=True)
+
+
+def add_user_tags(user_id, tags):
+    """Añade tags a un usuario."""
+    if not user_id:
+        raise ValueError("user_id is required to add tags.")
+    return _apply_user_tags(user_id, add=upsert_tags(tags).values())
+
+
+def remove_user_tags(user_id, tags):
+    """Quita tags a un usuario."""
+    if not user_id:
+        raise ValueError("user_id is required to remove tags.")
+    return _apply_user_tags(user_id, remove=resolve_tag_ids(tags).values())
+
+
+def _apply_user_tags(user_id, add=(), remove=(), replace=False):
+    """Aplica el cambio en una transacción y devuelve (añadidos, quitados)."""
+    add, remove = list(add), list(remove)
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                if replace:
+                    cursor.execute(
+                        "DELETE FROM user_interests WHERE user_id = %s AND interest_id <> ALL(%s) RETURNING interest_id",
+                        (user_id, add),
+                    )
+                else:
+                    cursor.execute(
+                        "DELETE FROM user_interests WHERE user_id = %s AND interest_id = ANY(%s) RETURNING interest_id",
+                        (user_id, remove),
+                    )
+                removed = [row["interest_id"] for row in cursor.fetchall()]
+                cursor.execute(
+                    '''
+                    INSERT INTO user_interests (user_id, interest_id)
+                    SELECT %s, unnest(%s::int[])
+                    ON CONFLICT DO NOTHING
+                    RETURNING interest_id
+                    ''',
+                    (user_id, add),
+                )
+                added = [row["interest_id"] for row in cursor.fetchall()]
+                cursor.execute("SELECT COUNT(*) AS count FROM user_interests WHERE user_id = %s", (user_id,))
+                if cursor.fetchone()["count"] > MAX_TAGS_PER_USER:
+                    raise ValueError(f"A user can have at most {MAX_TAGS_PER_USER} tags.")
+                publish_tag_change(cursor, user_id, added, removed)
+                connection.commit()
+    except ValueError:
+        raise
+    except Exception as e:
+        logging.error(f"Error updating tags for user ID {user_id}: {e}")
+        raise Exception("Error updating user tags") from e
+
+    # Solo tras el commit: el índice nunca refleja cambios que no existen
+    tag_index.apply_change(user_id, added, removed)
+    return added, removed
+
+
+def resolve_tag_ids(tags):
+    """Devuelve {tag: id} de los tags conocidos (los desconocidos no tienen usuarios)."""
+    names = sorted({normalize_tag(tag) for tag in tags})
+    if not names:
+        return {}
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT id, tag FROM interests WHERE tag = ANY(%s)", (names,))
+                return {row["tag"]: row["id"] for row in cursor.fetchall()}
+    except Exception as e:
+        logging.error(f"Error resolving tags {names}: {e}")
+        raise Exception("Error resolving tags") from e
+
+
+def users_with_all_tags(tags):
+    """Ids de los usuarios que tienen todos los tags."""
+    tag_ids = resolve_tag_ids(tags)
+    if not tag_ids or len(tag_ids) < len({normalize_tag(tag) for tag in tags}):
+        return []
+    return tag_index.users_with_all(tag_ids.values()).to_list()
+
+
+def users_with_any_tag(tags):
+    """Ids de los usuarios que tienen alguno de los tags."""
+    return tag_index.users_with_any(resolve_tag_ids(tags).values()).to_list()
+
+
+def users_with_at_least(tags, k):
+    """Ids de los usuarios que comparten al menos k de los tags."""
+    if k <= 0:
+        raise ValueError("k must be positive.")
+    return tag_index.users_with_at_least(resolve_tag_ids(tags).values(), k).to_list()
+
+
+def shared_tag_count(user_a, user_b):
+    """Número de tags en común entre dos usuarios."""
+    return tag_index.shared_tag_count(user_a, user_b)
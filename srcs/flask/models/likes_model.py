@@ -1,9 +1,71 @@
 from .database import Database
+from .blocks_model import not_blocked, resolve_blocked
+from .fame_model import update_like_counters
+from .events import publish_event
+from .notification_writer import queue_like_notifications
+from .queries import register, run, stream
+from .user_model import get_users_many
+from psycopg.rows import tuple_row
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+INSERT_LIKE = register("likes.insert", '''
+    INSERT INTO likes (user_id, liked_user_id, timestamp)
+    VALUES (%s, %s, CURRENT_TIMESTAMP)
+    ON CONFLICT DO NOTHING
+''')
+DELETE_LIKE = register("likes.delete", '''
+    DELETE FROM likes
+    WHERE user_id = %s AND liked_user_id = %s
+''')
+# Serializa las escrituras de un mismo par: sin él, dos likes recíprocos simultáneos
+# no ven el del otro (READ COMMITTED) y ni el match ni el contador de matches se crean
+LOCK_LIKE_PAIR = register("likes.lock_pair", '''
+    SELECT pg_advisory_xact_lock(LEAST(%(liker)s, %(liked)s)::int, GREATEST(%(liker)s, %(liked)s)::int)
+''')
+INSERT_MATCH = register("matches.insert_if_mutual", '''
+    INSERT INTO matches (user_low, user_high)
+    SELECT LEAST(%(liker)s, %(liked)s), GREATEST(%(liker)s, %(liked)s)
+    WHERE EXISTS (SELECT 1 FROM likes WHERE user_id = %(liked)s AND liked_user_id = %(liker)s)
+    ON CONFLICT DO NOTHING
+''')
+DELETE_MATCH = register("matches.delete", '''
+    DELETE FROM matches
+    WHERE user_low = LEAST(%(liker)s, %(liked)s) AND user_high = GREATEST(%(liker)s, %(liked)s)
+''')
+# Los listados excluyen a los usuarios bloqueados (segundo parámetro, int[])
+GET_LIKED_USERS = register("likes.liked_by_user", f'''
+    SELECT liked_user_id
+    FROM likes
+    WHERE user_id = %s AND {not_blocked("liked_user_id")}
+''')
+GET_LIKERS = register("likes.likers_of_user", f'''
+    SELECT user_id
+    FROM likes
+    WHERE liked_user_id = %s AND {not_blocked("user_id")}
+''')
+IS_MATCH = register("matches.exists", '''
+    SELECT 1 FROM matches
+    WHERE user_low = LEAST(%s, %s) AND user_high = GREATEST(%s, %s)
+''')
+GET_MATCHES = register("matches.for_user", f'''
+    SELECT user_id, created_at FROM (
+        SELECT user_high AS user_id, created_at FROM matches WHERE user_low = %s
+        UNION ALL
+        SELECT user_low AS user_id, created_at FROM matches WHERE user_high = %s
+    ) AS m
+    WHERE {not_blocked("m.user_id")}
+    ORDER BY created_at DESC, user_id
+''')
+MATCH_STATUS = register("likes.match_status", '''
+    SELECT other.id,
+           EXISTS (SELECT 1 FROM likes WHERE user_id = %(user)s AND liked_user_id = other.id),
+           EXISTS (SELECT 1 FROM likes WHERE user_id = other.id AND liked_user_id = %(user)s)
+    FROM unnest(%(ids)s::int[]) AS other(id)
+''')
+
 # Función utilitaria para validar parámetros
 def validate_parameters(*args):
     """Valida que ninguno de los parámetros sea None o vacío."""
@@ -26,27 +88,70 @@ def execute_write_query(query, params):
 
 # Función común para ejecutar consultas de lectura
 def execute_read_query(query, params):
-    """Ejecuta una consulta SQL de lectura (SELECT)."""
+    """Ejecuta una consulta de lectura registrada (SELECT)."""
     try:
         with Database.get_connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(query, params)
-                return cursor.fetchall()  # Devuelve todos los resultados
+                return run(cursor, query, params).fetchall()  # Devuelve todos los resultados
     except Exception as e:
         logger.error(f"Database error: {e}")
         raise Exception("Database read operation failed.") from e
 
+# Mantiene la tabla matches en la transacción del like/unlike
+def update_match(cursor, user_id, liked_user_id, delta):
+    """Crea el match si el like es recíproco (delta 1) o lo elimina (delta -1). Indica si cambió."""
+    run(cursor, INSERT_MATCH if delta > 0 else DELETE_MATCH, {"liker": user_id, "liked": liked_user_id})
+    if cursor.rowcount <= 0:
+        return False
+    event_type = "match" if delta > 0 else "unmatch"
+    publish_event(cursor, event_type, (user_id, liked_user_id), {"user_id": user_id, "liked_user_id": liked_user_id})
+    logger.info(f"Users {user_id} and {liked_user_id}: {event_type}.")
+    return True
+
+# Avisos del like/unlike, encolados en el escritor por lotes tras el commit
+def notify_like(user_id, liked_user_id, delta, matched):
+    """Encola las notificaciones de like, match y unlike; un fallo aquí no deshace el like."""
+    if delta < 0 and not matched:
+        return
+    try:
+        users = get_users_many((user_id, liked_user_id))
+        queue_like_notifications(users, user_id, liked_user_id, delta, matched)
+    except Exception as e:
+        logger.error(f"Error notifying like {user_id} -> {liked_user_id}: {e}")
+
+# Escritura de un like/unlike junto con los contadores de fama y el match, en una transacción
+def execute_like_write(query, user_id, liked_user_id, delta):
+    """Ejecuta el INSERT/DELETE del like y, si cambia algo, actualiza contadores y match.
+
+    El lock del par se toma antes de escribir y se suelta con el commit, así
+    que la transacción que llega segunda ve el like de la primera al comprobar
+    si es recíproco.
+    """
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                run(cursor, LOCK_LIKE_PAIR, {"liker": user_id, "liked": liked_user_id})
+                rowcount = run(cursor, query, (user_id, liked_user_id)).rowcount
+                matched = False
+                if rowcount > 0:
+                    update_like_counters(cursor, user_id, liked_user_id, delta)
+                    matched = update_match(cursor, user_id, liked_user_id, delta)
+                connection.commit()
+    except Exception as e:
+        logger.error(f"Database error: {e}")
+        raise Exception("Database write operation failed.") from e
+    if rowcount > 0:
+        notify_like(user_id, liked_user_id, delta, matched)
+    return rowcount
+
 # Función para dar "like" a un usuario
 def like_user(user_id, liked_user_id):
     """Registra un 'like' de un usuario hacia otro."""
     validate_parameters(user_id, liked_user_id)
+    if user_id == liked_user_id:
+        raise ValueError("Users cannot like themselves.")
     
-    query = '''
-        INSERT INTO likes (user_id, liked_user_id, timestamp)
-        VALUES (%s, %s, CURRENT_TIMESTAMP)
-        ON CONFLICT DO NOTHING
-    '''
-    rowcount = execute_write_query(query, (user_id, liked_user_id))
+    rowcount = execute_like_write(INSERT_LIKE, user_id, liked_user_id, 1)
     if rowcount > 0:
         logger.info(f"User {user_id} liked user {liked_user_id}.")
     else:
@@ -58,11 +163,7 @@ def unlike_user(user_id, liked_user_id):
     """Elimina un 'like' de un usuario hacia otro."""
     validate_parameters(user_id, liked_user_id)
     
-    query = '''
-        DELETE FROM likes
-        WHERE user_id = %s AND liked_user_id = %s
-    '''
-    rowcount = execute_write_query(query, (user_id, liked_user_id))
+    rowcount = execute_like_write(DELETE_LIKE, user_id, liked_user_id, -1)
     if rowcount > 0:
         logger.info(f"User {user_id} unliked user {liked_user_id}.")
     else:
@@ -70,18 +171,97 @@ def unlike_user(user_id, liked_user_id):
     return rowcount
 
 # Función para obtener usuarios a los que se les ha dado "like"
-def get_liked_users(user_id):
-    """Obtiene una lista de usuarios a los que un usuario ha dado 'like'."""
+def get_liked_users(user_id, blocked_ids=None):
+    """Obtiene una lista de usuarios a los que un usuario ha dado 'like' (sin los bloqueados)."""
     validate_parameters(user_id)
     
-    query = '''
-        SELECT liked_user_id
-        FROM likes
-        WHERE user_id = %s
-    '''
-    results = execute_read_query(query, (user_id,))
-    liked_users = [row[0] for row in results]  # Extrae los IDs de los usuarios
+    results = execute_read_query(GET_LIKED_USERS, (user_id, list(resolve_blocked(user_id, blocked_ids))))
+    liked_users = [row["liked_user_id"] for row in results]  # Extrae los IDs de los usuarios
     logger.info(f"User {user_id} has liked {len(liked_users)} users.")
     return liked_users
 
+# Recorrido en streaming de los "likes" dados (exportaciones, trabajos de fondo)
+def iter_liked_users(user_id, blocked_ids=None):
+    """Genera los IDs a los que un usuario ha dado 'like' con memoria constante."""
+    validate_parameters(user_id)
+    try:
+        for row in stream(GET_LIKED_USERS, (user_id, list(resolve_blocked(user_id, blocked_ids)))):
+            yield row["liked_user_id"]
+    except Exception as e:
+        logger.error(f"Database error: {e}")
+        raise Exception("Database read operation failed.") from e
 
+# Función para obtener los usuarios que han dado "like" a un usuario
+def get_likers(user_id, blocked_ids=None):
+    """Obtiene una lista de usuarios que han dado 'like' a un usuario (sin los bloqueados)."""
+    validate_parameters(user_id)
+
+    results = execute_read_query(GET_LIKERS, (user_id, list(resolve_blocked(user_id, blocked_ids))))
+    likers = [row["user_id"] for row in results]
+    logger.info(f"User {user_id} has been liked by {len(likers)} users.")
+    return likers
+
+# Función para comprobar si dos usuarios se han dado "like" mutuamente
+def is_match(user_id, other_user_id):
+    """Indica si dos usuarios tienen un match (una búsqueda por clave primaria)."""
+    validate_parameters(user_id, other_user_id)
+
+    return bool(execute_read_query(IS_MATCH, (user_id, other_user_id, user_id, other_user_id)))
+
+# Función para obtener los matches de un usuario
+def get_matches(user_id, blocked_ids=None):
+    """Obtiene los usuarios con los que un usuario tiene match, del más reciente al más antiguo."""
+    validate_parameters(user_id)
+
+    results = execute_read_query(GET_MATCHES, (user_id, user_id, list(resolve_blocked(user_id, blocked_ids))))
+    matches = [row["user_id"] for row in results]
+    logger.info(f"User {user_id} has {len(matches)} matches.")
+    return matches
+
+# Función para obtener la relación de un usuario con una página de perfiles
+def match_status(user_id, other_user_ids):
+    """Devuelve {id: {"liked", "liked_by", "match"}} para varios usuarios en una sola consulta."""
+    validate_parameters(user_id)
+    other_user_ids = list(dict.fromkeys(other_user_ids))
+    if not other_user_ids:
+        return {}
+
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor(row_factory=tuple_row) as cursor:
+                run(cursor, MATCH_STATUS, {"user": user_id, "ids": other_user_ids})
+                return {
+                    other_id: {"liked": liked, "liked_by": liked_by, "match": liked and liked_by}
+                    for other_id, liked, liked_by in cursor
+                }
+    except Exception as e:
+        logger.error(f"Database error: {e}")
+        raise Exception("Database read operation failed.") from e
+
+# Reconstrucción de la tabla matches (backfill tras cargas masivas de likes)
+def rebuild_matches():
+    """Recalcula la tabla matches a partir de los likes. Devuelve el número de matches."""
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute('''
+                    DELETE FROM matches m
+                    WHERE NOT EXISTS (SELECT 1 FROM likes WHERE user_id = m.user_low AND liked_user_id = m.user_high)
+                       OR NOT EXISTS (SELECT 1 FROM likes WHERE user_id = m.user_high AND liked_user_id = m.user_low)
+                ''')
+                cursor.execute('''
+                    INSERT INTO matches (user_low, user_high, created_at)
+                    SELECT a.user_id, a.liked_user_id, GREATEST(a.timestamp, b.timestamp)
+                    FROM likes a
+                    JOIN likes b ON b.user_id = a.liked_user_id AND b.liked_user_id = a.user_id
+                    WHERE a.user_id < a.liked_user_id
+                    ON CONFLICT DO NOTHING
+                ''')
+                cursor.execute("SELECT COUNT(*) AS count FROM matches")
+                count = cursor.fetchone()["count"]
+                connection.commit()
+                logger.info(f"Matches rebuilt: {count} matches.")
+                return count
+    except Exception as e:
+        logger.error(f"Error rebuilding matches: {e}")
+        raise Exception("Error rebuilding matches") from e
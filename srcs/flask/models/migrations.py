@@ -0,0 +1,538 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    migrations.py                                      :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 21:40:13 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 21:40:13 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Migraciones de esquema versionadas.
+
+Cada migración tiene un número de versión y se aplica una sola vez, en
+orden; schema_migrations guarda las aplicadas. Para cambiar el esquema se
+añade una migración al final de MIGRATIONS, nunca se edita una aplicada.
+
+Los índices se declaran con Index y se construyen con CREATE INDEX
+CONCURRENTLY fuera de transacción: no bloquean las escrituras de tablas
+grandes. Un índice que quedó inválido por un fallo se borra y se rehace.
+
+Las columnas derivadas no usan GENERATED ... STORED, que reescribe la tabla
+entera con ACCESS EXCLUSIVE: se añaden vacías (solo catálogo), un trigger las
+mantiene en las escrituras nuevas y Backfill rellena las filas existentes por
+lotes de ids, cada uno en su propia transacción corta.
+
+Uso (desde srcs/flask):
+    python3 -m models.migrations             # aplica las pendientes
+    python3 -m models.migrations --status    # versión actual y pendientes
+"""
+
+from .database import Database
+import argparse
+import logging
+import time
+import psycopg
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock: dos procesos no migran a la vez
+MIGRATION_LOCK_ID = 7436_1018
+
+
+class Index:
+    """Índice creado con CREATE INDEX CONCURRENTLY (fuera de transacción)."""
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.definition = definition  # "ON tabla (columnas) [INCLUDE ...] [WHERE ...]"
+
+    def apply(self, connection):
+        row = connection.execute(
+            '''
+            SELECT i.indisvalid AS valid FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s AND pg_catalog.pg_table_is_visible(c.oid)
+            ''',
+            (self.name,),
+        ).fetchone()
+        if row is not None and row["valid"]:
+            return
+        if row is not None:
+            logger.warning(f"Rebuilding invalid index {self.name}")
+            connection.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {self.name}")
+        connection.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} {self.definition}")
+
+
+class Backfill:
+    """Relleno por lotes de columnas derivadas (fuera de transacción, por rangos de id)."""
+
+    def __init__(self, table, assignments, pending, batch_size=10000):
+        self.table = table
+        self.assignments = assignments  # "columna = expresión, ..."
+        self.pending = pending  # Condición de las filas aún sin rellenar
+        self.batch_size = batch_size
+
+    def apply(self, connection):
+        # Las filas posteriores a max(id) ya las rellena el trigger
+        last_id = connection.execute(f"SELECT COALESCE(MAX(id), 0) AS id FROM {self.table}").fetchone()["id"]
+        updated = 0
+        for start in range(0, last_id, self.batch_size):
+            cursor = connection.execute(
+                f"UPDATE {self.table} SET {self.assignments} WHERE id > %s AND id <= %s AND {self.pending}",
+                (start, start + self.batch_size),
+            )
+            updated += cursor.rowcount
+        if updated:
+            logger.info(f"Backfilled {updated} rows of {self.table}")
+
+
+class Migration:
+    """Paso de esquema: sentencias SQL (en una transacción), rellenos por lotes y después índices."""
+
+    def __init__(self, version, description, statements=(), indexes=(), backfills=()):
+        self.version = version
+        self.description = description
+        self.statements = statements
+        self.indexes = indexes
+        self.backfills = backfills
+
+
+# Documento de búsqueda de un usuario: nombre de usuario y nombre con peso A,
+# ubicación B y biografía C. {row} es "NEW." en el trigger y "" en el relleno
+SEARCH_DOCUMENT_SQL = '''
+    setweight(to_tsvector('simple', coalesce({row}username, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}first_name, '') || ' ' || coalesce({row}last_name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}location, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce({row}biography, '')), 'C')
+'''
+
+
+MIGRATIONS = [
+    Migration(1, "Tablas iniciales", [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            first_name VARCHAR(50),
+            last_name VARCHAR(50),
+            birthdate DATE NOT NULL,
+            gender VARCHAR(10),
+            sexual_preferences VARCHAR(100),
+            biography TEXT,
+            fame_rating FLOAT DEFAULT 0.0,
+            profile_picture TEXT,
+            location VARCHAR(100),
+            latitude DOUBLE PRECISION,
+            longitude DOUBLE PRECISION,
+            is_active BOOLEAN DEFAULT FALSE,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_online BOOLEAN DEFAULT FALSE
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS likes (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            liked_user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, liked_user_id)
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            type VARCHAR(50) NOT NULL,
+            message TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_read BOOLEAN DEFAULT FALSE
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS interests (
+            id SERIAL PRIMARY KEY,
+            tag VARCHAR(100) UNIQUE NOT NULL
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_interests (
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            interest_id INTEGER REFERENCES interests(id) ON DELETE CASCADE,
+            PRIMARY KEY (user_id, interest_id)
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS chats (
+            id SERIAL PRIMARY KEY,
+            sender_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            receiver_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            message TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS pictures (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            image_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+        ''',
+    ]),
+    # Clave espacial (geohash) mantenida por las escrituras de ubicación
+    Migration(2, "Geohash de usuarios", [
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS geohash VARCHAR(12);",
+    ], indexes=[
+        Index("idx_users_geohash", "ON users (geohash varchar_pattern_ops)"),
+    ]),
+    # Clave de conversación (par de usuarios ordenado) para paginar sin OR,
+    # mantenida por un trigger y rellenada por lotes en los mensajes existentes
+    Migration(3, "Clave de conversación en chats", [
+        '''
+        ALTER TABLE chats
+            ADD COLUMN IF NOT EXISTS user_low INTEGER,
+            ADD COLUMN IF NOT EXISTS user_high INTEGER;
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION chats_conversation_key() RETURNS trigger AS $$
+        BEGIN
+            NEW.user_low := LEAST(NEW.sender_id, NEW.receiver_id);
+            NEW.user_high := GREATEST(NEW.sender_id, NEW.receiver_id);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+        ''',
+        "DROP TRIGGER IF EXISTS chats_conversation_key ON chats;",
+        '''
+        CREATE TRIGGER chats_conversation_key BEFORE INSERT OR UPDATE OF sender_id, receiver_id ON chats
+            FOR EACH ROW EXECUTE FUNCTION chats_conversation_key();
+        ''',
+    ], backfills=[
+        Backfill("chats", "user_low = LEAST(sender_id, receiver_id), user_high = GREATEST(sender_id, receiver_id)",
+                 "user_low IS NULL"),
+    ], indexes=[
+        Index("idx_chats_conversation", "ON chats (user_low, user_high, timestamp, id)"),
+    ]),
+    # Índice parcial: el contador de no leídas solo recorre las no leídas
+    Migration(4, "Notificaciones no leídas", indexes=[
+        Index("idx_notifications_unread", "ON notifications (user_id) WHERE is_read = FALSE"),
+    ]),
+    # Intereses: autocompletado por prefijo y búsqueda inversa tag -> usuarios
+    Migration(5, "Índices de intereses", indexes=[
+        Index("idx_interests_tag_prefix", "ON interests (tag varchar_pattern_ops)"),
+        Index("idx_user_interests_interest", "ON user_interests (interest_id, user_id)"),
+    ]),
+    # Búsqueda: índices de cobertura (exploración solo de índice) por cada
+    # columna que puede ordenar o filtrar primero
+    Migration(6, "Índices de búsqueda", indexes=[
+        Index("idx_users_search_birthdate",
+              "ON users (birthdate, id) INCLUDE (fame_rating, geohash, latitude, longitude) WHERE is_active"),
+        Index("idx_users_search_fame",
+              "ON users (fame_rating, id) INCLUDE (birthdate, geohash, latitude, longitude) WHERE is_active"),
+        Index("idx_users_search_geohash",
+              "ON users (geohash varchar_pattern_ops) INCLUDE (id, birthdate, fame_rating, latitude, longitude) WHERE is_active"),
+    ]),
+    # Contadores de fama mantenidos por las escrituras; dirty marca los
+    # usuarios cuya fama hay que recalcular en la siguiente pasada
+    Migration(7, "Contadores de fama", [
+        '''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            likes_received INTEGER NOT NULL DEFAULT 0,
+            likes_given INTEGER NOT NULL DEFAULT 0,
+            visits_received INTEGER NOT NULL DEFAULT 0,
+            matches INTEGER NOT NULL DEFAULT 0,
+            dirty BOOLEAN NOT NULL DEFAULT TRUE,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        ''',
+    ], indexes=[
+        Index("idx_user_stats_dirty", "ON user_stats (user_id) WHERE dirty"),
+    ]),
+    # Likes recibidos (get_likers, borrado en cascada) y matches
+    # materializados: un par ordenado por cada like mutuo
+    Migration(8, "Matches", [
+        '''
+        CREATE TABLE IF NOT EXISTS matches (
+            user_low INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            user_high INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_low, user_high),
+            CHECK (user_low < user_high)
+        );
+        ''',
+    ], indexes=[
+        Index("idx_likes_liked_user", "ON likes (liked_user_id, user_id)"),
+        Index("idx_matches_user_high", "ON matches (user_high, user_low)"),
+    ]),
+    # Ficheros de imagen (uno por contenido distinto) referenciados por
+    # pictures.image_id, y contador de fotos por usuario: el límite se
+    # comprueba y reserva en el mismo UPDATE que bloquea la fila del usuario
+    Migration(9, "Imágenes", [
+        '''
+        CREATE TABLE IF NOT EXISTS images (
+            id SERIAL PRIMARY KEY,
+            sha256 CHAR(64) UNIQUE NOT NULL,
+            extension VARCHAR(8) NOT NULL,
+            content_type VARCHAR(32) NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            thumbnails_ready BOOLEAN NOT NULL DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        ''',
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS picture_count SMALLINT NOT NULL DEFAULT 0;",
+        '''
+        UPDATE users SET picture_count = counts.count
+        FROM (SELECT user_id, COUNT(*) AS count FROM pictures GROUP BY user_id) AS counts
+        WHERE users.id = counts.user_id AND users.picture_count <> counts.count;
+        ''',
+    ], indexes=[
+        Index("idx_pictures_user", "ON pictures (user_id, id)"),
+        Index("idx_pictures_image", "ON pictures (image_id)"),
+    ]),
+    # Claves foráneas sin índice: borrar un usuario recorría chats entera, y
+    # el listado de notificaciones ordenaba todas las del usuario
+    Migration(10, "Índices de chats y notificaciones", indexes=[
+        Index("idx_chats_sender", "ON chats (sender_id, receiver_id, timestamp)"),
+        Index("idx_chats_receiver", "ON chats (receiver_id)"),
+        Index("idx_notifications_user_timestamp", "ON notifications (user_id, timestamp DESC)"),
+    ]),
+    # Visitas a perfiles: una fila por par (visitado, visitante) con la última
+    # visita, y un resumen diario por perfil para las estadísticas semanales
+    Migration(11, "Visitas", [
+        '''
+        CREATE TABLE IF NOT EXISTS profile_visits (
+            visited_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            visitor_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            visits INTEGER NOT NULL DEFAULT 1,
+            first_visit TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_visit TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (visited_id, visitor_id),
+            CHECK (visited_id <> visitor_id)
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS profile_visit_days (
+            visited_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            visits INTEGER NOT NULL DEFAULT 0,
+            unique_visitors INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (visited_id, day)
+        );
+        ''',
+    ], indexes=[
+        Index("idx_profile_visits_recent", "ON profile_visits (visited_id, last_visit DESC, visitor_id)"),
+        Index("idx_profile_visits_visitor", "ON profile_visits (visitor_id)"),
+    ]),
+    # Búsqueda de texto: documento tsvector mantenido por un trigger (ver
+    # SEARCH_DOCUMENT_SQL), trigramas para búsquedas aproximadas y prefijos en
+    # orden de bytes (COLLATE "C") para el typeahead
+    Migration(12, "Búsqueda de texto", [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS search_document tsvector;",
+        f'''
+        CREATE OR REPLACE FUNCTION users_search_document() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_document := {SEARCH_DOCUMENT_SQL.format(row="NEW.")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+        ''',
+        "DROP TRIGGER IF EXISTS users_search_document ON users;",
+        '''
+        CREATE TRIGGER users_search_document
+            BEFORE INSERT OR UPDATE OF username, first_name, last_name, location, biography ON users
+            FOR EACH ROW EXECUTE FUNCTION users_search_document();
+        ''',
+    ], backfills=[
+        Backfill("users", f"search_document = {SEARCH_DOCUMENT_SQL.format(row='')}", "search_document IS NULL"),
+    ], indexes=[
+        Index("idx_users_search_document", "ON users USING gin (search_document) WHERE is_active"),
+        Index("idx_users_username_trgm", "ON users USING gin (lower(username) gin_trgm_ops) WHERE is_active"),
+        Index("idx_users_full_name_trgm",
+              "ON users USING gin (lower(coalesce(first_name, '') || ' ' || coalesce(last_name, '')) gin_trgm_ops) "
+              "WHERE is_active"),
+        Index("idx_users_username_prefix", "ON users ((lower(username)) COLLATE \"C\") WHERE is_active"),
+        Index("idx_users_full_name_prefix",
+              "ON users ((lower(coalesce(first_name, '') || ' ' || coalesce(last_name, ''))) COLLATE \"C\") "
+              "WHERE is_active"),
+        Index("idx_users_last_name_prefix", "ON users ((lower(last_name)) COLLATE \"C\") WHERE is_active"),
+    ]),
+    # Bloqueos (en ambos sentidos ocultan al otro usuario), denuncias y autor
+    # de las notificaciones para poder ocultar las de usuarios bloqueados
+    Migration(13, "Bloqueos y denuncias", [
+        '''
+        CREATE TABLE IF NOT EXISTS blocks (
+            blocker_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            blocked_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (blocker_id, blocked_id),
+            CHECK (blocker_id <> blocked_id)
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS reports (
+            id SERIAL PRIMARY KEY,
+            reporter_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            reported_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            reason TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (reporter_id, reported_id),
+            CHECK (reporter_id <> reported_id)
+        );
+        ''',
+        "ALTER TABLE notifications ADD COLUMN IF NOT EXISTS actor_id INTEGER REFERENCES users(id) ON DELETE CASCADE;",
+    ], indexes=[
+        Index("idx_blocks_blocked", "ON blocks (blocked_id, blocker_id)"),
+        Index("idx_reports_reported", "ON reports (reported_id)"),
+    ]),
+    # Una fila por conversación (par ordenado, como chats.user_low/user_high)
+    # mantenida por create_message: último mensaje, última actividad y, por
+    # participante, hasta qué mensaje ha leído y cuántos le quedan por leer.
+    # El historial anterior se da por leído
+    Migration(14, "Conversaciones", [
+        '''
+        CREATE TABLE IF NOT EXISTS conversations (
+            user_low INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            user_high INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            last_message_id INTEGER REFERENCES chats(id) ON DELETE SET NULL,
+            last_activity TIMESTAMP NOT NULL,
+            low_read_id INTEGER NOT NULL DEFAULT 0,
+            high_read_id INTEGER NOT NULL DEFAULT 0,
+            low_unread INTEGER NOT NULL DEFAULT 0,
+            high_unread INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_low, user_high),
+            CHECK (user_low <= user_high)
+        );
+        ''',
+        '''
+        INSERT INTO conversations (user_low, user_high, last_message_id, last_activity, low_read_id, high_read_id)
+        SELECT DISTINCT ON (user_low, user_high)
+               user_low, user_high, id, COALESCE(timestamp, CURRENT_TIMESTAMP), id, id
+        FROM chats
+        WHERE user_low IS NOT NULL
+        ORDER BY user_low, user_high, timestamp DESC, id DESC
+        ON CONFLICT DO NOTHING;
+        ''',
+    ], indexes=[
+        Index("idx_conversations_low_activity", "ON conversations (user_low, last_activity DESC, user_high)"),
+        Index("idx_conversations_high_activity", "ON conversations (user_high, last_activity DESC, user_low)"),
+    ]),
+    # Trigramas en GiST para buscar por distancia (ORDER BY ... <-> texto LIMIT n):
+    # los candidatos aproximados de search_users salen ya ordenados por parecido
+    Migration(15, "Vecinos por trigramas", indexes=[
+        Index("idx_users_username_trgm_gist", "ON users USING gist (lower(username) gist_trgm_ops) WHERE is_active"),
+        Index("idx_users_full_name_trgm_gist",
+              "ON users USING gist (lower(coalesce(first_name, '') || ' ' || coalesce(last_name, '')) gist_trgm_ops) "
+              "WHERE is_active"),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(connection=None):
+    """Última versión aplicada (0 si no hay tabla de versiones). Una sola consulta."""
+    def query(conn):
+        try:
+            with conn.transaction():
+                return conn.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations").fetchone()["version"]
+        except psycopg.errors.UndefinedTable:
+            return 0
+
+    if connection is not None:
+        return query(connection)
+    with Database.get_connection() as connection:
+        return query(connection)
+
+
+def check_schema():
+    """Comprobación de arranque: True si no hay migraciones pendientes.
+
+    Usa una conexión dedicada y no el pool: se llama desde el maestro de
+    gunicorn, que no debe quedarse con conexiones que heredarían los workers.
+    """
+    try:
+        with Database.get_dedicated_connection() as connection:
+            version = current_version(connection)
+    except Exception as e:
+        logger.error(f"Error checking schema version: {e}")
+        raise Exception("Error checking schema version") from e
+    if version < LATEST_VERSION:
+        logger.warning(f"Database schema at version {version}, latest is {LATEST_VERSION}: "
+                       f"run python3 -m models.migrations")
+        return False
+    return True
+
+
+def migrate(target=LATEST_VERSION):
+    """Aplica en orden las migraciones pendientes hasta target. Devuelve las aplicadas."""
+    applied = []
+    # Conexión dedicada en autocommit: CREATE INDEX CONCURRENTLY no admite transacción
+    with Database.get_dedicated_connection(autocommit=True) as connection:
+        connection.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    duration_ms DOUBLE PRECISION
+                )
+            ''')
+            version = current_version(connection)
+            for migration in MIGRATIONS:
+                if migration.version <= version or migration.version > target:
+                    continue
+                start = time.perf_counter()
+                try:
+                    with connection.transaction():
+                        for statement in migration.statements:
+                            connection.execute(statement)
+                    for backfill in migration.backfills:
+                        backfill.apply(connection)
+                    for index in migration.indexes:
+                        index.apply(connection)
+                except psycopg.Error as e:
+                    logger.error(f"Migration {migration.version} ({migration.description}) failed: {e}")
+                    raise Exception(f"Migration {migration.version} failed") from e
+                duration_ms = (time.perf_counter() - start) * 1000
+                connection.execute(
+                    "INSERT INTO schema_migrations (version, description, duration_ms) VALUES (%s, %s, %s)",
+                    (migration.version, migration.description, duration_ms),
+                )
+                logger.info(f"Applied migration {migration.version}: {migration.description} ({duration_ms:.0f} ms)")
+                applied.append(migration.version)
+        finally:
+            connection.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="Mostrar la versión actual sin migrar")
+    parser.add_argument("--target", type=int, default=LATEST_VERSION, help="Versión hasta la que migrar")
+    args = parser.parse_args()
+
+    if args.status:
+        version = current_version()
+        pending = [m for m in MIGRATIONS if m.version > version]
+        print(f"Schema version {version} (latest {LATEST_VERSION})")
+        for migration in pending:
+            print(f"  pending {migration.version}: {migration.description}")
+        return
+    applied = migrate(args.target)
+    print(f"Applied {len(applied)} migrations; schema at version {current_version()}")
+
+
+if __name__ == "__main__":
+    main()
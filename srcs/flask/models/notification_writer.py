@@ -0,0 +1,249 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    notification_writer.py                             :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 14:02:53 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 14:02:53 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .notifications_model import create_notifications_bulk
+from config import NotificationConfig as Config
+from collections import OrderedDict
+import atexit
+import logging
+import os
+import psycopg
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Mensaje para eventos agrupados del mismo tipo ({count} >= 2)
+COALESCED_MESSAGES = {
+    "like": "{count} personas te han dado like.",
+    "visit": "{count} personas han visitado tu perfil.",
+    "message": "Tienes {count} mensajes nuevos.",
+    "match": "Tienes {count} nuevos matches.",
+    "unlike": "{count} personas han retirado su like.",
+}
+
+# Mensaje para un evento suelto hecho por {username}
+EVENT_MESSAGES = {
+    "like": "{username} te ha dado like.",
+    "message": "{username} te ha enviado un mensaje.",
+    "match": "Tienes un match con {username}.",
+    "unlike": "{username} ha retirado su like.",
+}
+
+
+class NotificationWriter:
+    """Escritor de notificaciones por lotes.
+
+    Las notificaciones se acumulan en memoria y se agrupan por (usuario, tipo):
+    200 likes en un minuto acaban en una sola fila "200 personas te han dado
+    like". Un hilo las vuelca con un INSERT multi-fila al llegar a batch_size
+    filas o cuando la más antigua lleva max_delay segundos esperando.
+
+    Si un lote falla por sus datos (IntegrityError, DataError) se reintenta
+    fila a fila y se descartan las filas que fallan; cualquier otro error
+    devuelve el lote al buffer, hasta max_attempts volcados por entrada.
+    """
+
+    def __init__(self, batch_size=Config.BATCH_SIZE, max_delay=Config.MAX_DELAY,
+                 max_pending=Config.MAX_PENDING, max_attempts=Config.MAX_ATTEMPTS,
+                 flush_function=create_notifications_bulk):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.flush_function = flush_function
+        self._pending = OrderedDict()  # (user_id, tipo) -> {"count", "message", "actor_id", "queued_at", "attempts"}
+        self._condition = threading.Condition()
+        self._thread_pid = None
+        self._closed = False
+        self.stats = {"events": 0, "coalesced": 0, "rows_written": 0, "flushes": 0, "errors": 0, "dropped": 0}
+
+    def add(self, user_id, notification_type, message, actor_id=None, count=1):
+        """Encola un evento de notificación (count eventos si ya vienen agrupados)."""
+        self._ensure_thread()
+        with self._condition:
+            self.stats["events"] += count
+            key = (user_id, notification_type)
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry["count"] += count
+                entry["message"] = message
+                if entry["actor_id"] != actor_id:
+                    entry["actor_id"] = None  # Varias personas: la fila agrupada no tiene autor
+                self.stats["coalesced"] += 1
+            elif len(self._pending) >= self.max_pending:
+                self.stats["dropped"] += 1
+                logger.error(f"Notification buffer full, dropping {notification_type} for user {user_id}")
+            else:
+                self._pending[key] = {"count": count, "message": message, "actor_id": actor_id,
+                                      "queued_at": time.monotonic(), "attempts": 0}
+                # El hilo duerme sin plazo con el buffer vacío: despertarlo con la primera entrada
+                if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                    self._condition.notify()
+
+    def flush(self):
+        """Escribe inmediatamente todo lo pendiente. Devuelve las filas escritas."""
+        with self._condition:
+            batch = self._pending
+            self._pending = OrderedDict()
+        return self._write(batch)[0]
+
+    def close(self):
+        """Vuelca lo pendiente y detiene el hilo (al apagar el proceso)."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self.flush()
+
+    def _ensure_thread(self):
+        # El hilo no sobrevive a un fork: cada worker arranca el suyo
+        if self._thread_pid == os.getpid():
+            return
+        with self._condition:
+            if self._thread_pid != os.getpid():
+                self._pending = OrderedDict()
+                self._closed = False
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._run, name="notification-writer", daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._due():
+                    self._condition.wait(self._time_to_deadline())
+                if self._closed:
+                    return
+                batch = self._pending
+                self._pending = OrderedDict()
+            if self._write(batch)[1]:
+                # La base de datos falla: esperar antes de reintentar
+                with self._condition:
+                    self._condition.wait(max(self.max_delay, 1.0))
+
+    def _due(self):
+        if len(self._pending) >= self.batch_size:
+            return True
+        if not self._pending:
+            return False
+        oldest = next(iter(self._pending.values()))
+        return time.monotonic() - oldest["queued_at"] >= self.max_delay
+
+    def _time_to_deadline(self):
+        if not self._pending:
+            return self.max_delay
+        oldest = next(iter(self._pending.values()))
+        return max(0.0, oldest["queued_at"] + self.max_delay - time.monotonic())
+
+    def _write(self, batch):
+        """Escribe un lote en trozos de batch_size. Devuelve (filas escritas, si se devolvió algo al buffer)."""
+        items = list(batch.items())
+        written = start = isolate_until = 0
+        while start < len(items):
+            # Tras un error de datos, el trozo que falló se reintenta fila a fila
+            chunk = items[start:start + (1 if start < isolate_until else self.batch_size)]
+            try:
+                self.flush_function(
+                    [user_id for (user_id, _), _ in chunk],
+                    [notification_type for (_, notification_type), _ in chunk],
+                    [self._message(notification_type, entry) for (_, notification_type), entry in chunk],
+                    [entry["actor_id"] for _, entry in chunk],
+                )
+            except Exception as e:
+                self.stats["errors"] += 1
+                if not self._is_data_error(e):
+                    logger.error(f"Error flushing {len(chunk)} notifications: {e}")
+                    self._requeue(items[start:])
+                    return written, True
+                if len(chunk) > 1:
+                    logger.warning(f"Invalid row in a batch of {len(chunk)} notifications, retrying one by one: {e}")
+                    isolate_until = start + len(chunk)
+                    continue
+                # Reintentar una fila inválida no la arregla: se descarta
+                self.stats["dropped"] += 1
+                logger.error(f"Dropping notification {chunk[0][0]}: {e}")
+                start += 1
+                continue
+            written += len(chunk)
+            start += len(chunk)
+            self.stats["rows_written"] += len(chunk)
+            self.stats["flushes"] += 1
+        return written, False
+
+    @staticmethod
+    def _is_data_error(error):
+        """Indica si el fallo (o su causa) es de los datos y no de la conexión."""
+        while error is not None:
+            if isinstance(error, (psycopg.IntegrityError, psycopg.DataError)):
+                return True
+            error = error.__cause__
+        return False
+
+    @staticmethod
+    def _message(notification_type, entry):
+        template = COALESCED_MESSAGES.get(notification_type)
+        if entry["count"] > 1 and template:
+            return template.format(count=entry["count"])
+        return entry["message"]
+
+    def _requeue(self, items):
+        """Devuelve al buffer un lote fallido, por delante de lo encolado después.
+
+        Las entradas que ya han fallado max_attempts volcados se descartan.
+        """
+        with self._condition:
+            pending = OrderedDict()
+            for key, entry in items:
+                entry["attempts"] += 1
+                if entry["attempts"] >= self.max_attempts:
+                    self.stats["dropped"] += 1
+                    logger.error(f"Dropping notification {key} after {entry['attempts']} failed flushes")
+                else:
+                    pending[key] = entry
+            for key, entry in self._pending.items():
+                if key in pending:
+                    pending[key]["count"] += entry["count"]
+                    pending[key]["message"] = entry["message"]
+                    if pending[key]["actor_id"] != entry["actor_id"]:
+                        pending[key]["actor_id"] = None
+                else:
+                    pending[key] = entry
+            self._pending = pending
+
+notification_writer = NotificationWriter()
+atexit.register(notification_writer.close)
+
+
+def queue_notification(user_id, notification_type, message, actor_id=None, count=1):
+    """Encola una notificación para escribirla en el siguiente lote."""
+    if not user_id or not notification_type or not message:
+        raise ValueError("user_id, notification_type, and message are required to create a notification.")
+    notification_writer.add(user_id, notification_type, message, actor_id, count)
+
+
+def queue_event_notification(user_id, notification_type, actor):
+    """Encola el aviso de un evento (like, match, unlike, message) hecho por actor."""
+    username = actor["username"] if actor else "Alguien"
+    queue_notification(user_id, notification_type, EVENT_MESSAGES[notification_type].format(username=username),
+                       actor["id"] if actor else None)
+
+
+def queue_like_notifications(users, user_id, liked_user_id, delta, matched):
+    """Avisos de un like (delta 1) o unlike (delta -1) ya confirmado; users = {id: usuario}."""
+    if delta > 0:
+        queue_event_notification(liked_user_id, "like", users.get(user_id))
+        if matched:
+            queue_event_notification(user_id, "match", users.get(liked_user_id))
+            queue_event_notification(liked_user_id, "match", users.get(user_id))
+    elif matched:
+        # Solo se avisa del unlike que deshace un match
+        queue_event_notification(liked_user_id, "unlike", users.get(user_id))
@@ -1,54 +1,122 @@
 from .database import Database
+from .blocks_model import not_blocked, resolve_blocked
+from .events import publish_event, publish_events
+from .queries import register, run, execute, fetch_one, fetch_all, stream
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
-def create_notification(user_id, notification_type, message):
-    """Crea una nueva notificación para un usuario."""
+# Las lecturas ocultan las notificaciones cuyo autor está bloqueado (segundo parámetro, int[])
+GET_NOTIFICATIONS = register(
+    "notifications.for_user",
+    f"SELECT * FROM notifications WHERE user_id = %s AND {not_blocked('actor_id')} ORDER BY timestamp DESC",
+)
+GET_UNREAD_NOTIFICATIONS = register(
+    "notifications.unread_for_user",
+    f"SELECT * FROM notifications WHERE user_id = %s AND is_read = FALSE AND {not_blocked('actor_id')} "
+    "ORDER BY timestamp DESC",
+)
+COUNT_UNREAD = register(
+    "notifications.unread_count", "SELECT COUNT(*) AS unread FROM notifications WHERE user_id = %s AND is_read = FALSE"
+)
+# Con bloqueos el recuento necesita actor_id y deja de ser solo de índice
+COUNT_UNREAD_NOT_BLOCKED = register(
+    "notifications.unread_count_not_blocked",
+    f"SELECT COUNT(*) AS unread FROM notifications WHERE user_id = %s AND is_read = FALSE AND {not_blocked('actor_id')}",
+)
+INSERT_NOTIFICATION = register("notifications.insert", '''
+    INSERT INTO notifications (user_id, type, message, actor_id)
+    VALUES (%s, %s, %s, %s)
+    RETURNING id, user_id, type, message, timestamp, is_read, actor_id
+''')
+MARK_READ = register("notifications.mark_read", '''
+    UPDATE notifications
+    SET is_read = TRUE
+    WHERE id = %s
+    RETURNING id, user_id, type, message, timestamp, is_read
+''')
+MARK_ALL_READ = register(
+    "notifications.mark_all_read", "UPDATE notifications SET is_read = TRUE WHERE user_id = %s AND is_read = FALSE"
+)
+
+def create_notification(user_id, notification_type, message, actor_id=None):
+    """Crea una nueva notificación para un usuario (actor_id: quién la provoca, si es una persona)."""
     if not user_id or not notification_type or not message:
         raise ValueError("user_id, notification_type, and message are required to create a notification.")
     
-    query = '''
-        INSERT INTO notifications (user_id, type, message)
-        VALUES (%s, %s, %s)
-        RETURNING id, user_id, type, message, timestamp, is_read
-    '''
     try:
         with Database.get_connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(query, (user_id, notification_type, message))
+                result = run(cursor, INSERT_NOTIFICATION, (user_id, notification_type, message, actor_id)).fetchone()
+                publish_event(cursor, "notification", (user_id,), result)
                 connection.commit()
-                return cursor.fetchone()
+                return result
     except Exception as e:
         logging.error(f"Error creating notification for user ID {user_id}: {e}")
         raise Exception("Error creating notification") from e
 
-def get_notifications_for_user(user_id):
-    """Obtiene todas las notificaciones de un usuario."""
+def create_notifications_bulk(user_ids, notification_types, messages, actor_ids=None):
+    """Crea varias notificaciones en una sola sentencia y publica sus eventos."""
+    if actor_ids is None:
+        actor_ids = [None] * len(user_ids)
+    if not (len(user_ids) == len(notification_types) == len(messages) == len(actor_ids)):
+        raise ValueError("user_ids, notification_types, messages and actor_ids must have the same length.")
+    if not user_ids:
+        return []
+
+    # INSERT multi-fila y un NOTIFY por fila (se entregan al hacer commit); los
+    # destinatarios o autores borrados desde que se encoló el aviso se descartan
+    # en vez de romper el lote entero con la clave foránea
+    query = '''
+        INSERT INTO notifications (user_id, type, message, actor_id)
+        SELECT data.* FROM unnest(%s::int[], %s::varchar[], %s::text[], %s::int[])
+            AS data(user_id, type, message, actor_id)
+        WHERE EXISTS (SELECT 1 FROM users WHERE users.id = data.user_id)
+          AND (data.actor_id IS NULL OR EXISTS (SELECT 1 FROM users WHERE users.id = data.actor_id))
+        RETURNING id, user_id, type, message, timestamp, is_read, actor_id
+    '''
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (list(user_ids), list(notification_types), list(messages), list(actor_ids)))
+                rows = cursor.fetchall()
+                # build_payload recorta los mensajes largos: NOTIFY no puede tumbar el lote
+                publish_events(cursor, [("notification", (row["user_id"],), row) for row in rows])
+                connection.commit()
+        return rows
+    except Exception as e:
+        logging.error(f"Error creating {len(user_ids)} notifications in bulk: {e}")
+        raise Exception("Error creating notifications") from e
+
+def get_notifications_for_user(user_id, blocked_ids=None):
+    """Obtiene todas las notificaciones de un usuario (sin las de usuarios bloqueados)."""
     if not user_id:
         raise ValueError("user_id is required to fetch notifications.")
     
-    query = "SELECT * FROM notifications WHERE user_id = %s ORDER BY timestamp DESC"
     try:
-        with Database.get_connection() as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(query, (user_id,))
-                return cursor.fetchall()
+        return fetch_all(GET_NOTIFICATIONS, (user_id, list(resolve_blocked(user_id, blocked_ids))))
     except Exception as e:
         logging.error(f"Error fetching notifications for user ID {user_id}: {e}")
         raise Exception("Error fetching notifications") from e
 
-def get_unread_notifications(user_id):
-    """Obtiene todas las notificaciones no leídas de un usuario."""
+def iter_notifications_for_user(user_id, blocked_ids=None):
+    """Recorre las notificaciones de un usuario sin cargarlas todas en memoria (exportaciones)."""
+    if not user_id:
+        raise ValueError("user_id is required to fetch notifications.")
+
+    try:
+        yield from stream(GET_NOTIFICATIONS, (user_id, list(resolve_blocked(user_id, blocked_ids))))
+    except Exception as e:
+        logging.error(f"Error streaming notifications for user ID {user_id}: {e}")
+        raise Exception("Error fetching notifications") from e
+
+def get_unread_notifications(user_id, blocked_ids=None):
+    """Obtiene todas las notificaciones no leídas de un usuario (sin las de usuarios bloqueados)."""
     if not user_id:
         raise ValueError("user_id is required to fetch unread notifications.")
     
-    query = "SELECT * FROM notifications WHERE user_id = %s AND is_read = FALSE ORDER BY timestamp DESC"
     try:
-        with Database.get_connection() as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(query, (user_id,))
-                return cursor.fetchall()
+        return fetch_all(GET_UNREAD_NOTIFICATIONS, (user_id, list(resolve_blocked(user_id, blocked_ids))))
     except Exception as e:
         logging.error(f"Error fetching unread notifications for user ID {user_id}: {e}")
         raise Exception("Error fetching unread notifications") from e
@@ -58,16 +126,10 @@ def mark_notification_as_read(notification_id):
     if not notification_id:
         raise ValueError("notification_id is required to mark notification as read.")
     
-    query = '''
-        UPDATE notifications
-        SET is_read = TRUE
-        WHERE id = %s
-        RETURNING id, user_id, type, message, timestamp, is_read
-    '''
     try:
         with Database.get_connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(query, (notification_id,))
+                run(cursor, MARK_READ, (notification_id,))
                 connection.commit()
                 return cursor.fetchone()
     except Exception as e:
@@ -89,3 +151,94 @@ def delete_notification(notification_id):
     except Exception as e:
         logging.error(f"Error deleting notification ID {notification_id}: {e}")
         raise Exception("Error deleting notification") from e
+
+def unread_count(user_id, blocked_ids=None):
+    """Cuenta las notificaciones no leídas de un usuario.
+
+    Sin bloqueos basta el índice parcial (no se leen las filas); con bloqueos
+    hay que leer actor_id de cada no leída.
+    """
+    if not user_id:
+        raise ValueError("user_id is required to count unread notifications.")
+
+    try:
+        blocked = list(resolve_blocked(user_id, blocked_ids))
+        if blocked:
+            return fetch_one(COUNT_UNREAD_NOT_BLOCKED, (user_id, blocked))["unread"]
+        return fetch_one(COUNT_UNREAD, (user_id,))["unread"]
+    except Exception as e:
+        logging.error(f"Error counting unread notifications for user ID {user_id}: {e}")
+        raise Exception("Error counting unread notifications") from e
+
+def mark_all_as_read(user_id):
+    """Marca como leídas todas las notificaciones de un usuario. Devuelve cuántas cambiaron."""
+    if not user_id:
+        raise ValueError("user_id is required to mark notifications as read.")
+
+    try:
+        return execute(MARK_ALL_READ, (user_id,))
+    except Exception as e:
+        logging.error(f"Error marking all notifications as read for user ID {user_id}: {e}")
+        raise Exception("Error marking notifications as read") from e
+
+def mark_read_up_to(user_id, notification_id):
+    """Marca como leídas las notificaciones de un usuario hasta notification_id (incluida)."""
+    if not user_id or not notification_id:
+        raise ValueError("user_id and notification_id are required to mark notifications as read.")
+
+    query = '''
+        UPDATE notifications SET is_read = TRUE
+        WHERE user_id = %s AND is_read = FALSE AND id <= %s
+    '''
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (user_id, notification_id))
+                connection.commit()
+                return cursor.rowcount
+    except Exception as e:
+        logging.error(f"Error marking notifications up to {notification_id} as read for user ID {user_id}: {e}")
+        raise Exception("Error marking notifications as read") from e
+
+def delete_notifications(user_id, notification_ids):
+    """Elimina varias notificaciones de un usuario en una sola sentencia."""
+    if not user_id:
+        raise ValueError("user_id is required to delete notifications.")
+    if not notification_ids:
+        return 0
+
+    query = "DELETE FROM notifications WHERE user_id = %s AND id = ANY(%s)"
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (user_id, list(notification_ids)))
+                connection.commit()
+                return cursor.rowcount
+    except Exception as e:
+        logging.error(f"Error deleting notifications {notification_ids} for user ID {user_id}: {e}")
+        raise Exception("Error deleting notifications") from e
+
+def delete_notifications_older_than(days, user_id=None, only_read=False):
+    """Elimina las notificaciones con más de `days` días (de un usuario o de todos)."""
+    if isinstance(days, bool) or not isinstance(days, (int, float)) or not 0 <= days < float("inf"):
+        raise ValueError("days must be a non-negative number.")
+
+    # make_interval(days => ...) solo acepta enteros: así también valen fracciones de día
+    conditions = ["timestamp < CURRENT_TIMESTAMP - %s * interval '1 day'"]
+    params = [float(days)]
+    if user_id:
+        conditions.append("user_id = %s")
+        params.append(user_id)
+    if only_read:
+        conditions.append("is_read = TRUE")
+
+    query = f"DELETE FROM notifications WHERE {' AND '.join(conditions)}"
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, tuple(params))
+                connection.commit()
+                return cursor.rowcount
+    except Exception as e:
+        logging.error(f"Error deleting notifications older than {days} days: {e}")
+        raise Exception("Error deleting old notifications") from e
@@ -1,61 +1,208 @@
 from .database import Database
+from .cache import profile_cache, user_tag
+from .image_store import store_stream, schedule_thumbnails, remove_image
+from .queries import register, fetch_one, fetch_all
+from config import ImageConfig as Config
 import logging
 
 # Configura el logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+GET_PICTURES = register("pictures.for_user", "SELECT * FROM pictures WHERE user_id = %s")
+GET_PICTURES_MANY = register(
+    "pictures.for_users", "SELECT * FROM pictures WHERE user_id = ANY(%s) ORDER BY user_id, id"
+)
+COUNT_PICTURES = register("pictures.count", "SELECT COUNT(*) AS count FROM pictures WHERE user_id = %s")
+COUNT_PICTURES_MANY = register(
+    "pictures.count_many",
+    "SELECT user_id, COUNT(*) AS count FROM pictures WHERE user_id = ANY(%s) GROUP BY user_id",
+)
+
 def get_pictures_by_user(user_id):
     """Obtiene todas las imágenes de un usuario."""
-    query = 'SELECT * FROM pictures WHERE user_id = %s'
     try:
-        with Database.get_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(query, (user_id,))
-                pictures = cursor.fetchall()
-        return pictures
+        return fetch_all(GET_PICTURES, (user_id,))
     except Exception as e:
         logger.error(f"Error al obtener imágenes para el usuario {user_id}: {e}")
         return []
 
-def add_picture(user_id, image_id):
-    """Agrega una nueva imagen para un usuario si no supera las 5."""
-    if count_pictures(user_id) >= 5:
-        return {"success": False, "message": "El usuario ya tiene 5 fotos."}
+def get_pictures_many(user_ids):
+    """Obtiene las imágenes de varios usuarios en una sola consulta: {id: [imágenes]}."""
+    user_ids = list(user_ids)
+    pictures = {user_id: [] for user_id in user_ids}
+    try:
+        for picture in fetch_all(GET_PICTURES_MANY, (user_ids,)):
+            pictures[picture["user_id"]].append(picture)
+        return pictures
+    except Exception as e:
+        logger.error(f"Error al obtener imágenes para {len(user_ids)} usuarios: {e}")
+        return pictures
 
-    query = 'INSERT INTO pictures (user_id, image_id) VALUES (%s, %s)'
+def add_picture(user_id, image_id):
+    """Agrega una nueva imagen para un usuario si no supera el límite de fotos."""
+    # Reservar hueco e insertar en una sola sentencia: el UPDATE bloquea la fila
+    # del usuario y vuelve a evaluar el límite, así que dos subidas simultáneas
+    # no pueden pasar ambas de 4 a 5
+    query = '''
+        WITH slot AS (
+            UPDATE users SET picture_count = picture_count + 1
+            WHERE id = %(user)s AND picture_count < %(max)s
+            RETURNING id
+        )
+        INSERT INTO pictures (user_id, image_id)
+        SELECT id, %(image)s FROM slot
+        RETURNING id
+    '''
     try:
         with Database.get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(query, (user_id, image_id))
+                cursor.execute(query, {"user": user_id, "image": image_id, "max": Config.MAX_PICTURES})
+                picture = cursor.fetchone()
                 conn.commit()
+        if picture is None:
+            return {"success": False, "message": f"El usuario ya tiene {Config.MAX_PICTURES} fotos."}
+        profile_cache.invalidate_tag(user_tag(user_id))
         logger.info(f"Imagen agregada para el usuario {user_id} con ID de imagen {image_id}.")
-        return {"success": True, "message": "Imagen agregada exitosamente."}
+        return {"success": True, "message": "Imagen agregada exitosamente.", "picture_id": picture["id"]}
     except Exception as e:
         logger.error(f"Error al agregar imagen para el usuario {user_id}: {e}")
         return {"success": False, "message": "Hubo un error al agregar la imagen."}
 
-def count_pictures(user_id):
-    """Cuenta la cantidad de imágenes de un usuario."""
-    query = 'SELECT COUNT(*) FROM pictures WHERE user_id = %s'
+def _mark_thumbnails(image_id):
+    """Callback del pool de miniaturas: guarda dimensiones o descarta la imagen inválida."""
+    def done(future):
+        try:
+            width, height = future.result()
+            query = 'UPDATE images SET width = %s, height = %s, thumbnails_ready = TRUE WHERE id = %s'
+            params = (width, height, image_id)
+        except ValueError as e:
+            # No era una imagen decodificable: sus fotos dejan de mostrarse
+            logger.error(f"Imagen {image_id} inválida: {e}")
+            query = '''
+                WITH removed AS (DELETE FROM pictures WHERE image_id = %s RETURNING user_id)
+                UPDATE users SET picture_count = picture_count - counts.count
+                FROM (SELECT user_id, COUNT(*) AS count FROM removed GROUP BY user_id) AS counts
+                WHERE users.id = counts.user_id
+                RETURNING users.id
+            '''
+            params = (image_id,)
+        except Exception as e:
+            logger.error(f"Error al generar las miniaturas de la imagen {image_id}: {e}")
+            return
+        try:
+            with Database.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, params)
+                    owners = cursor.fetchall() if cursor.description else []
+                    conn.commit()
+            for owner in owners:
+                profile_cache.invalidate_tag(user_tag(owner["id"]))
+        except Exception as e:
+            logger.error(f"Error al actualizar la imagen {image_id}: {e}")
+    return done
+
+def upload_picture(user_id, stream):
+    """Guarda una imagen subida (leída por bloques) y la añade a las fotos del usuario."""
+    try:
+        digest, extension, content_type, size, created = store_stream(stream)
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+
+    # Una imagen ya conocida (deduplicada) reutiliza su fila y sus miniaturas
+    query = '''
+        INSERT INTO images (sha256, extension, content_type, size_bytes)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (sha256) DO UPDATE SET created_at = CURRENT_TIMESTAMP  -- Aleja la purga de huérfanas
+        RETURNING id, thumbnails_ready
+    '''
+    try:
+        with Database.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (digest, extension, content_type, size))
+                image = cursor.fetchone()
+                conn.commit()
+    except Exception as e:
+        logger.error(f"Error al registrar la imagen {digest}: {e}")
+        return {"success": False, "message": "Hubo un error al agregar la imagen."}
+
+    result = add_picture(user_id, image["id"])
+    if result["success"]:
+        result["image"] = digest
+        if created or not image["thumbnails_ready"]:
+            schedule_thumbnails(digest, extension, _mark_thumbnails(image["id"]))
+    return result
+
+def get_image(digest):
+    """Obtiene los metadatos de una imagen por su hash."""
+    query = 'SELECT id, sha256, extension, content_type, size_bytes, width, height, thumbnails_ready FROM images WHERE sha256 = %s'
+    try:
+        with Database.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (digest,))
+                return cursor.fetchone()
+    except Exception as e:
+        logger.error(f"Error al obtener la imagen {digest}: {e}")
+        return None
+
+def purge_orphan_images(min_age_seconds=3600):
+    """Borra las imágenes que ninguna foto referencia (subidas rechazadas, fotos borradas)."""
+    query = '''
+        DELETE FROM images
+        WHERE created_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+          AND NOT EXISTS (SELECT 1 FROM pictures WHERE pictures.image_id = images.id)
+        RETURNING sha256, extension
+    '''
     try:
         with Database.get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(query, (user_id,))
-                count = cursor.fetchone()[0]
-        return count
+                cursor.execute(query, (min_age_seconds,))
+                removed = cursor.fetchall()
+                conn.commit()
+    except Exception as e:
+        logger.error(f"Error al purgar imágenes huérfanas: {e}")
+        return 0
+    for image in removed:
+        remove_image(image["sha256"], image["extension"])
+    logger.info(f"{len(removed)} imágenes huérfanas eliminadas.")
+    return len(removed)
+
+def count_pictures(user_id):
+    """Cuenta la cantidad de imágenes de un usuario."""
+    try:
+        return fetch_one(COUNT_PICTURES, (user_id,))["count"]
     except Exception as e:
         logger.error(f"Error al contar imágenes para el usuario {user_id}: {e}")
         return 0
 
+def count_pictures_many(user_ids):
+    """Cuenta las imágenes de varios usuarios en una sola consulta: {id: cantidad}."""
+    user_ids = list(user_ids)
+    counts = {user_id: 0 for user_id in user_ids}
+    try:
+        for row in fetch_all(COUNT_PICTURES_MANY, (user_ids,)):
+            counts[row["user_id"]] = row["count"]
+        return counts
+    except Exception as e:
+        logger.error(f"Error al contar imágenes para {len(user_ids)} usuarios: {e}")
+        return counts
+
 def delete_picture(picture_id):
     """Elimina una imagen por su ID."""
-    query = 'DELETE FROM pictures WHERE id = %s'
+    query = '''
+        WITH deleted AS (DELETE FROM pictures WHERE id = %s RETURNING user_id)
+        UPDATE users SET picture_count = picture_count - 1
+        FROM deleted WHERE users.id = deleted.user_id
+        RETURNING deleted.user_id
+    '''
     try:
         with Database.get_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(query, (picture_id,))
+                deleted = cursor.fetchone()
                 conn.commit()
+        if deleted:
+            profile_cache.invalidate_tag(user_tag(deleted["user_id"]))
         logger.info(f"Imagen con ID {picture_id} eliminada exitosamente.")
         return {"success": True, "message": "Imagen eliminada exitosamente."}
     except Exception as e:
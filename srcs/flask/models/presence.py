@@ -0,0 +1,292 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    presence.py                                        :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 20:31:08 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 20:31:08 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Presencia en línea sin escribir en users en cada heartbeat.
+
+El último heartbeat de cada usuario vive en memoria: un diccionario del
+proceso (backend "local") o un array compartido en un fichero mapeado
+(backend "shared", para varios procesos de tiempo real en la misma máquina).
+Se guarda positivo mientras el usuario está conectado y negativo tras
+desconectarse. Solo el servidor de tiempo real registra heartbeats, así que
+es él quien responde GET /presence; el resto de procesos ven is_online y
+last_seen en users, con hasta FLUSH_INTERVAL segundos de retraso.
+
+Un hilo por proceso:
+- avanza una rueda temporal: cada usuario está en la casilla de su plazo,
+  así que detectar desconexiones cuesta lo que expira, no el total;
+- cada FLUSH_INTERVAL segundos escribe last_seen/is_online de los usuarios
+  que cambiaron con un solo UPDATE masivo.
+"""
+
+from .database import Database
+from config import PresenceConfig as Config
+from datetime import datetime
+from psycopg.rows import tuple_row
+import atexit
+import logging
+import math
+import mmap
+import os
+import threading
+import time
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LocalStore:
+    """Últimos heartbeats en un diccionario del proceso."""
+
+    def __init__(self):
+        self._values = {}
+
+    def get_many(self, user_ids):
+        return np.array([self._values.get(user_id, 0.0) for user_id in user_ids], dtype=np.float64)
+
+    def set(self, user_id, value):
+        self._values[user_id] = value
+
+
+class SharedStore:
+    """Últimos heartbeats en un array float64 indexado por id, mapeado de un fichero.
+
+    Todos los procesos que abren el mismo fichero (en /dev/shm: memoria) ven
+    las mismas posiciones; escribir un float64 alineado no necesita lock. El
+    fichero crece bajo demanda y los demás procesos lo vuelven a mapear al
+    encontrar un id fuera de su mapeo.
+    """
+
+    def __init__(self, path=Config.SHARED_PATH, capacity=Config.SHARED_CAPACITY):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < capacity * 8:
+            os.ftruncate(self._fd, capacity * 8)  # Fichero disperso: solo ocupa lo escrito
+        self._map()
+
+    def _map(self):
+        size = os.fstat(self._fd).st_size
+        self._mmap = mmap.mmap(self._fd, size)
+        self._array = np.frombuffer(self._mmap, dtype=np.float64)
+
+    def _ensure(self, user_id):
+        if user_id < len(self._array):
+            return
+        with self._lock:
+            if user_id >= os.fstat(self._fd).st_size // 8:
+                os.ftruncate(self._fd, max(user_id + 1, 2 * len(self._array)) * 8)
+            self._map()
+
+    def get_many(self, user_ids):
+        ids = np.asarray(user_ids, dtype=np.int64)
+        if len(ids) and ids.max() >= len(self._array):
+            self._ensure(int(ids.max()))
+        return self._array[ids] if len(ids) else np.zeros(0, dtype=np.float64)
+
+    def set(self, user_id, value):
+        self._ensure(user_id)
+        self._array[user_id] = value
+
+
+class TimingWheel:
+    """Rueda temporal: casillas de `resolution` segundos que cubren `horizon` segundos.
+
+    schedule() es O(1) y advance() solo visita las casillas vencidas. Un plazo
+    más allá del horizonte va a la última casilla y se reprograma al vencer.
+    """
+
+    def __init__(self, resolution, horizon):
+        self.resolution = resolution
+        self.slots = [set() for _ in range(int(math.ceil(horizon / resolution)) + 1)]
+        self._tick = int(time.time() / resolution)
+
+    def schedule(self, key, deadline):
+        tick = max(int(math.ceil(deadline / self.resolution)), self._tick + 1)
+        tick = min(tick, self._tick + len(self.slots) - 1)
+        self.slots[tick % len(self.slots)].add(key)
+
+    def advance(self, now):
+        """Devuelve las claves de todas las casillas vencidas hasta `now`."""
+        target = int(now / self.resolution)
+        expired = []
+        steps = min(target - self._tick, len(self.slots))
+        for tick in range(self._tick + 1, self._tick + 1 + steps):
+            slot = self.slots[tick % len(self.slots)]
+            expired.extend(slot)
+            slot.clear()
+        self._tick = max(self._tick, target)
+        return expired
+
+
+class PresenceTracker:
+    """Estado en línea y última conexión de los usuarios, con volcado periódico."""
+
+    def __init__(self, store=None, timeout=Config.TIMEOUT, flush_interval=Config.FLUSH_INTERVAL,
+                 resolution=Config.RESOLUTION):
+        self.store = store or LocalStore()
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.wheel = TimingWheel(resolution, timeout)
+        self._scheduled = set()  # Usuarios con entrada en la rueda
+        self._dirty = set()  # Usuarios a volcar en la siguiente escritura
+        self._lock = threading.Lock()
+        self._thread_pid = None
+        self._closed = False
+        self.stats = {"heartbeats": 0, "went_offline": 0, "flushes": 0, "rows_written": 0, "errors": 0}
+
+    def heartbeat(self, user_id, now=None):
+        """Registra actividad del usuario: pasa a (o sigue) en línea."""
+        self._ensure_thread()
+        now = now or time.time()
+        with self._lock:
+            was_online = self._is_fresh(self.store.get_many([user_id])[0], now)
+            self.store.set(user_id, now)
+            self.stats["heartbeats"] += 1
+            if not was_online:
+                self._dirty.add(user_id)
+            # Si ya está en la rueda no se mueve: al vencer se mira el último heartbeat
+            if user_id not in self._scheduled:
+                self._scheduled.add(user_id)
+                self.wheel.schedule(user_id, now + self.timeout)
+
+    def disconnect(self, user_id, now=None):
+        """Marca al usuario como desconectado (cierre de sesión o de la última conexión)."""
+        now = now or time.time()
+        with self._lock:
+            self.store.set(user_id, -now)
+            self._dirty.add(user_id)
+
+    def online_among(self, user_ids):
+        """Devuelve el conjunto de ids en línea de la lista (una lectura vectorizada)."""
+        user_ids = list(user_ids)
+        values = self.store.get_many(user_ids)
+        fresh = values > time.time() - self.timeout
+        return {user_id for user_id, online in zip(user_ids, fresh.tolist()) if online}
+
+    def is_online(self, user_id):
+        return user_id in self.online_among([user_id])
+
+    def last_seen_many(self, user_ids):
+        """{id: datetime} de la última conexión; los desconocidos se leen de users de una vez."""
+        user_ids = list(user_ids)
+        values = np.abs(self.store.get_many(user_ids))
+        result = {user_id: datetime.fromtimestamp(value) for user_id, value in zip(user_ids, values.tolist()) if value}
+        unknown = [user_id for user_id in user_ids if user_id not in result]
+        if unknown:
+            try:
+                with Database.get_connection() as connection:
+                    with connection.cursor(row_factory=tuple_row) as cursor:
+                        cursor.execute("SELECT id, last_seen FROM users WHERE id = ANY(%s)", (unknown,))
+                        result.update(cursor.fetchall())
+            except Exception as e:
+                logger.error(f"Error fetching last_seen for {len(unknown)} users: {e}")
+                raise Exception("Error fetching last_seen") from e
+        return result
+
+    def status_many(self, user_ids):
+        """{id: {"online", "last_seen"}} de una página de perfiles (respuesta de /presence)."""
+        online = self.online_among(user_ids)
+        last_seen = self.last_seen_many(user_ids)
+        return {user_id: {"online": user_id in online, "last_seen": last_seen.get(user_id)} for user_id in user_ids}
+
+    def tick(self, now=None):
+        """Procesa las casillas vencidas. Devuelve los usuarios que pasan a desconectados."""
+        now = now or time.time()
+        went_offline = []
+        with self._lock:
+            expired = self.wheel.advance(now)
+            if not expired:
+                return went_offline
+            values = self.store.get_many(expired)
+            for user_id, value in zip(expired, values.tolist()):
+                if value > 0 and now - value < self.timeout:
+                    # Ha habido heartbeats desde que se programó: nuevo plazo
+                    self.wheel.schedule(user_id, value + self.timeout)
+                    continue
+                self._scheduled.discard(user_id)
+                if value > 0:
+                    self.store.set(user_id, -value)
+                    self._dirty.add(user_id)
+                    went_offline.append(user_id)
+            self.stats["went_offline"] += len(went_offline)
+        return went_offline
+
+    def flush(self):
+        """Escribe last_seen/is_online de los usuarios que cambiaron. Devuelve las filas."""
+        with self._lock:
+            dirty, self._dirty = list(self._dirty), set()
+        if not dirty:
+            return 0
+        values = self.store.get_many(dirty)
+        query = '''
+            UPDATE users SET last_seen = to_timestamp(data.seen)::timestamp, is_online = data.online
+            FROM unnest(%s::int[], %s::float8[], %s::bool[]) AS data(id, seen, online)
+            WHERE users.id = data.id
+        '''
+        try:
+            with Database.get_connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, (dirty, np.abs(values).tolist(), (values > 0).tolist()))
+                    connection.commit()
+                    self.stats["rows_written"] += cursor.rowcount
+                    self.stats["flushes"] += 1
+                    return cursor.rowcount
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Error flushing presence for {len(dirty)} users: {e}")
+            with self._lock:
+                self._dirty.update(dirty)
+            return 0
+
+    def close(self):
+        """Detiene el hilo y vuelca lo pendiente (al apagar el proceso)."""
+        self._closed = True
+        if self._thread_pid == os.getpid():
+            self.flush()
+
+    def _is_fresh(self, value, now):
+        return value > 0 and now - value < self.timeout
+
+    def _ensure_thread(self):
+        # El hilo no sobrevive a un fork: cada worker arranca el suyo
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid != os.getpid():
+                self._scheduled.clear()
+                self._dirty.clear()
+                self._closed = False
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._run, name="presence", daemon=True).start()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while not self._closed:
+            time.sleep(self.wheel.resolution)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Presence tick failed: {e}")
+            if time.monotonic() - last_flush >= self.flush_interval:
+                last_flush = time.monotonic()
+                self.flush()
+
+
+def _create_store():
+    if Config.BACKEND == "shared":
+        return SharedStore()
+    return LocalStore()
+
+
+presence = PresenceTracker(store=_create_store())
+atexit.register(presence.close)
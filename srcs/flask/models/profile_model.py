@@ -1,25 +1,47 @@
 from .database import Database
+from .cache import profile_cache, user_tag
+from .geo_model import encode_geohash
+from .queries import register, fetch_one, fetch_all
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
+PROFILE_COLUMNS = '''
+    id, username, email, first_name, last_name, gender, sexual_preferences,
+    biography, fame_rating, profile_picture, location, latitude, longitude, is_active
+'''
+
+GET_PROFILE = register("users.profile", f"SELECT {PROFILE_COLUMNS} FROM users WHERE id = %s")
+GET_LOCATION = register("users.location", "SELECT location, latitude, longitude FROM users WHERE id = %s")
+GET_PROFILES_MANY = register("users.profiles_many", f"SELECT {PROFILE_COLUMNS} FROM users WHERE id = ANY(%s)")
+GET_LOCATIONS_MANY = register(
+    "users.locations_many", "SELECT id, location, latitude, longitude FROM users WHERE id = ANY(%s)"
+)
+
 def get_profile_by_user_id(user_id):
     """Obtiene el perfil de un usuario desde la tabla users."""
-    query = '''
-        SELECT id, username, email, first_name, last_name, gender, sexual_preferences,
-               biography, fame_rating, profile_picture, location, latitude, longitude, is_active
-        FROM users
-        WHERE id = %s
-    '''
     try:
-        with Database.get_connection() as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(query, (user_id,))
-                return cursor.fetchone()
+        return profile_cache.get_or_load(
+            f"profile:{user_id}", lambda: fetch_one(GET_PROFILE, (user_id,)), tags=(user_tag(user_id),)
+        )
     except Exception as e:
         logging.error(f"Error fetching profile for user ID {user_id}: {e}")
         raise Exception("Error fetching profile") from e
 
+def get_profiles_many(user_ids):
+    """Obtiene los perfiles de varios usuarios en una sola consulta: {id: perfil}."""
+    user_ids = list(user_ids)
+    def load(missing):
+        return {row["id"]: row for row in fetch_all(GET_PROFILES_MANY, (missing,))}
+
+    try:
+        return profile_cache.get_many_or_load(
+            user_ids, lambda user_id: f"profile:{user_id}", load, lambda user_id: (user_tag(user_id),)
+        )
+    except Exception as e:
+        logging.error(f"Error fetching profiles for {len(user_ids)} users: {e}")
+        raise Exception("Error fetching profiles") from e
+
 def update_profile(user_id, biography=None, location=None, latitude=None, longitude=None, profile_picture=None):
     """Actualiza los datos del perfil de un usuario en la tabla users."""
     updates = []
@@ -44,6 +66,16 @@ def update_profile(user_id, biography=None, location=None, latitude=None, longit
     if not updates:
         raise ValueError("No fields provided to update.")
 
+    # Mantener la clave espacial al día con las coordenadas
+    if latitude or longitude:
+        if not (latitude and longitude):
+            current = get_location(user_id) or {}
+            latitude = latitude or current.get("latitude")
+            longitude = longitude or current.get("longitude")
+        if latitude is not None and longitude is not None:
+            updates.append("geohash = %s")
+            params.append(encode_geohash(latitude, longitude))
+
     query = f"UPDATE users SET {', '.join(updates)} WHERE id = %s RETURNING id, biography, location, latitude, longitude, profile_picture"
     params.append(user_id)
 
@@ -52,37 +84,49 @@ def update_profile(user_id, biography=None, location=None, latitude=None, longit
             with connection.cursor() as cursor:
                 cursor.execute(query, tuple(params))
                 connection.commit()
-                return cursor.fetchone()
+                result = cursor.fetchone()
+        profile_cache.invalidate_tag(user_tag(user_id))
+        return result
     except Exception as e:
         logging.error(f"Error updating profile for user ID {user_id}: {e}")
         raise Exception("Error updating profile") from e
 
 def get_location(user_id):
     """Obtiene la ubicación actual de un usuario."""
-    query = "SELECT location, latitude, longitude FROM users WHERE id = %s"
     try:
-        with Database.get_connection() as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(query, (user_id,))
-                return cursor.fetchone()
+        return fetch_one(GET_LOCATION, (user_id,))
     except Exception as e:
         logging.error(f"Error fetching location for user ID {user_id}: {e}")
         raise Exception("Error fetching location") from e
 
+def get_locations_many(user_ids):
+    """Obtiene la ubicación de varios usuarios en una sola consulta: {id: ubicación}."""
+    user_ids = list(user_ids)
+    try:
+        return {row.pop("id"): row for row in fetch_all(GET_LOCATIONS_MANY, (user_ids,))}
+    except Exception as e:
+        logging.error(f"Error fetching locations for {len(user_ids)} users: {e}")
+        raise Exception("Error fetching locations") from e
+
 def update_location(user_id, location, latitude, longitude):
     """Actualiza la ubicación de un usuario."""
     query = '''
         UPDATE users
-        SET location = %s, latitude = %s, longitude = %s
+        SET location = %s, latitude = %s, longitude = %s, geohash = %s
         WHERE id = %s
         RETURNING id, location, latitude, longitude
     '''
+    geohash = None
+    if latitude is not None and longitude is not None:
+        geohash = encode_geohash(latitude, longitude)
     try:
         with Database.get_connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(query, (location, latitude, longitude, user_id))
+                cursor.execute(query, (location, latitude, longitude, geohash, user_id))
                 connection.commit()
-                return cursor.fetchone()
+                result = cursor.fetchone()
+        profile_cache.invalidate_tag(user_tag(user_id))
+        return result
     except Exception as e:
         logging.error(f"Error updating location for user ID {user_id}: {e}")
         raise Exception("Error updating location") from e
@@ -0,0 +1,109 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    queries.py                                         :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 22:15:37 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 22:15:37 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Registro de sentencias con nombre, preparadas y con modo streaming.
+
+Cada módulo registra sus consultas frecuentes al importarse:
+
+    GET_USER = register("users.by_id", "SELECT * FROM users WHERE id = %s")
+    user = fetch_one(GET_USER, (user_id,))
+
+La primera ejecución en cada conexión del pool la prepara (PREPARE) y las
+siguientes solo envían los parámetros. stream() recorre resultados enormes
+con un cursor del servidor, trayendo itersize filas cada vez.
+"""
+
+from .database import Database
+from config import DatabaseConfig as Config
+import itertools
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_cursor_ids = itertools.count()
+
+
+class Query:
+    """Sentencia SQL con nombre."""
+
+    __slots__ = ("name", "sql")
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+
+    def __repr__(self):
+        return f"Query({self.name!r})"
+
+
+def register(name, sql):
+    """Registra una sentencia. Registrar el mismo nombre con otro SQL es un error."""
+    existing = _registry.get(name)
+    if existing is not None and existing.sql != sql:
+        raise ValueError(f"Query {name} is already registered with a different statement.")
+    query = existing or Query(name, sql)
+    _registry[name] = query
+    return query
+
+
+def registered():
+    """Sentencias registradas, por nombre."""
+    return dict(_registry)
+
+
+def run(cursor, query, params=None):
+    """Ejecuta una sentencia registrada en un cursor existente (dentro de una transacción)."""
+    # prepare=False (POSTGRES_PREPARE_STATEMENTS) deja a psycopg el criterio por defecto
+    return cursor.execute(query.sql, params, prepare=Config.PREPARE_STATEMENTS or None)
+
+
+def fetch_one(query, params=None):
+    """Primera fila de una sentencia registrada, o None."""
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            return run(cursor, query, params).fetchone()
+
+
+def fetch_all(query, params=None):
+    """Todas las filas de una sentencia registrada."""
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            return run(cursor, query, params).fetchall()
+
+
+def execute(query, params=None):
+    """Ejecuta una escritura registrada y hace commit. Devuelve las filas afectadas."""
+    with Database.get_connection() as connection:
+        with connection.cursor() as cursor:
+            run(cursor, query, params)
+            connection.commit()
+            return cursor.rowcount
+
+
+def stream(query, params=None, itersize=Config.STREAM_ITERSIZE, dedicated=False):
+    """Generador de filas con un cursor del servidor: memoria constante sea cual sea el tamaño.
+
+    La conexión queda ocupada hasta agotar (o cerrar) el generador; los
+    trabajos largos deberían usar dedicated=True para no retener una del pool.
+    """
+    if dedicated:
+        context = Database.get_dedicated_connection(autocommit=False)
+    else:
+        context = Database.get_connection()
+    with context as connection:
+        # Los cursores con nombre viven dentro de una transacción (DECLARE ... CURSOR)
+        with connection.cursor(name=f"stream_{next(_cursor_ids)}") as cursor:
+            cursor.itersize = itersize
+            cursor.execute(query.sql, params)
+            yield from cursor
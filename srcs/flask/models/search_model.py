@@ -0,0 +1,683 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    search_model.py                                    :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 16:58:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 16:58:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .database import Database
+from .blocks_model import not_in_blocked, resolve_blocked
+from .geo_model import DISTANCE_SQL, covering_cells, search_radii, get_coordinates
+from .interests_model import resolve_tag_ids, normalize_tag
+from .queries import register, fetch_all
+from .tag_index import tag_index
+from config import SearchConfig as Config
+from datetime import date
+import base64
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import re
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Orden -> (columna, dirección por defecto, invertida). La edad se ordena por
+# fecha de nacimiento en sentido contrario para usar el índice sobre birthdate
+SORTS = {
+    "distance": ("distance_km", "asc", False),
+    "age": ("birthdate", "asc", True),
+    "fame": ("fame_rating", "desc", False),
+    "tags": ("shared_tags", "desc", False),
+}
+# Órdenes que un índice puede devolver ya ordenados (se puede parar en LIMIT)
+INDEX_ORDERED_SORTS = {"age", "fame"}
+# Selectividad supuesta si todavía no hay estadísticas (tabla sin ANALYZE)
+DEFAULT_SELECTIVITY = {"age": 0.3, "fame": 0.3, "distance": 0.05, "tags": 0.1}
+STATS_COLUMNS = ("birthdate", "fame_rating", "geohash")
+GEOHASH_PREFIX_END = "~"  # Mayor que cualquier carácter base32
+
+_stats_cache = {"loaded_at": None, "rows": 0, "columns": {}}
+_stats_lock = threading.Lock()
+
+
+def _years_ago(today, years):
+    """Misma fecha hace `years` años (29 de febrero -> 28)."""
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        return today.replace(year=today.year - years, day=28)
+
+
+def birthdate_range(min_age=None, max_age=None, today=None):
+    """Traduce un rango de edades a un rango de fechas de nacimiento (indexable).
+
+    La edad depende del día en que se consulta, así que no puede guardarse
+    como columna: se precalculan los límites de la franja y se compara la
+    columna birthdate directamente.
+    """
+    today = today or date.today()
+    earliest = latest = None
+    if max_age is not None:
+        earliest = date.fromordinal(_years_ago(today, max_age + 1).toordinal() + 1)
+    if min_age is not None:
+        latest = _years_ago(today, min_age)
+    return earliest, latest
+
+
+def _load_stats():
+    """Filas estimadas e histogramas de pg_stats, reutilizados STATS_TTL segundos."""
+    with _stats_lock:
+        loaded_at = _stats_cache["loaded_at"]
+        if loaded_at is not None and time.monotonic() - loaded_at < Config.STATS_TTL:
+            return _stats_cache
+        try:
+            with Database.get_connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT reltuples::bigint AS rows FROM pg_class WHERE oid = 'users'::regclass")
+                    rows = cursor.fetchone()["rows"]
+                    cursor.execute(
+                        '''
+                        SELECT attname, null_frac, histogram_bounds::text AS bounds
+                        FROM pg_stats
+                        WHERE schemaname = current_schema() AND tablename = 'users' AND attname = ANY(%s)
+                        ''',
+                        (list(STATS_COLUMNS),),
+                    )
+                    columns = {row["attname"]: row for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Error loading search statistics: {e}")
+            rows, columns = 0, {}
+
+        parsed = {}
+        for name, row in columns.items():
+            if not row["bounds"]:
+                continue
+            bounds = [value.strip('"') for value in row["bounds"].strip("{}").split(",")]
+            if name == "fame_rating":
+                bounds = [float(value) for value in bounds]
+            parsed[name] = {"bounds": bounds, "not_null": 1.0 - (row["null_frac"] or 0.0)}
+        _stats_cache.update(loaded_at=time.monotonic(), rows=max(rows, 0), columns=parsed)
+        return _stats_cache
+
+
+def _range_selectivity(stats, column, low, high):
+    """Fracción de filas con low <= columna <= high según el histograma (None si no hay)."""
+    column_stats = stats["columns"].get(column)
+    if column_stats is None:
+        return None
+    bounds = column_stats["bounds"]
+    if len(bounds) < 2:
+        return None
+    start = 0 if low is None else bisect.bisect_left(bounds, low)
+    end = len(bounds) if high is None else bisect.bisect_right(bounds, high)
+    # Al menos medio bucket: un rango dentro de un único bucket no es vacío
+    buckets = max(end - start, 0.5)
+    return min(1.0, buckets / (len(bounds) - 1)) * column_stats["not_null"]
+
+
+class Predicate:
+    """Filtro compilado: condición SQL, parámetros y selectividad estimada."""
+
+    def __init__(self, name, condition, params, selectivity, index_covered=True, driver_ids=None, tag_filter=None):
+        self.name = name
+        self.condition = condition
+        self.params = params
+        self.selectivity = selectivity
+        # Si la condición solo usa columnas incluidas en los índices de búsqueda
+        self.index_covered = index_covered
+        # Ids exactos ya calculados en memoria (si no, se usa un índice de users)
+        self.driver_ids = driver_ids
+        # (tags, mínimo en común) si el filtro se puede evaluar con el índice de tags
+        self.tag_filter = tag_filter
+
+    @property
+    def can_drive(self):
+        return self.index_covered or self.driver_ids is not None
+
+    def __repr__(self):
+        return f"Predicate({self.name}, selectivity={self.selectivity:.4f})"
+
+
+def _age_predicate(stats, min_age, max_age):
+    if min_age is not None and max_age is not None and min_age > max_age:
+        raise ValueError("min_age cannot be greater than max_age.")
+    earliest, latest = birthdate_range(min_age, max_age)
+    conditions, params = [], {}
+    if earliest is not None:
+        conditions.append("u.birthdate >= %(birth_from)s")
+        params["birth_from"] = earliest
+    if latest is not None:
+        conditions.append("u.birthdate <= %(birth_to)s")
+        params["birth_to"] = latest
+    selectivity = _range_selectivity(
+        stats, "birthdate", earliest and earliest.isoformat(), latest and latest.isoformat()
+    )
+    return Predicate("age", " AND ".join(conditions), params,
+                     DEFAULT_SELECTIVITY["age"] if selectivity is None else selectivity)
+
+
+def _fame_predicate(stats, min_fame, max_fame):
+    if min_fame is not None and max_fame is not None and min_fame > max_fame:
+        raise ValueError("min_fame cannot be greater than max_fame.")
+    conditions, params = [], {}
+    if min_fame is not None:
+        conditions.append("u.fame_rating >= %(fame_min)s")
+        params["fame_min"] = float(min_fame)
+    if max_fame is not None:
+        conditions.append("u.fame_rating <= %(fame_max)s")
+        params["fame_max"] = float(max_fame)
+    selectivity = _range_selectivity(stats, "fame_rating", min_fame, max_fame)
+    return Predicate("fame", " AND ".join(conditions), params,
+                     DEFAULT_SELECTIVITY["fame"] if selectivity is None else selectivity)
+
+
+def _distance_predicate(stats, origin, radius_km):
+    """Poda por celdas geohash y comprueba la distancia exacta (todo dentro del índice)."""
+    params = {"lat": origin["latitude"], "lon": origin["longitude"], "radius_km": radius_km}
+    condition = f"{DISTANCE_SQL} <= %(radius_km)s"
+    cells = covering_cells(origin["latitude"], origin["longitude"], radius_km)
+    if cells is None:
+        # Radio enorme: no se puede podar por celdas
+        return Predicate("distance", condition, params, 1.0)
+
+    params.update({f"cell_{i}": f"{cell}%" for i, cell in enumerate(cells)})
+    condition = "(" + " OR ".join(f"u.geohash LIKE %(cell_{i})s" for i in range(len(cells))) + f") AND {condition}"
+    selectivity = None
+    if "geohash" in stats["columns"]:
+        selectivity = min(1.0, sum(
+            _range_selectivity(stats, "geohash", cell, cell + GEOHASH_PREFIX_END) for cell in cells
+        ))
+    return Predicate("distance", condition, params,
+                     DEFAULT_SELECTIVITY["distance"] if selectivity is None else selectivity)
+
+
+def _tag_set_predicate(name, stats, tag_ids, min_shared):
+    """Usuarios con al menos min_shared de los tags.
+
+    En SQL es un recuento por usuario; si el índice invertido da pocos
+    usuarios, sus ids pueden dirigir la consulta.
+    """
+    tag_ids = list(tag_ids)
+    if len(tag_ids) < min_shared:
+        return Predicate(name, "FALSE", {}, 0.0)
+
+    if min_shared == len(tag_ids):
+        users = tag_index.users_with_all(tag_ids)
+    else:
+        users = tag_index.users_with_at_least(tag_ids, min_shared)
+    count = len(users)
+    selectivity = min(1.0, count / stats["rows"]) if stats["rows"] else DEFAULT_SELECTIVITY["tags"]
+    condition = f'''(
+        SELECT COUNT(*) FROM user_interests ui
+        WHERE ui.user_id = u.id AND ui.interest_id = ANY(%({name}_ids)s)
+    ) >= %({name}_min)s'''
+    return Predicate(name, condition, {f"{name}_ids": tag_ids, f"{name}_min": min_shared}, selectivity,
+                     index_covered=False, driver_ids=users if count <= Config.MAX_ID_LIST else None,
+                     tag_filter=(frozenset(tag_ids), min_shared))
+
+
+def _tags_predicate(stats, tags, min_shared):
+    if min_shared <= 0 or min_shared > len({normalize_tag(tag) for tag in tags}):
+        raise ValueError("min_shared_tags must be between 1 and the number of tags.")
+    return _tag_set_predicate("tags", stats, resolve_tag_ids(tags).values(), min_shared)
+
+
+def _fingerprint(filters, sort, direction):
+    """Huella de la consulta: un cursor solo vale para la misma búsqueda."""
+    raw = json.dumps({"filters": filters, "sort": sort, "direction": direction}, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def encode_search_cursor(value, user_id, fingerprint):
+    """Cursor opaco con la clave de orden (valor, id) del último resultado."""
+    if isinstance(value, date):
+        value = value.isoformat()
+    raw = json.dumps({"v": value, "id": user_id, "q": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor, sort, fingerprint):
+    """Interpreta un cursor de encode_search_cursor y comprueba que es de esta búsqueda."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value, user_id = data["v"], int(data["id"])
+        if sort == "age":
+            value = date.fromisoformat(value)
+        elif value is not None:
+            value = float(value)
+    except (TypeError, ValueError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if data.get("q") != fingerprint:
+        raise ValueError("Cursor does not belong to this search.")
+    return value, user_id
+
+
+def plan_search(predicates, sort, limit, stats):
+    """Elige cómo ejecutar la búsqueda.
+
+    - "index_walk": recorrer el índice del orden pedido y parar al llegar a
+      LIMIT; cuesta ~limit / selectividad_combinada filas.
+    - "driver": materializar primero los ids del predicado más selectivo
+      (exploración solo de índice o ids del índice de tags) y aplicar el
+      resto sobre ese conjunto; cuesta ~selectividad_del_driver * filas.
+    """
+    rows = max(stats["rows"], 1)
+    drivers = [predicate for predicate in predicates if predicate.can_drive]
+    driver = min(drivers, key=lambda predicate: predicate.selectivity) if drivers else None
+    combined = 1.0
+    for predicate in predicates:
+        combined *= predicate.selectivity
+
+    driver_cost = driver.selectivity * rows if driver else float(rows)
+    walk_cost = float("inf")
+    if sort in INDEX_ORDERED_SORTS:
+        walk_cost = min(rows, limit / max(combined, 1.0 / rows))
+
+    strategy = "index_walk" if driver is None or walk_cost < driver_cost else "driver"
+    return {
+        "strategy": strategy,
+        "driver": driver.name if driver and strategy == "driver" else None,
+        "estimated_rows": round(rows * combined),
+        "cost": round(min(walk_cost, driver_cost)),
+        "selectivity": {predicate.name: round(predicate.selectivity, 6) for predicate in predicates},
+    }
+
+
+def _compile(predicates, plan, select, params, order=None):
+    """Construye la consulta según el plan. Devuelve (sql, parámetros).
+
+    `order` es (columna, dirección, hay_cursor); sin él se devuelven todas las
+    filas que cumplen los filtros, sin ordenar.
+    """
+    params = dict(params)
+    for predicate in predicates:
+        params.update(predicate.params)
+
+    with_clause, source = "", "users u"
+    conditions = [predicate.condition for predicate in predicates]
+    if plan["strategy"] == "driver":
+        driver = next(predicate for predicate in predicates if predicate.name == plan["driver"])
+        if driver.driver_ids is not None:
+            params["driver_ids"] = driver.driver_ids.to_list()
+            driver_query = "SELECT unnest(%(driver_ids)s::int[]) AS id"
+            conditions = [predicate.condition for predicate in predicates if predicate is not driver]
+        else:
+            # Las condiciones sobre columnas incluidas en los índices de búsqueda
+            # se evalúan en la exploración solo de índice; el resto, tras el JOIN
+            covered = [predicate for predicate in predicates if predicate.index_covered]
+            conditions = [predicate.condition for predicate in predicates if not predicate.index_covered]
+            driver_query = f'''
+                SELECT u.id FROM users u
+                WHERE u.is_active AND {" AND ".join(predicate.condition for predicate in covered)}
+            '''
+        with_clause = f"WITH driver AS MATERIALIZED ({driver_query})"
+        source = "driver JOIN users u ON u.id = driver.id"
+
+    query = f'''
+        {with_clause}
+        SELECT {select}
+        FROM {source}
+        WHERE u.is_active AND u.id <> %(viewer_id)s
+          {"".join(f" AND {condition}" for condition in conditions)}
+    '''
+    if order is None:
+        return query, params
+
+    column, direction, has_cursor = order
+    keyset = ""
+    if has_cursor:
+        operator = ">" if direction == "asc" else "<"
+        keyset = f"WHERE ({column}, id) {operator} (%(cursor_value)s, %(cursor_id)s)"
+    query = f'''
+        SELECT * FROM ({query}) AS results
+        {keyset}
+        ORDER BY {column} {direction}, id {direction}
+        LIMIT %(limit)s
+    '''
+    return query, params
+
+
+def _rank_by_shared_tags(cursor_db, predicates, plan, select, params, direction, limit):
+    """Ordena por tags en común con el índice invertido en lugar de contar en SQL.
+
+    La base de datos solo devuelve los ids que cumplen el resto de filtros;
+    los filtros de tags y el recuento se calculan en memoria y luego se leen
+    las filas de la página.
+    """
+    shared = next(predicate for predicate in predicates if predicate.name == "shared")
+    if shared.tag_filter is None:
+        return []  # Quien busca no tiene tags
+    viewer_tags = shared.tag_filter[0]
+
+    in_memory = [predicate for predicate in predicates
+                 if predicate.tag_filter is not None and predicate.name != plan["driver"]]
+    sql_predicates = [predicate for predicate in predicates if predicate not in in_memory]
+    query, query_params = _compile(sql_predicates, plan, "u.id", params)
+    cursor_db.execute(query, query_params)
+
+    has_cursor = "cursor_id" in params
+    ranked = []
+    for row in cursor_db.fetchall():
+        user_tags = tag_index.user_tags(row["id"])
+        if any(len(user_tags & tags) < minimum for tags, minimum in
+               (predicate.tag_filter for predicate in in_memory)):
+            continue
+        key = (len(user_tags & viewer_tags), row["id"])
+        if has_cursor:
+            cursor_key = (params["cursor_value"], params["cursor_id"])
+            if (direction == "desc" and key >= cursor_key) or (direction == "asc" and key <= cursor_key):
+                continue
+        ranked.append(key)
+    choose = heapq.nlargest if direction == "desc" else heapq.nsmallest
+    page = choose(limit + 1, ranked)
+    if not page:
+        return []
+
+    cursor_db.execute(f"SELECT {select} FROM users u WHERE u.id = ANY(%(page_ids)s)",
+                      {**params, "page_ids": [user_id for _, user_id in page]})
+    rows = {row["id"]: row for row in cursor_db.fetchall()}
+    users = []
+    for shared, user_id in page:
+        if user_id in rows:
+            rows[user_id]["shared_tags"] = shared
+            users.append(rows[user_id])
+    return users
+
+
+def search_profiles(viewer_id, min_age=None, max_age=None, max_distance_km=None, min_fame=None, max_fame=None,
+                    tags=None, min_shared_tags=None, sort="distance", direction=None, limit=None, cursor=None,
+                    blocked_ids=None):
+    """Busca perfiles activos combinando filtros y con paginación por cursor.
+
+    Ordenar por "tags" (tags en común con quien busca) solo devuelve perfiles
+    con al menos un tag en común. Los usuarios bloqueados (blocked_ids o, si
+    no se pasa, el conjunto en caché de viewer_id) no aparecen. Devuelve {"users": [...],
+    "next_cursor": str | None, "plan": {...}}.
+    """
+    if not viewer_id:
+        raise ValueError("viewer_id is required to search profiles.")
+    if sort not in SORTS:
+        raise ValueError(f"Invalid sort: {sort}. Use one of {', '.join(SORTS)}.")
+    sort_column, default_direction, inverted = SORTS[sort]
+    direction = (direction or default_direction).lower()
+    if direction not in ("asc", "desc"):
+        raise ValueError("direction must be 'asc' or 'desc'.")
+    sql_direction = {"asc": "desc", "desc": "asc"}[direction] if inverted else direction
+    limit = limit or Config.DEFAULT_LIMIT
+    if limit <= 0 or limit > Config.MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {Config.MAX_LIMIT}.")
+    if max_distance_km is not None and max_distance_km <= 0:
+        raise ValueError("max_distance_km must be positive.")
+
+    origin = None
+    if sort == "distance" or max_distance_km is not None:
+        origin = get_coordinates(viewer_id)
+        if not origin:
+            raise ValueError("Viewer has no location: cannot filter or sort by distance.")
+        if max_distance_km is None:
+            max_distance_km = Config.DEFAULT_DISTANCE_KM
+
+    filters = {"min_age": min_age, "max_age": max_age, "max_distance_km": max_distance_km,
+               "min_fame": min_fame, "max_fame": max_fame, "tags": sorted(tags) if tags else None,
+               "min_shared_tags": min_shared_tags}
+    fingerprint = _fingerprint(filters, sort, direction)
+
+    stats = _load_stats()
+    predicates = []
+    if min_age is not None or max_age is not None:
+        predicates.append(_age_predicate(stats, min_age, max_age))
+    if min_fame is not None or max_fame is not None:
+        predicates.append(_fame_predicate(stats, min_fame, max_fame))
+    if tags:
+        predicates.append(_tags_predicate(stats, tags, min_shared_tags or len(set(tags))))
+    if sort == "tags":
+        predicates.append(_tag_set_predicate("shared", stats, tag_index.user_tags(viewer_id), 1))
+    if sort == "fame":
+        predicates.append(Predicate("fame_known", "u.fame_rating IS NOT NULL", {}, 1.0, index_covered=False))
+    blocked = resolve_blocked(viewer_id, blocked_ids)
+    if blocked:
+        predicates.append(Predicate("blocked", not_in_blocked("u.id", "%(blocked_ids)s"),
+                                    {"blocked_ids": list(blocked)},
+                                    max(1.0 - len(blocked) / max(stats["rows"], 1), 0.0), index_covered=False))
+
+    select = "u.id, u.username, u.first_name, u.last_name, u.birthdate, u.fame_rating, u.location"
+    params = {"viewer_id": viewer_id, "limit": limit + 1}
+    if origin:
+        select += f", {DISTANCE_SQL} AS distance_km"
+        params.update(lat=origin["latitude"], lon=origin["longitude"])
+
+    cursor_value = None
+    if cursor:
+        cursor_value, params["cursor_id"] = decode_search_cursor(cursor, sort, fingerprint)
+        params["cursor_value"] = cursor_value
+
+    # Ordenando por cercanía se busca en anillos crecientes: el trabajo depende
+    # de `limit` y no de la densidad de usuarios alrededor. Se saltan los
+    # anillos en los que, según las estadísticas, no caben limit resultados
+    radii = [max_distance_km]
+    if sort == "distance" and sql_direction == "asc":
+        radii = search_radii(max_distance_km, cursor_value or 0.0)
+
+    attempts = []
+    for radius in radii:
+        current = predicates
+        if origin:
+            current = predicates + [_distance_predicate(stats, origin, radius)]
+        plan = plan_search(current, sort, limit, stats)
+        if radius == radii[-1] or plan["estimated_rows"] >= 2 * (limit + 1):
+            attempts.append((current, plan))
+
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor_db:
+                for current, plan in attempts:
+                    if sort == "tags":
+                        users = _rank_by_shared_tags(cursor_db, current, plan, select, params, sql_direction, limit)
+                    else:
+                        query, query_params = _compile(current, plan, select, params,
+                                                       (sort_column, sql_direction, cursor is not None))
+                        cursor_db.execute(query, query_params)
+                        users = cursor_db.fetchall()
+                    if len(users) > limit:
+                        break
+    except Exception as e:
+        logger.error(f"Error searching profiles for user ID {viewer_id}: {e}")
+        raise Exception("Error searching profiles") from e
+
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        last = users[-1]
+        next_cursor = encode_search_cursor(last[sort_column], last["id"], fingerprint)
+    return {"users": users, "next_cursor": next_cursor, "plan": plan}
+
+
+# Búsqueda de texto (migraciones 12 y 15). Misma expresión que los índices de nombre completo
+FULL_NAME_SQL = "lower(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, ''))"
+TEXT_COLUMNS = "u.id, u.username, u.first_name, u.last_name, u.location, u.fame_rating, u.profile_picture"
+# Palabras tal como las separa el analizador de PostgreSQL (el guion bajo separa)
+TERM_PATTERN = re.compile(r"[^\W_]+")
+
+# Typeahead: tres exploraciones de índice por rango de prefijo, cada una ya
+# ordenada y cortada en LIMIT; el trabajo no depende del número de usuarios
+TYPEAHEAD = register("search.typeahead", f'''
+    SELECT {TEXT_COLUMNS} FROM (
+        (SELECT u.id FROM users u
+         WHERE u.is_active AND lower(u.username) COLLATE "C" >= %(low)s AND lower(u.username) COLLATE "C" < %(high)s
+         ORDER BY lower(u.username) COLLATE "C" LIMIT %(candidates)s)
+        UNION
+        (SELECT u.id FROM users u
+         WHERE u.is_active AND {FULL_NAME_SQL} COLLATE "C" >= %(low)s AND {FULL_NAME_SQL} COLLATE "C" < %(high)s
+         ORDER BY {FULL_NAME_SQL} COLLATE "C" LIMIT %(candidates)s)
+        UNION
+        (SELECT u.id FROM users u
+         WHERE u.is_active AND lower(u.last_name) COLLATE "C" >= %(low)s AND lower(u.last_name) COLLATE "C" < %(high)s
+         ORDER BY lower(u.last_name) COLLATE "C" LIMIT %(candidates)s)
+    ) AS matches
+    JOIN users u ON u.id = matches.id
+    WHERE {not_in_blocked("matches.id", "%(blocked_ids)s")}
+''')
+
+
+def _text_terms(text):
+    """Palabras en minúsculas de una consulta de texto (como mucho TEXT_MAX_TERMS)."""
+    return TERM_PATTERN.findall((text or "").lower())[:Config.TEXT_MAX_TERMS]
+
+
+def _prefix_bounds(prefix):
+    """Rango [low, high) de las cadenas que empiezan por el prefijo en orden de bytes."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _typeahead_rank(row, prefix):
+    username = row["username"].lower()
+    if username == prefix:
+        tier = 0
+    elif username.startswith(prefix):
+        tier = 1
+    elif f"{row['first_name'] or ''} {row['last_name'] or ''}".lower().startswith(prefix):
+        tier = 2
+    else:
+        tier = 3
+    return tier, -(row["fame_rating"] or 0.0), username
+
+
+def _viewer_blocks(viewer_id, blocked_ids):
+    """Bloqueos a aplicar en las búsquedas de texto, que también admiten llamadas anónimas."""
+    if viewer_id is None:
+        return blocked_ids or ()
+    return resolve_blocked(viewer_id, blocked_ids)
+
+
+def typeahead_users(prefix, limit=None, viewer_id=None, blocked_ids=None):
+    """Usuarios activos cuyo nombre de usuario, nombre completo o apellido empieza por el prefijo.
+
+    Se leen TYPEAHEAD_CANDIDATES candidatos por índice (en orden alfabético) y
+    se reordenan en memoria: nombre de usuario exacto, prefijo del nombre de
+    usuario, prefijo del nombre y, dentro de cada grupo, más fama primero.
+    Con viewer_id se ocultan sus bloqueos (o los de blocked_ids).
+    """
+    limit = limit or Config.TYPEAHEAD_LIMIT
+    if limit <= 0 or limit > Config.TYPEAHEAD_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {Config.TYPEAHEAD_MAX_LIMIT}.")
+    prefix = " ".join((prefix or "").lower().split())[:100]
+    if not prefix:
+        return []
+
+    low, high = _prefix_bounds(prefix)
+    params = {"low": low, "high": high, "candidates": max(Config.TYPEAHEAD_CANDIDATES, limit),
+              "blocked_ids": list(_viewer_blocks(viewer_id, blocked_ids))}
+    try:
+        rows = fetch_all(TYPEAHEAD, params)
+    except Exception as e:
+        logger.error(f"Error in typeahead for prefix {prefix!r}: {e}")
+        raise Exception("Error searching users") from e
+
+    rows.sort(key=lambda row: _typeahead_rank(row, prefix))
+    return rows[:limit]
+
+
+def search_users(query, limit=None, cursor=None, viewer_id=None, blocked_ids=None):
+    """Búsqueda de texto ordenada por relevancia, con paginación por cursor.
+
+    Cada palabra se busca en search_document (nombre de usuario, nombre,
+    ubicación y biografía, con más peso los nombres), como prefijo si tiene
+    más de una letra, y la consulta completa por similitud de trigramas con el
+    nombre de usuario y el nombre, lo que tolera erratas. La relevancia suma
+    ts_rank_cd y la mayor de las similitudes.
+
+    Los candidatos salen de cuatro ramas, cada una ya ordenada por relevancia
+    y cortada en TEXT_MAX_CANDIDATES: nombres de usuario que empiezan por la
+    consulta (el exacto primero), los vecinos por trigramas del nombre de
+    usuario y del nombre completo (índices GiST, migración 15) y las
+    coincidencias del tsquery por ts_rank_cd. Una palabra muy común no obliga
+    a puntuar toda la tabla y el conjunto no cambia entre páginas. Con
+    viewer_id se ocultan sus bloqueos (o los de blocked_ids). Devuelve
+    {"users": [...], "next_cursor": str | None}.
+    """
+    terms = _text_terms(query)
+    if not terms:
+        raise ValueError("query must contain at least one word.")
+    limit = limit or Config.DEFAULT_LIMIT
+    if limit <= 0 or limit > Config.MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {Config.MAX_LIMIT}.")
+
+    text = " ".join(terms)
+    # El nombre de usuario se compara con la consulta tal cual (conserva "_" y ".")
+    username = " ".join(query.lower().split())[:100]
+    fingerprint = _fingerprint({"query": text}, "relevance", "desc")
+    params = {
+        "tsquery": " & ".join(f"{term}:*" if len(term) > 1 else term for term in terms),
+        "text": text,
+        "candidates": Config.TEXT_MAX_CANDIDATES,
+        "limit": limit + 1,
+    }
+    params["low"], params["high"] = _prefix_bounds(username)
+    blocked = _viewer_blocks(viewer_id, blocked_ids)
+    block_filter = ""
+    if blocked:
+        params["blocked_ids"] = list(blocked)
+        block_filter = f"AND {not_in_blocked('u.id', '%(blocked_ids)s')}"
+    keyset = ""
+    if cursor:
+        params["cursor_value"], params["cursor_id"] = decode_search_cursor(cursor, "relevance", fingerprint)
+        keyset = "WHERE (score, id) < (%(cursor_value)s, %(cursor_id)s)"
+
+    # Cada rama es una exploración de índice ya ordenada (prefijo en orden de
+    # bytes, KNN en GiST, GIN + top-N por rango); el id desempata para que los
+    # candidatos sean siempre los mismos
+    sql = f'''
+        SELECT * FROM (
+            SELECT {TEXT_COLUMNS},
+                   (ts_rank_cd(u.search_document, to_tsquery('simple', %(tsquery)s))
+                    + greatest(similarity(lower(u.username), %(text)s), similarity({FULL_NAME_SQL}, %(text)s))
+                   )::float8 AS score
+            FROM (
+                (SELECT u.id FROM users u
+                 WHERE u.is_active AND lower(u.username) COLLATE "C" >= %(low)s
+                   AND lower(u.username) COLLATE "C" < %(high)s {block_filter}
+                 ORDER BY lower(u.username) COLLATE "C", u.id LIMIT %(candidates)s)
+                UNION
+                (SELECT u.id FROM users u
+                 WHERE u.is_active AND lower(u.username) %% %(text)s {block_filter}
+                 ORDER BY lower(u.username) <-> %(text)s, u.id LIMIT %(candidates)s)
+                UNION
+                (SELECT u.id FROM users u
+                 WHERE u.is_active AND {FULL_NAME_SQL} %% %(text)s {block_filter}
+                 ORDER BY {FULL_NAME_SQL} <-> %(text)s, u.id LIMIT %(candidates)s)
+                UNION
+                (SELECT u.id FROM users u
+                 WHERE u.is_active AND u.search_document @@ to_tsquery('simple', %(tsquery)s) {block_filter}
+                 ORDER BY ts_rank_cd(u.search_document, to_tsquery('simple', %(tsquery)s)) DESC, u.id
+                 LIMIT %(candidates)s)
+            ) AS candidates
+            JOIN users u ON u.id = candidates.id
+        ) AS results
+        {keyset}
+        ORDER BY score DESC, id DESC
+        LIMIT %(limit)s
+    '''
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor_db:
+                cursor_db.execute(sql, params)
+                users = cursor_db.fetchall()
+    except Exception as e:
+        logger.error(f"Error searching users for {text!r}: {e}")
+        raise Exception("Error searching users") from e
+
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_search_cursor(users[-1]["score"], users[-1]["id"], fingerprint)
+    return {"users": users, "next_cursor": next_cursor}
@@ -0,0 +1,232 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    suggestions_model.py                               :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 11:14:37 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 11:14:37 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .database import Database
+from .blocks_model import not_blocked, resolve_blocked
+from .geo_model import DISTANCE_SQL, covering_cells
+from config import SuggestionConfig as Config
+import logging
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GENDERS = ("male", "female", "other")
+PREFERENCES = ("heterosexual", "homosexual", "bisexual")
+DEFAULT_PREFERENCE = "bisexual"  # Sin preferencia definida se considera bisexual
+
+
+def default_weights():
+    """Pesos configurados para cada componente de la puntuación."""
+    return {
+        "distance": Config.WEIGHT_DISTANCE,
+        "tags": Config.WEIGHT_TAGS,
+        "fame": Config.WEIGHT_FAME,
+        "age": Config.WEIGHT_AGE,
+    }
+
+
+def interested_in(gender, preference):
+    """Devuelve los géneros que le interesan a alguien según su género y preferencia."""
+    preference = preference or DEFAULT_PREFERENCE
+    if preference == "heterosexual" and gender == "male":
+        return {"female"}
+    if preference == "heterosexual" and gender == "female":
+        return {"male"}
+    if preference == "homosexual" and gender in ("male", "female"):
+        return {gender}
+    return set(GENDERS)
+
+
+def compatible_pairs(gender, preference):
+    """Pares (género, preferencia) de candidatos compatibles en ambos sentidos."""
+    pairs = []
+    for candidate_gender in interested_in(gender, preference):
+        for candidate_preference in PREFERENCES:
+            if gender in interested_in(candidate_gender, candidate_preference):
+                pairs.append((candidate_gender, candidate_preference))
+    return pairs
+
+
+def get_viewer(user_id):
+    """Obtiene los datos del usuario que pide sugerencias, con sus intereses."""
+    query = '''
+        SELECT id, gender, sexual_preferences, latitude, longitude, fame_rating,
+               DATE_PART('year', AGE(birthdate))::int AS age,
+               ARRAY(SELECT interest_id FROM user_interests WHERE user_id = users.id) AS interest_ids
+        FROM users
+        WHERE id = %s
+    '''
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (user_id,))
+                return cursor.fetchone()
+    except Exception as e:
+        logger.error(f"Error fetching suggestion viewer {user_id}: {e}")
+        raise Exception("Error fetching suggestion viewer") from e
+
+
+def fetch_candidates(viewer, max_distance_km, max_candidates, blocked_ids=()):
+    """Obtiene en una sola consulta el bloque de candidatos prefiltrado.
+
+    Filtra por orientación compatible en ambos sentidos, distancia máxima
+    (podando por celdas geohash) y excluye a los usuarios ya likeados y a
+    los bloqueados.
+    """
+    pairs = compatible_pairs(viewer["gender"], viewer["sexual_preferences"])
+    if not pairs:
+        return []
+
+    params = {
+        "user_id": viewer["id"],
+        "lat": viewer["latitude"],
+        "lon": viewer["longitude"],
+        "pair_genders": [gender for gender, _ in pairs],
+        "pair_preferences": [preference for _, preference in pairs],
+        "max_distance_km": max_distance_km,
+        "max_candidates": max_candidates,
+        "blocked_ids": list(blocked_ids),
+    }
+
+    cell_filter = ""
+    cells = covering_cells(viewer["latitude"], viewer["longitude"], max_distance_km)
+    if cells is not None:
+        cell_filter = "AND (" + " OR ".join(f"geohash LIKE %(cell_{i})s" for i in range(len(cells))) + ")"
+        params.update({f"cell_{i}": f"{cell}%" for i, cell in enumerate(cells)})
+
+    query = f'''
+        SELECT * FROM (
+            SELECT id, username, first_name, last_name, fame_rating,
+                   DATE_PART('year', AGE(birthdate))::int AS age,
+                   {DISTANCE_SQL} AS distance_km,
+                   ARRAY(SELECT interest_id FROM user_interests WHERE user_id = users.id) AS interest_ids
+            FROM users
+            WHERE id <> %(user_id)s
+              AND geohash IS NOT NULL
+              {cell_filter}
+              AND (gender, COALESCE(sexual_preferences, 'bisexual')) IN (
+                  SELECT * FROM unnest(%(pair_genders)s::text[], %(pair_preferences)s::text[])
+              )
+              AND NOT EXISTS (
+                  SELECT 1 FROM likes WHERE likes.user_id = %(user_id)s AND likes.liked_user_id = users.id
+              )
+              AND {not_blocked("users.id", "%(blocked_ids)s")}
+        ) AS candidates
+        WHERE distance_km <= %(max_distance_km)s
+        ORDER BY distance_km
+        LIMIT %(max_candidates)s
+    '''
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+    except Exception as e:
+        logger.error(f"Error fetching suggestion candidates for user {viewer['id']}: {e}")
+        raise Exception("Error fetching suggestion candidates") from e
+
+
+def build_block(candidates):
+    """Convierte las filas de candidatos en arrays de NumPy (formato columnar)."""
+    tag_counts = np.fromiter((len(row["interest_ids"]) for row in candidates), dtype=np.int64, count=len(candidates))
+    tags = [tag for row in candidates for tag in row["interest_ids"]]
+    return {
+        "ids": np.fromiter((row["id"] for row in candidates), dtype=np.int64, count=len(candidates)),
+        "distance_km": np.fromiter((row["distance_km"] for row in candidates), dtype=np.float64, count=len(candidates)),
+        "age": np.fromiter((row["age"] for row in candidates), dtype=np.float64, count=len(candidates)),
+        "fame": np.fromiter((row["fame_rating"] or 0.0 for row in candidates), dtype=np.float64, count=len(candidates)),
+        "tags": np.asarray(tags, dtype=np.int64),
+        # Índice del candidato al que pertenece cada tag (representación dispersa)
+        "tag_owner": np.repeat(np.arange(len(candidates)), tag_counts),
+    }
+
+
+def score_block(block, viewer_tags, viewer_age, weights=None):
+    """Puntúa todo el bloque de candidatos de una vez.
+
+    Devuelve (puntuaciones, número de tags compartidos) como arrays.
+    """
+    weights = {**default_weights(), **(weights or {})}
+    size = len(block["ids"])
+
+    distance_score = np.exp(-block["distance_km"] / Config.DISTANCE_SCALE_KM)
+
+    shared_tags = np.zeros(size, dtype=np.int64)
+    if len(viewer_tags) and len(block["tags"]):
+        matches = np.isin(block["tags"], np.asarray(viewer_tags, dtype=np.int64))
+        shared_tags = np.bincount(block["tag_owner"][matches], minlength=size)
+    tags_score = shared_tags / max(1, len(viewer_tags))
+
+    max_fame = block["fame"].max() if size else 0.0
+    fame_score = block["fame"] / max_fame if max_fame > 0 else np.zeros(size)
+
+    age_gap = (block["age"] - viewer_age) / Config.AGE_SCALE_YEARS
+    age_score = np.exp(-(age_gap ** 2))
+
+    scores = (weights["distance"] * distance_score
+              + weights["tags"] * tags_score
+              + weights["fame"] * fame_score
+              + weights["age"] * age_score)
+    return scores, shared_tags
+
+
+def top_k(scores, ids, offset, limit):
+    """Índices de la página pedida del top-K (mejor puntuación primero, id para desempatar)."""
+    wanted = min(len(scores), offset + limit)
+    if wanted <= offset:
+        return np.empty(0, dtype=np.int64)
+    if wanted < len(scores):
+        # Solo se ordena lo necesario para llegar a la página pedida
+        candidates = np.argpartition(-scores, wanted - 1)[:wanted]
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((ids[candidates], -scores[candidates]))
+    return candidates[order][offset:wanted]
+
+
+def get_suggestions(user_id, page=1, page_size=20, weights=None, max_distance_km=None, blocked_ids=None):
+    """Obtiene una página de sugerencias ordenadas por puntuación."""
+    if not user_id:
+        raise ValueError("user_id is required to get suggestions.")
+    if page < 1 or page_size < 1:
+        raise ValueError("page and page_size must be positive.")
+
+    viewer = get_viewer(user_id)
+    if not viewer or viewer["latitude"] is None or viewer["longitude"] is None:
+        return {"suggestions": [], "page": page, "total": 0}
+
+    candidates = fetch_candidates(viewer, max_distance_km or Config.MAX_DISTANCE_KM, Config.MAX_CANDIDATES,
+                                  resolve_blocked(user_id, blocked_ids))
+    if not candidates:
+        return {"suggestions": [], "page": page, "total": 0}
+
+    block = build_block(candidates)
+    scores, shared_tags = score_block(block, viewer["interest_ids"], viewer["age"], weights)
+    selected = top_k(scores, block["ids"], (page - 1) * page_size, page_size)
+
+    suggestions = []
+    for index in selected:
+        row = candidates[index]
+        suggestions.append({
+            "id": row["id"],
+            "username": row["username"],
+            "first_name": row["first_name"],
+            "last_name": row["last_name"],
+            "age": row["age"],
+            "fame_rating": row["fame_rating"],
+            "distance_km": row["distance_km"],
+            "shared_tags": int(shared_tags[index]),
+            "score": float(scores[index]),
+        })
+    logger.info(f"Scored {len(candidates)} candidates for user {user_id}.")
+    return {"suggestions": suggestions, "page": page, "total": len(candidates)}
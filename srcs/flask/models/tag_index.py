@@ -0,0 +1,346 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    tag_index.py                                       :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 16:03:40 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 16:03:40 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+from .database import Database
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+CHUNK_BYTES = (1 << CHUNK_BITS) // 8
+ARRAY_MAX = 4096  # Por encima de esta cardinalidad un trozo se guarda como bitmap
+TAG_CHANGES_CHANNEL = "matcha_tag_changes"
+LISTEN_TIMEOUT = 5  # Segundos que se espera al LISTEN antes de cargar el índice
+
+
+def _bits_to_values(bitmap):
+    """Posiciones de los bits a 1 de un entero de hasta 2^16 bits."""
+    data = np.frombuffer(bitmap.to_bytes(CHUNK_BYTES, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(data, bitorder="little")).tolist()
+
+
+def _values_to_bits(values):
+    bits = np.zeros(1 << CHUNK_BITS, dtype=np.uint8)
+    bits[np.fromiter(values, dtype=np.int64, count=len(values))] = 1
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+class RoaringBitmap:
+    """Conjunto comprimido de enteros al estilo roaring.
+
+    Los ids se reparten en trozos de 2^16 según sus bits altos. Cada trozo es
+    un set (pocos elementos) o un entero de 65536 bits (muchos elementos), de
+    modo que intersecciones y uniones se hacen en C trozo a trozo.
+    """
+
+    __slots__ = ("_chunks",)
+
+    def __init__(self, values=()):
+        self._chunks = {}  # bits altos -> set | int
+        for value in values:
+            self.add(value)
+
+    @classmethod
+    def _from_chunks(cls, chunks):
+        bitmap = cls()
+        bitmap._chunks = {key: chunk for key, chunk in chunks.items() if chunk}
+        return bitmap
+
+    def add(self, value):
+        key, low = value >> CHUNK_BITS, value & CHUNK_MASK
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            self._chunks[key] = {low}
+        elif isinstance(chunk, set):
+            chunk.add(low)
+            if len(chunk) > ARRAY_MAX:
+                self._chunks[key] = _values_to_bits(chunk)
+        else:
+            self._chunks[key] = chunk | (1 << low)
+
+    def discard(self, value):
+        key, low = value >> CHUNK_BITS, value & CHUNK_MASK
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            return
+        if isinstance(chunk, set):
+            chunk.discard(low)
+        else:
+            chunk &= ~(1 << low)
+            if chunk.bit_count() <= ARRAY_MAX:
+                chunk = set(_bits_to_values(chunk))
+            self._chunks[key] = chunk
+        if not chunk:
+            del self._chunks[key]
+
+    def __contains__(self, value):
+        chunk = self._chunks.get(value >> CHUNK_BITS)
+        if chunk is None:
+            return False
+        low = value & CHUNK_MASK
+        return low in chunk if isinstance(chunk, set) else bool(chunk >> low & 1)
+
+    def __len__(self):
+        return sum(len(chunk) if isinstance(chunk, set) else chunk.bit_count() for chunk in self._chunks.values())
+
+    def __iter__(self):
+        for key in sorted(self._chunks):
+            chunk = self._chunks[key]
+            lows = sorted(chunk) if isinstance(chunk, set) else _bits_to_values(chunk)
+            base = key << CHUNK_BITS
+            for low in lows:
+                yield base | low
+
+    def __and__(self, other):
+        chunks = {}
+        for key in self._chunks.keys() & other._chunks.keys():
+            chunks[key] = _and_chunks(self._chunks[key], other._chunks[key])
+        return RoaringBitmap._from_chunks(chunks)
+
+    def __or__(self, other):
+        chunks = {key: _copy_chunk(chunk) for key, chunk in self._chunks.items()}
+        for key, chunk in other._chunks.items():
+            chunks[key] = _or_chunks(chunks[key], chunk) if key in chunks else _copy_chunk(chunk)
+        return RoaringBitmap._from_chunks(chunks)
+
+    def to_list(self):
+        values = []
+        for key in sorted(self._chunks):
+            chunk = self._chunks[key]
+            base = key << CHUNK_BITS
+            lows = sorted(chunk) if isinstance(chunk, set) else _bits_to_values(chunk)
+            values.extend([base | low for low in lows] if base else lows)
+        return values
+
+    def copy(self):
+        return RoaringBitmap._from_chunks({key: _copy_chunk(chunk) for key, chunk in self._chunks.items()})
+
+    def chunk_bits(self, key):
+        """Trozo `key` como entero de bits (0 si no existe)."""
+        chunk = self._chunks.get(key, 0)
+        return _values_to_bits(chunk) if isinstance(chunk, set) else chunk
+
+    def chunk_keys(self):
+        return self._chunks.keys()
+
+
+def _copy_chunk(chunk):
+    return set(chunk) if isinstance(chunk, set) else chunk
+
+
+def _and_chunks(a, b):
+    if isinstance(a, set) and isinstance(b, set):
+        return a & b
+    if isinstance(a, set):
+        return {low for low in a if b >> low & 1}
+    if isinstance(b, set):
+        return {low for low in b if a >> low & 1}
+    result = a & b
+    return set(_bits_to_values(result)) if result.bit_count() <= ARRAY_MAX else result
+
+
+def _or_chunks(a, b):
+    if isinstance(a, set) and isinstance(b, set):
+        union = a | b
+        return union if len(union) <= ARRAY_MAX else _values_to_bits(union)
+    a_bits = _values_to_bits(a) if isinstance(a, set) else a
+    b_bits = _values_to_bits(b) if isinstance(b, set) else b
+    return a_bits | b_bits
+
+
+def at_least(bitmaps, k):
+    """Elementos presentes en al menos k de los bitmaps (contadores bit a bit por trozo)."""
+    if k <= 0:
+        raise ValueError("k must be positive.")
+    if k > len(bitmaps):
+        return RoaringBitmap()
+
+    keys = {}
+    for bitmap in bitmaps:
+        for key in bitmap.chunk_keys():
+            keys[key] = keys.get(key, 0) + 1
+
+    chunks = {}
+    for key, present in keys.items():
+        if present < k:
+            continue
+        # levels[j]: posiciones que aparecen en al menos j bitmaps ya procesados
+        levels = [-1] + [0] * k
+        for bitmap in bitmaps:
+            bits = bitmap.chunk_bits(key)
+            if not bits:
+                continue
+            for j in range(k, 0, -1):
+                levels[j] |= levels[j - 1] & bits
+        result = levels[k]
+        chunks[key] = set(_bits_to_values(result)) if result.bit_count() <= ARRAY_MAX else result
+    return RoaringBitmap._from_chunks(chunks)
+
+
+class TagIndex:
+    """Índice invertido en memoria: tag -> usuarios (bitmap) y usuario -> tags.
+
+    Cada worker tiene su copia y la mantiene al día escuchando en
+    TAG_CHANGES_CHANNEL los cambios que publican los demás (publish_tag_change).
+    """
+
+    def __init__(self):
+        self._postings = {}  # tag_id -> RoaringBitmap de user_ids
+        self._user_tags = {}  # user_id -> frozenset de tag_ids
+        self._lock = threading.RLock()
+        self._loaded_pid = None
+        self._listener = None
+        self._listener_pid = None
+        self._listening = threading.Event()
+
+    def ensure_loaded(self):
+        """Carga el índice del proceso (se llama al arrancar cada worker, en post_fork)."""
+        if self._loaded_pid == os.getpid():
+            return
+        with self._lock:
+            if self._loaded_pid != os.getpid():
+                # Escuchar antes de leer: un cambio durante la carga no se pierde
+                self._start_listener()
+                if not self._listening.wait(LISTEN_TIMEOUT):
+                    logger.warning("Tag index listener not ready, loading without it")
+                self.reload()
+
+    def reload(self):
+        """Reconstruye el índice leyendo user_interests en streaming."""
+        start = time.perf_counter()
+        postings, user_tags = {}, {}
+        with Database.get_connection() as connection:
+            with connection.cursor(name="tag_index_load") as cursor:
+                cursor.itersize = 50000
+                cursor.execute("SELECT user_id, interest_id FROM user_interests")
+                for row in cursor:
+                    postings.setdefault(row["interest_id"], RoaringBitmap()).add(row["user_id"])
+                    user_tags.setdefault(row["user_id"], set()).add(row["interest_id"])
+        with self._lock:
+            self._postings = postings
+            self._user_tags = {user_id: frozenset(tags) for user_id, tags in user_tags.items()}
+            self._loaded_pid = os.getpid()
+        logger.info(f"Tag index loaded: {len(postings)} tags, {len(user_tags)} users "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    def apply_change(self, user_id, added=(), removed=()):
+        """Actualiza el índice tras cambiar los tags de un usuario."""
+        with self._lock:
+            tags = set(self._user_tags.get(user_id, ()))
+            for tag_id in removed:
+                tags.discard(tag_id)
+                posting = self._postings.get(tag_id)
+                if posting is not None:
+                    posting.discard(user_id)
+                    if not len(posting):
+                        del self._postings[tag_id]
+            for tag_id in added:
+                tags.add(tag_id)
+                self._postings.setdefault(tag_id, RoaringBitmap()).add(user_id)
+            if tags:
+                self._user_tags[user_id] = frozenset(tags)
+            else:
+                self._user_tags.pop(user_id, None)
+
+    def remove_user(self, user_id):
+        self.apply_change(user_id, removed=self._user_tags.get(user_id, ()))
+
+    def users_with_all(self, tag_ids):
+        """Usuarios que tienen todos los tags (AND)."""
+        self.ensure_loaded()
+        with self._lock:
+            postings = sorted((self._postings.get(tag_id, RoaringBitmap()) for tag_id in tag_ids), key=len)
+            if not postings:
+                return RoaringBitmap()
+            if len(postings) == 1:
+                return postings[0].copy()
+            result = postings[0] & postings[1]
+            for posting in postings[2:]:
+                result = result & posting
+            return result
+
+    def users_with_any(self, tag_ids):
+        """Usuarios que tienen alguno de los tags (OR)."""
+        self.ensure_loaded()
+        with self._lock:
+            result = RoaringBitmap()
+            for tag_id in tag_ids:
+                result = result | self._postings.get(tag_id, RoaringBitmap())
+            return result
+
+    def users_with_at_least(self, tag_ids, k):
+        """Usuarios que tienen al menos k de los tags."""
+        self.ensure_loaded()
+        with self._lock:
+            return at_least([self._postings.get(tag_id, RoaringBitmap()) for tag_id in set(tag_ids)], k)
+
+    def user_tags(self, user_id):
+        self.ensure_loaded()
+        return self._user_tags.get(user_id, frozenset())
+
+    def shared_tag_count(self, user_a, user_b):
+        """Número de tags en común entre dos usuarios."""
+        self.ensure_loaded()
+        return len(self._user_tags.get(user_a, frozenset()) & self._user_tags.get(user_b, frozenset()))
+
+    def tag_cardinality(self, tag_id):
+        """Número de usuarios con el tag (para ordenar por popularidad o estimar selectividad)."""
+        self.ensure_loaded()
+        posting = self._postings.get(tag_id)
+        return len(posting) if posting is not None else 0
+
+    def _start_listener(self):
+        # Los hilos no sobreviven al fork: cada worker arranca el suyo
+        if self._listener_pid == os.getpid() and self._listener.is_alive():
+            return
+        self._listening = threading.Event()
+        self._listener = threading.Thread(target=self._listen, name="tag-index-changes", daemon=True)
+        self._listener_pid = os.getpid()
+        self._listener.start()
+
+    def _listen(self):
+        lost = False
+        while True:
+            try:
+                with Database.get_dedicated_connection() as connection:
+                    connection.execute(f"LISTEN {TAG_CHANGES_CHANNEL}")
+                    self._listening.set()
+                    if lost:
+                        # Se han podido perder cambios mientras no escuchábamos
+                        self.reload()
+                        lost = False
+                    for notify in connection.notifies():
+                        change = json.loads(notify.payload)
+                        if change["pid"] != os.getpid():
+                            self.apply_change(change["user_id"], change["added"], change["removed"])
+            except Exception as e:
+                logger.error(f"Tag index listener error: {e}")
+                lost = True
+                time.sleep(1)
+
+
+def publish_tag_change(cursor, user_id, added, removed):
+    """Publica en la transacción del cursor un cambio de tags para los demás workers."""
+    payload = json.dumps({"pid": os.getpid(), "user_id": user_id, "added": list(added), "removed": list(removed)})
+    cursor.execute("SELECT pg_notify(%s, %s)", (TAG_CHANGES_CHANNEL, payload))
+
+
+# Índice compartido por el proceso
+tag_index = TagIndex()
@@ -1,9 +1,20 @@
 from .database import Database
+from .cache import profile_cache, user_tag
+from .queries import register, fetch_one, fetch_all
 import logging
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Iterable, List, Tuple
 
 logging.basicConfig(level=logging.INFO)
 
+# Todas las columnas salvo search_document (tsvector mantenido por un trigger, solo para buscar)
+USER_COLUMNS = ("id, username, email, password_hash, first_name, last_name, birthdate, gender, "
+                "sexual_preferences, biography, fame_rating, profile_picture, location, latitude, longitude, "
+                "is_active, last_seen, is_online, geohash, picture_count")
+
+GET_USER_BY_ID = register("users.by_id", f"SELECT {USER_COLUMNS} FROM users WHERE id = %s")
+GET_USER_BY_USERNAME = register("users.by_username", f"SELECT {USER_COLUMNS} FROM users WHERE username = %s")
+GET_USERS_MANY = register("users.many", f"SELECT {USER_COLUMNS} FROM users WHERE id = ANY(%s)")
+
 # Función auxiliar para ejecutar consultas y manejar errores
 def execute_query(query: str, params: Tuple = (), fetchone: bool = True) -> Optional[dict]:
     """Ejecuta una consulta en la base de datos y maneja el cursor."""
@@ -18,17 +29,42 @@ def execute_query(query: str, params: Tuple = (), fetchone: bool = True) -> Opti
         logging.error(f"Error executing query: {query}, params: {params}, error: {e}")
         raise Exception("Database query error") from e
 
+# Lectura de un usuario con una sentencia preparada
+def _fetch_user(query, value) -> Optional[Dict]:
+    try:
+        return fetch_one(query, (value,))
+    except Exception as e:
+        logging.error(f"Error executing query: {query.name}, params: {value}, error: {e}")
+        raise Exception("Database query error") from e
+
 # Obtener usuario por ID
 def get_user_by_id(user_id: int) -> Optional[Dict]:
     """Obtiene un usuario por su ID."""
-    query = "SELECT * FROM users WHERE id = %s"
-    return execute_query(query, (user_id,))
+    return profile_cache.get_or_load(
+        f"user:id:{user_id}", lambda: _fetch_user(GET_USER_BY_ID, user_id), tags=(user_tag(user_id),)
+    )
+
+# Obtener varios usuarios por ID en una sola consulta
+def get_users_many(user_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Obtiene varios usuarios por ID: {id: usuario}, sin los que no existen."""
+    def load(missing: List[int]) -> Dict[int, Dict]:
+        try:
+            return {row["id"]: row for row in fetch_all(GET_USERS_MANY, (missing,))}
+        except Exception as e:
+            logging.error(f"Error executing query: {GET_USERS_MANY.name}, params: {missing}, error: {e}")
+            raise Exception("Database query error") from e
+
+    return profile_cache.get_many_or_load(
+        user_ids, lambda user_id: f"user:id:{user_id}", load, lambda user_id: (user_tag(user_id),)
+    )
 
 # Obtener usuario por nombre de usuario
 def get_user_by_username(username: str) -> Optional[Dict]:
     """Obtiene un usuario por su nombre de usuario."""
-    query = "SELECT * FROM users WHERE username = %s"
-    return execute_query(query, (username,))
+    return profile_cache.get_or_load(
+        f"user:username:{username}", lambda: _fetch_user(GET_USER_BY_USERNAME, username),
+        tags=lambda user: (user_tag(user["id"]),)
+    )
 
 # Crear un nuevo usuario
 def create_user(username: str, email: str, password_hash: str, birthdate: str, 
@@ -67,11 +103,15 @@ def update_user(user_id: int, username: Optional[str] = None, email: Optional[st
     query = f"UPDATE users SET {', '.join(updates)} WHERE id = %s RETURNING id, username, email, first_name, last_name"
     params.append(user_id)
 
-    return execute_query(query, tuple(params))
+    result = execute_query(query, tuple(params))
+    profile_cache.invalidate_tag(user_tag(user_id))
+    return result
 
 # Eliminar un usuario
 def delete_user(user_id: int) -> Optional[Dict]:
     """Elimina un usuario por su ID."""
     query = "DELETE FROM users WHERE id = %s RETURNING id"
-    return execute_query(query, (user_id,))
+    result = execute_query(query, (user_id,))
+    profile_cache.invalidate_tag(user_tag(user_id))
+    return result
 
@@ -0,0 +1,330 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    visits_model.py                                    :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 23:20:44 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 23:20:44 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Visitas a perfiles con escritura diferida (write-behind).
+
+Ver un perfil no escribe nada: la visita se anota en memoria y un hilo la
+vuelca por lotes. Las visitas repetidas del mismo visitante dentro de
+DEDUPE_WINDOW segundos se descartan (la ventana es por proceso: con varios
+workers una visita puede contar una vez en cada uno).
+
+Cada volcado, en una sola transacción:
+- profile_visits: última visita y total por (visitado, visitante);
+- profile_visit_days: visitas y visitantes únicos por perfil y día;
+- user_stats.visits_received para la fama.
+Después se crean las notificaciones del lote con un único INSERT.
+"""
+
+from .database import Database
+from .blocks_model import not_blocked, resolve_blocked
+from .fame_model import add_visit_counters
+from .notification_writer import queue_notification
+from .queries import register, run, fetch_one, fetch_all
+from .user_model import get_users_many
+from config import VisitConfig as Config
+from collections import OrderedDict
+from datetime import datetime
+from psycopg.rows import tuple_row
+import atexit
+import logging
+import os
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Los pares de un lote son únicos (claves del buffer): ON CONFLICT no toca dos veces la misma fila.
+# Todos los CTE ven la tabla antes del INSERT, así que previous_visit es la visita anterior al lote
+WRITE_VISITS = register("visits.write_batch", '''
+    WITH data AS (
+        SELECT d.* FROM unnest(%s::int[], %s::int[], %s::int[], %s::timestamp[]) AS d(visited_id, visitor_id, visits, seen_at)
+        WHERE EXISTS (SELECT 1 FROM users WHERE id = d.visited_id)
+          AND EXISTS (SELECT 1 FROM users WHERE id = d.visitor_id)
+    ),
+    previous AS (
+        SELECT data.*, pv.last_visit AS previous_visit
+        FROM data LEFT JOIN profile_visits pv USING (visited_id, visitor_id)
+    ),
+    pairs AS (
+        INSERT INTO profile_visits (visited_id, visitor_id, visits, first_visit, last_visit)
+        SELECT visited_id, visitor_id, visits, seen_at, seen_at FROM data
+        ORDER BY visited_id, visitor_id
+        ON CONFLICT (visited_id, visitor_id) DO UPDATE SET
+            visits = profile_visits.visits + EXCLUDED.visits,
+            last_visit = GREATEST(profile_visits.last_visit, EXCLUDED.last_visit)
+    ),
+    days AS (
+        INSERT INTO profile_visit_days (visited_id, day, visits, unique_visitors)
+        SELECT visited_id, seen_at::date, SUM(visits),
+               COUNT(*) FILTER (WHERE previous_visit IS NULL OR previous_visit::date < seen_at::date)
+        FROM previous
+        GROUP BY visited_id, seen_at::date
+        ORDER BY 1, 2
+        ON CONFLICT (visited_id, day) DO UPDATE SET
+            visits = profile_visit_days.visits + EXCLUDED.visits,
+            unique_visitors = profile_visit_days.unique_visitors + EXCLUDED.unique_visitors
+    )
+    SELECT visited_id, SUM(visits)::int, array_agg(visitor_id ORDER BY seen_at DESC)
+    FROM data
+    GROUP BY visited_id
+''')
+GET_VISITORS = register("visits.recent_visitors", f'''
+    SELECT visitor_id, visits, first_visit, last_visit FROM profile_visits
+    WHERE visited_id = %(user)s
+      AND (last_visit, visitor_id) < (COALESCE(%(cursor_ts)s, 'infinity'::timestamp), COALESCE(%(cursor_id)s, 0))
+      AND {not_blocked("visitor_id", "%(blocked_ids)s")}
+    ORDER BY last_visit DESC, visitor_id DESC
+    LIMIT %(limit)s
+''')
+GET_VISIT_DAYS = register("visits.days", '''
+    SELECT day, visits, unique_visitors FROM profile_visit_days
+    WHERE visited_id = %s AND day > CURRENT_DATE - %s::int
+    ORDER BY day
+''')
+COUNT_VISITORS_SINCE = register("visits.count_visitors", '''
+    SELECT COUNT(*) AS visitors FROM profile_visits
+    WHERE visited_id = %s AND last_visit >= CURRENT_DATE - (%s::int - 1)
+''')
+
+
+def write_visits(items):
+    """Escribe un lote [(visitado, visitante, visitas, fecha)] y notifica a los visitados.
+
+    Devuelve {visitado: [visitantes]} de lo escrito.
+    """
+    if not items:
+        return {}
+    columns = [list(column) for column in zip(*items)]
+    try:
+        with Database.get_connection() as connection:
+            with connection.cursor(row_factory=tuple_row) as cursor:
+                rows = run(cursor, WRITE_VISITS, columns).fetchall()
+                if rows:
+                    add_visit_counters(cursor, [row[0] for row in rows], [row[1] for row in rows])
+                connection.commit()
+    except Exception as e:
+        logger.error(f"Error writing {len(items)} visits: {e}")
+        raise Exception("Error writing visits") from e
+
+    visitors = {visited_id: visitor_ids for visited_id, _, visitor_ids in rows}
+    if Config.NOTIFY and visitors:
+        notify_visits(visitors)
+    return visitors
+
+
+def notify_visits(visitors):
+    """Una notificación por perfil visitado en el lote, encolada en el escritor por lotes."""
+    users = get_users_many({visitor_ids[0] for visitor_ids in visitors.values()})
+    for visited_id, visitor_ids in visitors.items():
+        # El escritor agrupa por (usuario, tipo) y sustituye el texto por el agregado si count > 1
+        visitor = users.get(visitor_ids[0])
+        message = f"{visitor['username'] if visitor else 'Alguien'} ha visitado tu perfil."
+        actor_id = visitor_ids[0] if len(visitor_ids) == 1 else None
+        try:
+            queue_notification(visited_id, "visit", message, actor_id, count=len(visitor_ids))
+        except Exception as e:
+            # Las visitas ya están guardadas: perder el aviso es preferible a contarlas dos veces
+            logger.error(f"Error notifying visits to user {visited_id}: {e}")
+
+
+class VisitBuffer:
+    """Buffer de visitas con deduplicación por ventana y volcado por lotes en un hilo."""
+
+    def __init__(self, dedupe_window=Config.DEDUPE_WINDOW, flush_interval=Config.FLUSH_INTERVAL,
+                 batch_size=Config.BATCH_SIZE, max_pending=Config.MAX_PENDING, flush_function=write_visits):
+        self.dedupe_window = dedupe_window
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.flush_function = flush_function
+        self._recent = OrderedDict()  # (visitado, visitante) -> instante de la última visita contada
+        self._pending = OrderedDict()  # (visitado, visitante) -> {"visits", "seen_at"}
+        self._condition = threading.Condition()
+        self._thread_pid = None
+        self._closed = False
+        self.stats = {"views": 0, "deduped": 0, "recorded": 0, "rows_written": 0, "flushes": 0,
+                      "errors": 0, "dropped": 0}
+
+    def record(self, visitor_id, visited_id, now=None):
+        """Anota una visita. Devuelve False si se descarta (repetida dentro de la ventana)."""
+        self._ensure_thread()
+        now = now or time.monotonic()
+        key = (visited_id, visitor_id)
+        with self._condition:
+            self.stats["views"] += 1
+            self._expire(now)
+            if key in self._recent:
+                self.stats["deduped"] += 1
+                return False
+            if len(self._pending) >= self.max_pending and key not in self._pending:
+                self.stats["dropped"] += 1
+                logger.error(f"Visit buffer full, dropping visit to {visited_id}")
+                return False
+            self._recent[key] = now
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = {"visits": 1, "seen_at": datetime.now()}
+                if len(self._pending) >= self.batch_size:
+                    self._condition.notify()
+            else:
+                entry["visits"] += 1
+                entry["seen_at"] = datetime.now()
+            self.stats["recorded"] += 1
+            return True
+
+    def flush(self):
+        """Escribe inmediatamente todo lo pendiente. Devuelve las filas escritas."""
+        with self._condition:
+            batch, self._pending = self._pending, OrderedDict()
+        return self._write(batch)
+
+    def close(self):
+        """Vuelca lo pendiente y detiene el hilo (al apagar el proceso)."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self.flush()
+
+    def _expire(self, now):
+        # _recent está ordenado por instante: las caducadas están al principio
+        while self._recent:
+            key, seen = next(iter(self._recent.items()))
+            if now - seen < self.dedupe_window:
+                break
+            del self._recent[key]
+
+    def _ensure_thread(self):
+        # El hilo no sobrevive a un fork: cada worker arranca el suyo
+        if self._thread_pid == os.getpid():
+            return
+        with self._condition:
+            if self._thread_pid != os.getpid():
+                self._recent = OrderedDict()
+                self._pending = OrderedDict()
+                self._closed = False
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._run, name="visit-writer", daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                if self._closed:
+                    return
+                batch, self._pending = self._pending, OrderedDict()
+            if self._write(batch) < len(batch):
+                # La base de datos falla: esperar antes de reintentar
+                with self._condition:
+                    self._condition.wait(self.flush_interval)
+
+    def _write(self, batch):
+        """Escribe un lote en trozos de batch_size. Devuelve las filas escritas."""
+        items = list(batch.items())
+        written = 0
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start:start + self.batch_size]
+            try:
+                self.flush_function([
+                    (visited_id, visitor_id, entry["visits"], entry["seen_at"])
+                    for (visited_id, visitor_id), entry in chunk
+                ])
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Error flushing {len(chunk)} visits: {e}")
+                self._requeue(items[start:])
+                break
+            written += len(chunk)
+            self.stats["rows_written"] += len(chunk)
+            self.stats["flushes"] += 1
+        return written
+
+    def _requeue(self, items):
+        """Devuelve al buffer un lote fallido, por delante de lo encolado después."""
+        with self._condition:
+            pending = OrderedDict(items)
+            for key, entry in self._pending.items():
+                if key in pending:
+                    pending[key]["visits"] += entry["visits"]
+                    pending[key]["seen_at"] = entry["seen_at"]
+                else:
+                    pending[key] = entry
+            self._pending = pending
+
+
+visit_buffer = VisitBuffer()
+atexit.register(visit_buffer.close)
+
+
+def record_visit(visitor_id, visited_id):
+    """Registra que visitor_id ha visto el perfil de visited_id (en memoria; se escribe por lotes)."""
+    if not visitor_id or not visited_id:
+        raise ValueError("visitor_id and visited_id are required to record a visit.")
+    if visitor_id == visited_id:
+        return False  # Ver el propio perfil no es una visita
+    return visit_buffer.record(visitor_id, visited_id)
+
+
+def encode_visitor_cursor(visitor):
+    """Serializa la posición (last_visit, visitor_id) de un visitante."""
+    return f"{visitor['last_visit'].isoformat()}|{visitor['visitor_id']}"
+
+
+def decode_visitor_cursor(cursor):
+    """Interpreta un cursor generado por encode_visitor_cursor."""
+    try:
+        last_visit, visitor_id = cursor.split("|")
+        return datetime.fromisoformat(last_visit), int(visitor_id)
+    except (AttributeError, ValueError) as e:
+        raise ValueError(f"Invalid visitor cursor: {cursor}") from e
+
+
+def get_visitors(user_id, limit=50, before=None, blocked_ids=None):
+    """Últimos visitantes de un perfil, del más reciente al más antiguo, sin los bloqueados.
+
+    `before` (encode_visitor_cursor del último de la página anterior) pide la
+    página siguiente; el visitor_id desempata las visitas del mismo instante.
+    """
+    if not user_id:
+        raise ValueError("user_id is required to fetch visitors.")
+    if limit <= 0:
+        raise ValueError("limit must be positive.")
+    cursor_ts, cursor_id = decode_visitor_cursor(before) if before else (None, None)
+
+    try:
+        blocked = list(resolve_blocked(user_id, blocked_ids))
+        return fetch_all(GET_VISITORS, {"user": user_id, "cursor_ts": cursor_ts, "cursor_id": cursor_id,
+                                        "limit": limit, "blocked_ids": blocked})
+    except Exception as e:
+        logger.error(f"Error fetching visitors for user ID {user_id}: {e}")
+        raise Exception("Error fetching visitors") from e
+
+
+def get_visit_stats(user_id, days=7):
+    """Visitas de los últimos `days` días desde los resúmenes diarios.
+
+    Devuelve {"days": [{"day", "visits", "unique_visitors"}], "visits", "visitors"};
+    visitors son los visitantes distintos de todo el periodo.
+    """
+    if not user_id:
+        raise ValueError("user_id is required to fetch visit stats.")
+    if days <= 0:
+        raise ValueError("days must be positive.")
+
+    try:
+        rows = fetch_all(GET_VISIT_DAYS, (user_id, days))
+        visitors = fetch_one(COUNT_VISITORS_SINCE, (user_id, days))["visitors"]
+    except Exception as e:
+        logger.error(f"Error fetching visit stats for user ID {user_id}: {e}")
+        raise Exception("Error fetching visit stats") from e
+    return {"days": rows, "visits": sum(row["visits"] for row in rows), "visitors": visitors}
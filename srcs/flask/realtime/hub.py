@@ -0,0 +1,130 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    hub.py                                             :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 13:24:37 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 13:24:37 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Reparto de eventos en tiempo real.
+
+Un único LISTEN por proceso recibe los eventos que publican los modelos
+(models.events) y los reparte a las colas de los clientes conectados.
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+import psycopg
+
+from models.database import Database
+from models.events import EVENTS_CHANNEL
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 1.0
+
+
+def format_sse(event_type, data):
+    """Formatea un evento como mensaje Server-Sent Events."""
+    return f"event: {event_type}\ndata: {data}\n\n".encode()
+
+
+class Subscriber:
+    """Cola de eventos pendientes de un cliente conectado."""
+
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, message):
+        """Encola un evento; si el cliente no da abasto se le desconecta (None)."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class EventHub:
+    """Mantiene las suscripciones por usuario y escucha el canal de eventos."""
+
+    def __init__(self, queue_size, channel=EVENTS_CHANNEL):
+        self.queue_size = queue_size
+        self.channel = channel
+        self._subscribers = defaultdict(set)
+        self.stats = {"events": 0, "delivered": 0, "dropped_clients": 0, "reconnects": 0}
+
+    def subscribe(self, user_id):
+        subscriber = Subscriber(user_id, self.queue_size)
+        self._subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.user_id]
+
+    def is_connected(self, user_id):
+        return user_id in self._subscribers
+
+    def connections(self):
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def dispatch(self, payload):
+        """Reparte un payload de NOTIFY a los suscriptores de los usuarios afectados."""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.error(f"Ignoring malformed event payload: {payload[:200]}")
+            return
+
+        self.stats["events"] += 1
+        # Se serializa una sola vez y se comparte entre todas las colas
+        message = format_sse(event["type"], payload)
+        for user_id in set(event.get("user_ids", ())):
+            for subscriber in list(self._subscribers.get(user_id, ())):
+                if subscriber.push(message):
+                    self.stats["delivered"] += 1
+                else:
+                    self.stats["dropped_clients"] += 1
+                    self.unsubscribe(subscriber)
+
+    def broadcast_resync(self):
+        """Avisa a todos los clientes de que pueden haberse perdido eventos."""
+        message = format_sse("resync", "{}")
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in list(subscribers):
+                subscriber.push(message)
+
+    async def run(self):
+        """Escucha el canal indefinidamente, reconectando si se pierde la conexión."""
+        Database.validate_config()
+        while True:
+            try:
+                connection = await psycopg.AsyncConnection.connect(autocommit=True, **Database.connection_kwargs())
+                async with connection:
+                    await connection.execute(f"LISTEN {self.channel}")
+                    logger.info(f"Listening for events on {self.channel}")
+                    async for notify in connection.notifies():
+                        self.dispatch(notify.payload)
+            except (psycopg.Error, OSError) as e:
+                logger.error(f"Event listener error: {e}")
+            # Durante la reconexión se han podido perder eventos
+            self.stats["reconnects"] += 1
+            self.broadcast_resync()
+            await asyncio.sleep(RECONNECT_DELAY)
@@ -0,0 +1,156 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    server.py                                          :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 13:27:52 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 13:27:52 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Servidor Server-Sent Events para chat y notificaciones.
+
+Cada cliente es una corrutina con su cola, no un hilo: un proceso aguanta
+decenas de miles de conexiones ociosas. Todos los workers comparten el flujo
+de eventos a través de LISTEN/NOTIFY.
+
+    python3 -m realtime.server
+
+Los clientes piden un token a Flask (GET /events/token, con su sesión) y se
+conectan con GET /events?token=<token> (EventSource); el usuario sale del
+token firmado. Tras un evento "resync" deben volver a pedir lo nuevo con las
+APIs paginadas. Con el mismo token, GET /presence?ids=1,2,3 devuelve quién
+está en línea: los heartbeats solo existen en este proceso.
+"""
+
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs, urlsplit
+
+from config import RealtimeConfig as Config
+from models.presence import presence
+from realtime.hub import EventHub
+from realtime.tokens import verify_stream_token
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_REQUEST_BYTES = 8192
+REQUEST_TIMEOUT = 10
+MAX_PRESENCE_IDS = 500
+
+hub = EventHub(Config.CLIENT_QUEUE_SIZE)
+
+
+def http_response(status, body=b"", content_type="text/plain"):
+    return (
+        f"HTTP/1.1 {status}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Access-Control-Allow-Origin: {Config.ALLOW_ORIGIN}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode() + body
+
+
+async def read_request(reader):
+    """Lee la línea de petición y devuelve (método, ruta, parámetros)."""
+    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT)
+    if len(head) > MAX_REQUEST_BYTES:
+        raise ValueError("Request too large")
+    method, target, _ = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ", 2)
+    url = urlsplit(target)
+    return method, url.path, parse_qs(url.query)
+
+
+async def stream_events(writer, user_id):
+    """Envía los eventos del usuario hasta que el cliente se desconecta."""
+    writer.write((
+        "HTTP/1.1 200 OK\r\n"
+        "Content-Type: text/event-stream\r\n"
+        "Cache-Control: no-cache\r\n"
+        "Connection: keep-alive\r\n"
+        f"Access-Control-Allow-Origin: {Config.ALLOW_ORIGIN}\r\n\r\n"
+        "retry: 3000\n\n"
+    ).encode())
+    await writer.drain()
+
+    subscriber = hub.subscribe(user_id)
+    presence.heartbeat(user_id)
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.get(), Config.HEARTBEAT)
+            except asyncio.TimeoutError:
+                # El heartbeat mantiene vivos los proxies y detecta clientes caídos
+                message = b": ping\n\n"
+            if message is None:
+                break
+            writer.write(message)
+            await writer.drain()
+            presence.heartbeat(user_id)  # Solo memoria: users se actualiza por lotes
+    finally:
+        hub.unsubscribe(subscriber)
+        if not hub.is_connected(user_id):
+            presence.disconnect(user_id)
+
+
+async def presence_status(user_ids):
+    """Cuerpo JSON de /presence; los desconocidos se leen de users fuera del bucle de eventos."""
+    status = await asyncio.to_thread(presence.status_many, user_ids)
+    return json.dumps({
+        str(user_id): {"online": entry["online"],
+                       "last_seen": entry["last_seen"].isoformat() if entry["last_seen"] else None}
+        for user_id, entry in status.items()
+    }).encode()
+
+
+async def handle_client(reader, writer):
+    try:
+        method, path, params = await read_request(reader)
+        if method == "GET" and path == "/events":
+            try:
+                user_id = verify_stream_token(params.get("token", [""])[0])
+            except ValueError:
+                writer.write(http_response("401 Unauthorized", b"Unauthorized"))
+            else:
+                await stream_events(writer, user_id)
+        elif method == "GET" and path == "/presence":
+            # /presence?token=...&ids=1,2,3: en línea y última conexión de una página de perfiles
+            user_ids = [int(user_id) for user_id in params.get("ids", [""])[0].split(",") if user_id]
+            try:
+                verify_stream_token(params.get("token", [""])[0])
+            except ValueError:
+                writer.write(http_response("401 Unauthorized", b"Unauthorized"))
+            else:
+                body = await presence_status(user_ids[:MAX_PRESENCE_IDS])
+                writer.write(http_response("200 OK", body, "application/json"))
+        elif method == "GET" and path == "/health":
+            body = json.dumps({**hub.stats, "connections": hub.connections()}).encode()
+            writer.write(http_response("200 OK", body, "application/json"))
+        else:
+            writer.write(http_response("404 Not Found", b"Not Found"))
+    except ValueError:
+        writer.write(http_response("400 Bad Request", b"Bad Request"))
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve():
+    listener = asyncio.create_task(hub.run())
+    server = await asyncio.start_server(handle_client, Config.HOST, Config.PORT, backlog=4096)
+    logger.info(f"Realtime server running on {Config.HOST}:{Config.PORT}")
+    async with server:
+        await asyncio.gather(server.serve_forever(), listener)
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
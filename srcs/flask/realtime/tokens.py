@@ -0,0 +1,60 @@
+# **************************************************************************** #
+#                                                                              #
+#                                                         :::      ::::::::    #
+#    tokens.py                                          :+:      :+:    :+:    #
+#                                                     +:+ +:+         +:+      #
+#    By: xmatute- <xmatute-@student.42.fr>          +#+  +:+       +#+         #
+#                                                 +#+#+#+#+#+   +#+            #
+#    Created: 2026/10/18 23:59:12 by xmatute-          #+#    #+#              #
+#    Updated: 2026/10/18 23:59:12 by xmatute-         ###   ########.fr        #
+#                                                                              #
+# **************************************************************************** #
+
+"""Tokens firmados para el flujo de eventos.
+
+Flask emite el token para el usuario de la sesión (GET /events/token) y el
+servidor de tiempo real lo verifica: el user_id sale del token y no de un
+parámetro que el cliente pueda cambiar. Formato: "<user_id>.<expira>.<hmac>"
+con HMAC-SHA256 sobre "<user_id>.<expira>" y la clave SECRET_KEY.
+"""
+
+import hashlib
+import hmac
+import logging
+import time
+
+from config import RealtimeConfig as Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _signature(payload):
+    return hmac.new(Config.TOKEN_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_stream_token(user_id, ttl=None):
+    """Token para GET /events del usuario, válido durante ttl segundos (TOKEN_TTL por defecto)."""
+    if not Config.TOKEN_SECRET:
+        raise RuntimeError("SECRET_KEY is not configured: cannot issue stream tokens.")
+    if not user_id:
+        raise ValueError("user_id is required to issue a stream token.")
+    payload = f"{int(user_id)}.{int(time.time() + (ttl or Config.TOKEN_TTL))}"
+    return f"{payload}.{_signature(payload)}"
+
+
+def verify_stream_token(token):
+    """Devuelve el user_id del token, o lanza ValueError si es inválido o ha caducado."""
+    if not Config.TOKEN_SECRET:
+        logger.error("SECRET_KEY is not configured: rejecting stream token.")
+        raise ValueError("Stream tokens are not configured.")
+    try:
+        user_id, expires_at, signature = token.split(".")
+        user_id, expires_at = int(user_id), int(expires_at)
+    except (AttributeError, ValueError) as e:
+        raise ValueError("Malformed stream token.") from e
+    if not hmac.compare_digest(signature, _signature(f"{user_id}.{expires_at}")):
+        raise ValueError("Invalid stream token signature.")
+    if expires_at < time.time():
+        raise ValueError("Stream token expired.")
+    return user_id
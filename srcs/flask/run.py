@@ -38,18 +38,251 @@ from config import RunConfig as Config
 # except Exception as e:
 #     print(f"Error: {e}")
 
-from flask import Flask
+import asyncio
+import functools
+import os
+import re
+
+from flask import Flask, Response, abort, g, jsonify, request, send_file, session
 
 from models.database import Database
+from models.blocks_model import block_user, unblock_user, report_user
+from models.cache import profile_cache
+from models.chat_model import encode_inbox_cursor, get_inbox, mark_conversations_read, unread_messages_count
+from models.image_store import image_path, THUMBNAIL_FORMAT
+from models.pictures_model import get_image, upload_picture
+from models.search_model import search_users, typeahead_users
+from models.visits_model import encode_visitor_cursor, get_visit_stats, get_visitors, record_visit
+from models.migrations import check_schema
+from realtime.tokens import issue_stream_token
+from config import ImageConfig
+from models import dataloader, instrumentation
+from models.aio import blocks_model as aio_blocks, likes_model as aio_likes, pictures_model as aio_pictures, profile_model as aio_profile
+from models.aio.database import AsyncDatabase, run_coroutine
+
+
+class MatchaFlask(Flask):
+    def async_to_sync(self, func):
+        # Las vistas async corren en el bucle de eventos del proceso, donde vive el
+        # pool asíncrono, en vez de en un bucle nuevo por petición (asgiref)
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            return run_coroutine(func(*args, **kwargs))
+        return run
+
+
+app = MatchaFlask(__name__)
+app.secret_key = Config.SECRET_KEY
+
+def ensure_schema():
+    # Comprobación de arranque (una consulta); el esquema se aplica con python3 -m models.migrations.
+    # No se hace al importar: con preload_app la importación ocurre en el maestro de gunicorn,
+    # que la hace en when_ready (gunicorn.conf.py)
+    if not check_schema() and not Config.DEBUG:
+        raise RuntimeError("Database schema is not up to date")
+
+@app.before_request
+def start_query_count():
+    g.query_count_token = instrumentation.begin_request()
+    g.dataloader_token = dataloader.begin_request()
 
-app = Flask(__name__)
+@app.teardown_request
+def stop_query_count(exception=None):
+    loader_token = g.pop("dataloader_token", None)
+    if loader_token is not None:
+        dataloader.end_request(loader_token)
+    token = g.pop("query_count_token", None)
+    if token is not None:
+        instrumentation.end_request(token, request.endpoint)
 
 @app.route("/")
 def helloworld():
     return "Hola Bea!"
+
+@app.route("/metrics")
+def metrics_prometheus():
+    pool = {f"matcha_db_pool_{key}": value for key, value in Database.get_pool_stats().items()}
+    pool.update({f"matcha_db_async_pool_{key}": value for key, value in AsyncDatabase.get_pool_stats().items()})
+    cache = {f"matcha_profile_cache_{key}": value for key, value in profile_cache.stats().items()}
+    return Response(instrumentation.prometheus_text({**pool, **cache}), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics/json")
+def metrics_json():
+    return jsonify({
+        **instrumentation.metrics.snapshot(),
+        "pool": Database.get_pool_stats(),
+        "async_pool": AsyncDatabase.get_pool_stats(),
+        "profile_cache": profile_cache.stats(),
+    })
     
+def session_user():
+    # Usuario que actúa: siempre el de la sesión, nunca uno que venga en la URL (401 sin sesión)
+    user_id = session.get("user_id")
+    if not user_id:
+        abort(401)
+    return user_id
+
+def require_session_user(user_id):
+    # Las rutas privadas /users/<id>/... solo las puede usar el propio usuario
+    if session_user() != user_id:
+        abort(403)
+    return user_id
+
+@app.route("/events/token")
+def events_token():
+    # Token firmado para GET /events del servidor de tiempo real, solo para el usuario de la sesión
+    return jsonify({"token": issue_stream_token(session_user())})
+
+def viewer_blocks(viewer_id):
+    # Conjunto de bloqueos de quien mira, una vez por petición (dataloader "block_sets")
+    return dataloader.get_loader("block_sets").get(viewer_id) if viewer_id else frozenset()
+
+@app.route("/users/<int:user_id>/overview")
+async def user_overview(user_id):
+    # Perfil, fotos y relación con quien mira: cuatro consultas a la vez en el pool asíncrono.
+    # Quien mira es el usuario de la sesión; sin sesión no hay relación ni visita
+    viewer_id = session.get("user_id")
+    profile, pictures, status, blocked = await asyncio.gather(
+        aio_profile.get_profile_by_user_id(user_id),
+        aio_pictures.get_pictures_by_user(user_id),
+        aio_likes.match_status(viewer_id, [user_id]) if viewer_id else asyncio.sleep(0, {}),
+        aio_blocks.get_block_set(viewer_id) if viewer_id else asyncio.sleep(0, frozenset()),
+    )
+    if profile is None or user_id in blocked:
+        abort(404)
+    if viewer_id:
+        record_visit(viewer_id, user_id)  # Solo memoria: se escribe por lotes
+    return jsonify({"profile": profile, "pictures": pictures, "relation": status.get(user_id)})
+
+@app.route("/users/<int:user_id>/visitors")
+def user_visitors(user_id):
+    # Quién ha visto el perfil (paginado con ?before=<next_before>) y el resumen de la semana
+    require_session_user(user_id)
+    limit = min(request.args.get("limit", 50, type=int), 200)
+    try:
+        visitors = get_visitors(user_id, limit, request.args.get("before"), viewer_blocks(user_id))
+        stats = get_visit_stats(user_id, min(request.args.get("days", 7, type=int), 90))
+    except ValueError:
+        abort(400)
+    next_before = encode_visitor_cursor(visitors[-1]) if len(visitors) == limit else None
+    return jsonify({"visitors": visitors, "next_before": next_before, "stats": stats})
+
+@app.route("/users/<int:user_id>/inbox")
+def user_inbox(user_id):
+    # Conversaciones recientes con su último mensaje y no leídos (paginado con ?before=<next_before>)
+    require_session_user(user_id)
+    limit = request.args.get("limit", 20, type=int)
+    blocked = viewer_blocks(user_id)
+    try:
+        conversations = get_inbox(user_id, limit, request.args.get("before"), blocked)
+    except ValueError:
+        abort(400)
+    next_before = encode_inbox_cursor(conversations[-1]) if len(conversations) == limit else None
+    return jsonify({
+        "conversations": conversations,
+        "next_before": next_before,
+        "unread": unread_messages_count(user_id, blocked),
+    })
+
+@app.route("/users/<int:user_id>/inbox/read", methods=["POST"])
+def user_inbox_read(user_id):
+    # Marca como leídas las conversaciones con {"user_ids": [...]} (todas si no se indica)
+    require_session_user(user_id)
+    other_ids = (request.get_json(silent=True) or {}).get("user_ids")
+    try:
+        if other_ids is not None:
+            other_ids = [int(other_id) for other_id in other_ids][:1000]
+        updated = mark_conversations_read(user_id, other_ids)
+    except (TypeError, ValueError):
+        abort(400)
+    return jsonify({"read": updated})
+
+@app.route("/search/users")
+def search_users_text():
+    # Búsqueda por relevancia: ?q=texto&limit=20&cursor=<next_cursor> (sin sesión, sin bloqueos)
+    viewer_id = session.get("user_id")
+    try:
+        result = search_users(request.args.get("q", ""), request.args.get("limit", type=int),
+                              request.args.get("cursor"), viewer_id, viewer_blocks(viewer_id))
+    except ValueError:
+        abort(400)
+    return jsonify(result)
+
+@app.route("/search/typeahead")
+def search_typeahead():
+    # Sugerencias mientras se escribe: ?q=prefijo&limit=10 (bloqueos del usuario de la sesión)
+    viewer_id = session.get("user_id")
+    try:
+        users = typeahead_users(request.args.get("q", ""), request.args.get("limit", type=int),
+                                viewer_id, viewer_blocks(viewer_id))
+    except ValueError:
+        abort(400)
+    return jsonify({"users": users})
+
+@app.route("/users/<int:user_id>/blocks/<int:blocked_id>", methods=["POST", "DELETE"])
+def user_block(user_id, blocked_id):
+    # POST bloquea, DELETE desbloquea; el conjunto en caché de ambos se invalida en el modelo.
+    # Solo bloquea el usuario de la sesión
+    require_session_user(user_id)
+    try:
+        if request.method == "POST":
+            changed = block_user(user_id, blocked_id)
+        else:
+            changed = unblock_user(user_id, blocked_id)
+    except ValueError:
+        abort(400)
+    loader = dataloader.get_loader("block_sets")
+    loader.clear(user_id)
+    loader.clear(blocked_id)
+    return jsonify({"changed": bool(changed)})
+
+@app.route("/users/<int:user_id>/reports/<int:reported_id>", methods=["POST"])
+def user_report(user_id, reported_id):
+    # Denuncia (p. ej. cuenta falsa) con motivo opcional en el cuerpo JSON {"reason": "..."},
+    # siempre en nombre del usuario de la sesión
+    require_session_user(user_id)
+    reason = (request.get_json(silent=True) or {}).get("reason")
+    try:
+        report = report_user(user_id, reported_id, reason)
+    except ValueError:
+        abort(400)
+    return jsonify({"report": report}), 201 if report else 200
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+@app.route("/users/<int:user_id>/pictures", methods=["POST"])
+def upload_user_picture(user_id):
+    # Multipart (campo "image") o el cuerpo en crudo; en ambos casos se lee por bloques
+    require_session_user(user_id)
+    upload = request.files.get("image")
+    result = upload_picture(user_id, upload.stream if upload else request.stream)
+    return jsonify(result), 201 if result["success"] else 400
+
+@app.route("/images/<digest>")
+def serve_image(digest):
+    image = get_image(digest) if DIGEST_PATTERN.match(digest) else None
+    if image is None:
+        abort(404)
+
+    path, mimetype, etag = image_path(digest, image["extension"]), image["content_type"], digest
+    size = request.args.get("size", type=int)
+    if size in ImageConfig.THUMBNAIL_SIZES and image["thumbnails_ready"]:
+        path, mimetype, etag = image_path(digest, image["extension"], size), THUMBNAIL_FORMAT[1], f"{digest}-{size}"
+    if not os.path.exists(path):
+        abort(404)
+
+    # conditional=True: 304 con If-None-Match y respuestas parciales con Range;
+    # el fichero se entrega con wsgi.file_wrapper (sendfile en el servidor WSGI)
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True,
+                         max_age=ImageConfig.CACHE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True  # El contenido de un hash nunca cambia
+    return response
+
+# Solo desarrollo: en producción se sirve con gunicorn (gunicorn.conf.py) y el
+# esquema se crea una vez con python3 -m models.migrations
 if __name__ == "__main__":
-    Database.create_tables()
+    ensure_schema()
     app.run(host=Config.HOST, port=Config.PORT, debug=Config.DEBUG)
 
 
@@ -0,0 +1,107 @@
+import psycopg
+import threading
+import time
+
+from models.notification_writer import NotificationWriter
+
+
+class RecordingFlush:
+    """flush_function falsa: guarda las filas y avisa de cada volcado."""
+
+    def __init__(self):
+        self.rows = []
+        self.flushed = threading.Event()
+
+    def __call__(self, user_ids, types, messages, actor_ids):
+        self.rows.extend(zip(user_ids, types, messages, actor_ids))
+        self.flushed.set()
+
+
+def make_writer(**kwargs):
+    flush = RecordingFlush()
+    writer = NotificationWriter(flush_function=flush, **{"batch_size": 100, "max_delay": 0.1,
+                                                         "max_pending": 1000, **kwargs})
+    return writer, flush
+
+
+def test_lone_entry_after_idle_flush_is_written_within_max_delay():
+    writer, flush = make_writer()
+    try:
+        writer.add(1, "like", "a te ha dado like.", actor_id=2)
+        assert flush.flushed.wait(1.0)
+        flush.flushed.clear()
+
+        # El hilo vuelve a dormir con el buffer vacío: una sola entrada debe despertarlo
+        time.sleep(0.3)
+        started = time.monotonic()
+        writer.add(3, "message", "b te ha enviado un mensaje.", actor_id=4)
+        assert flush.flushed.wait(1.0)
+        assert time.monotonic() - started < writer.max_delay + 0.5
+        assert flush.rows[-1] == (3, "message", "b te ha enviado un mensaje.", 4)
+    finally:
+        writer.close()
+
+
+def test_full_batch_is_written_before_max_delay():
+    writer, flush = make_writer(batch_size=3, max_delay=30)
+    try:
+        for user_id in range(3):
+            writer.add(user_id, "like", "x te ha dado like.")
+        assert flush.flushed.wait(1.0)
+        assert len(flush.rows) == 3
+    finally:
+        writer.close()
+
+
+def test_events_of_same_user_and_type_are_coalesced():
+    writer, flush = make_writer(max_delay=30)
+    writer.add(1, "like", "a te ha dado like.", actor_id=2)
+    writer.add(1, "like", "c te ha dado like.", actor_id=3)
+    writer.add(1, "visit", "d ha visitado tu perfil.", count=4)
+    assert writer.flush() == 2
+    assert flush.rows == [(1, "like", "2 personas te han dado like.", None),
+                          (1, "visit", "4 personas han visitado tu perfil.", None)]
+    writer.close()
+
+
+class FailingFlush(RecordingFlush):
+    """Falla como create_notifications_bulk: el error de psycopg va como causa."""
+
+    def __init__(self, error, bad_user_ids=None):
+        super().__init__()
+        self.error = error
+        self.bad_user_ids = bad_user_ids
+        self.calls = 0
+
+    def __call__(self, user_ids, types, messages, actor_ids):
+        self.calls += 1
+        if self.bad_user_ids is None or self.bad_user_ids & set(user_ids):
+            try:
+                raise self.error
+            except Exception as e:
+                raise Exception("Error creating notifications") from e
+        super().__call__(user_ids, types, messages, actor_ids)
+
+
+def test_invalid_row_is_dropped_and_the_rest_of_the_batch_is_written():
+    flush = FailingFlush(psycopg.errors.ForeignKeyViolation("user deleted"), bad_user_ids={2})
+    writer = NotificationWriter(flush_function=flush, batch_size=100, max_delay=30, max_pending=1000)
+    for user_id in range(1, 5):
+        writer.add(user_id, "like", "a te ha dado like.")
+    assert writer.flush() == 3
+    assert sorted(row[0] for row in flush.rows) == [1, 3, 4]
+    assert writer.stats["dropped"] == 1
+    assert writer.flush() == 0
+    writer.close()
+
+
+def test_entry_is_dropped_after_max_attempts():
+    flush = FailingFlush(psycopg.OperationalError("server closed the connection"))
+    writer = NotificationWriter(flush_function=flush, batch_size=100, max_delay=30,
+                                max_pending=1000, max_attempts=3)
+    writer.add(1, "like", "a te ha dado like.")
+    for _ in range(5):
+        writer.flush()
+    assert flush.calls == 3
+    assert writer.stats["dropped"] == 1
+    writer.close()
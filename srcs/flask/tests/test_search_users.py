@@ -0,0 +1,57 @@
+import pytest
+
+from models import search_model
+from models.database import Database
+from models.search_model import search_users
+
+WORD = "zqxpagingtest"
+USERS = 120
+CANDIDATES = 50
+
+
+@pytest.fixture
+def matching_users(monkeypatch):
+    """USERS perfiles activos con WORD en la biografía y uno llamado WORD; se borran al terminar."""
+    try:
+        connection = Database.get_dedicated_connection()
+    except Exception as e:
+        pytest.skip(f"database not available: {e}")
+    with connection:
+        connection.execute("DELETE FROM users WHERE username LIKE %s", (f"{WORD}%",))
+        ids = [
+            connection.execute(
+                "INSERT INTO users (username, email, password_hash, birthdate, biography, is_active) "
+                "VALUES (%s, %s, 'x', '1990-01-01', %s, TRUE) RETURNING id",
+                (f"{WORD}{i}", f"{WORD}{i}@example.com", f"{WORD} biografía {i}"),
+            ).fetchone()["id"]
+            for i in range(USERS)
+        ]
+        # La coincidencia exacta del nombre de usuario, con el id más alto
+        ids.append(connection.execute(
+            "INSERT INTO users (username, email, password_hash, birthdate, biography, is_active) "
+            "VALUES (%s, %s, 'x', '1990-01-01', '', TRUE) RETURNING id",
+            (WORD, f"{WORD}@example.com"),
+        ).fetchone()["id"])
+        monkeypatch.setattr(search_model.Config, "TEXT_MAX_CANDIDATES", CANDIDATES)
+        yield ids
+        connection.execute("DELETE FROM users WHERE id = ANY(%s)", (ids,))
+
+
+def page_through(query, limit):
+    found, cursor = [], None
+    while True:
+        result = search_users(query, limit, cursor)
+        found.extend(user["id"] for user in result["users"])
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return found
+
+
+def test_paging_past_the_candidate_cap_is_complete_and_stable(matching_users):
+    first = page_through(WORD, 7)
+    assert CANDIDATES <= len(first) == len(set(first)) <= len(matching_users)
+    # El conjunto de candidatos no depende del plan: las mismas páginas en cada recorrido
+    assert page_through(WORD, 7) == first
+    assert page_through(WORD, 11) == first
+    # Los candidatos se eligen por relevancia, no por id: el nombre exacto va primero
+    assert first[0] == matching_users[-1]